@@ -16,6 +16,8 @@ load_dotenv()
 PROJECT_ROOT = Path(__file__).resolve().parent
 DATA_DIR = PROJECT_ROOT / "data"
 CHROMA_PERSIST_DIR = PROJECT_ROOT / "vectorstore_db"
+BM25_PERSIST_DIR = PROJECT_ROOT / "bm25_index"
+SPARSE_INDEX_DIR = PROJECT_ROOT / "sparse_index"
 
 DOCUMENT_PATHS: list[str] = [
     str(DATA_DIR / "cards.md"),
@@ -26,12 +28,32 @@ DOCUMENT_PATHS: list[str] = [
 OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
 # ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY", "")
 
+# ── Async OpenAI client (shared connection pool) ─────────────────────────────
+OPENAI_MAX_CONNECTIONS: int = 100            # concurrent HTTP connections per process
+OPENAI_MAX_KEEPALIVE_CONNECTIONS: int = 20   # idle connections kept open for reuse
+OPENAI_TIMEOUT_S: float = 60.0
+
+# ── OpenAI embedding batch scheduler (indexing) ──────────────────────────────
+OPENAI_EMBEDDING_RPM: int = 3_000              # account requests/min limit
+OPENAI_EMBEDDING_TPM: int = 1_000_000          # account tokens/min limit
+OPENAI_EMBEDDING_MAX_IN_FLIGHT: int = 8        # concurrent embedding requests
+OPENAI_EMBEDDING_BATCH_MAX_TOKENS: int = 50_000   # tokens packed per request
+OPENAI_EMBEDDING_BATCH_MAX_ITEMS: int = 512    # inputs per request (API max 2048)
+OPENAI_EMBEDDING_MAX_RETRIES: int = 6          # 429 / timeout / 5xx retries per batch
+OPENAI_EMBEDDING_BACKOFF_BASE_S: float = 1.0   # exponential backoff base (full jitter)
+OPENAI_EMBEDDING_BACKOFF_MAX_S: float = 60.0
+
 # ── Chunking ─────────────────────────────────────────────────────────────────
 LARGE_SECTION_THRESHOLD: int = 1500      # chars — sections above this get sub-split
 RECURSIVE_CHUNK_SIZE: int = 1000         # target size for sub-chunks
 RECURSIVE_CHUNK_OVERLAP: int = 200       # overlap between consecutive sub-chunks
 
 # ── Embedding Models ─────────────────────────────────────────────────────────
+# Optional per-model key "vector_backend" ("chroma" | "numpy") overrides
+# DEFAULT_VECTOR_BACKEND for that model, and "hnsw" (dict of HNSW_PARAMS keys)
+# overrides the Chroma HNSW parameters for that model's collection. Variants of a model use "base_model"
+# (weights / API model to use) plus a variant option: "dimensions" (OpenAI
+# server-side truncation) or "quantization" (local models).
 EMBEDDING_MODELS: dict[str, dict] = {
     "text-embedding-3-small": {
         "provider": "openai",
@@ -41,17 +63,92 @@ EMBEDDING_MODELS: dict[str, dict] = {
         "provider": "openai",
         "dimensions": 3072,
     },
+    # Matryoshka variants: same model, truncated server-side via `dimensions=`
+    "text-embedding-3-large@1024": {
+        "provider": "openai",
+        "dimensions": 1024,
+        "base_model": "text-embedding-3-large",
+    },
+    "text-embedding-3-large@512": {
+        "provider": "openai",
+        "dimensions": 512,
+        "base_model": "text-embedding-3-large",
+    },
+    "text-embedding-3-large@256": {
+        "provider": "openai",
+        "dimensions": 256,
+        "base_model": "text-embedding-3-large",
+    },
+    "text-embedding-3-small@512": {
+        "provider": "openai",
+        "dimensions": 512,
+        "base_model": "text-embedding-3-small",
+    },
     "BAAI/bge-m3": {
         "provider": "huggingface",
         "dimensions": 1024,
     },
+    # Same weights, Linear layers dynamically quantized to int8 (CPU only)
+    "BAAI/bge-m3@int8": {
+        "provider": "huggingface",
+        "dimensions": 1024,
+        "base_model": "BAAI/bge-m3",
+        "quantization": "int8",
+    },
+    # Offline, deterministic hash embeddings (no network / download): CI, benchmarks
+    "offline-hash-384": {
+        "provider": "offline",
+        "dimensions": 384,
+    },
+    "offline-hash-1536": {
+        "provider": "offline",
+        "dimensions": 1536,
+    },
 }
 
 DEFAULT_EMBEDDING_MODEL: str = "text-embedding-3-small"
 
+# ── Embedding Cache ──────────────────────────────────────────────────────────
+USE_EMBEDDING_CACHE: bool = True         # reuse vectors for unchanged chunk texts
+EMBEDDING_CACHE_PATH = PROJECT_ROOT / "embedding_cache" / "embeddings.sqlite"
+QUERY_CACHE_SIZE: int = 1024                # in-memory query → vector LRU entries (0 = off)
+QUERY_CACHE_TTL_S: float | None = None      # expire query vectors after N seconds (None = never)
+MICROBATCH_MAX_WAIT_MS: float = 5.0         # micro-batching: max wait for concurrent queries
+MICROBATCH_MAX_BATCH_SIZE: int = 32         # micro-batching: max queries per model call
+MICROBATCH_MAX_IN_FLIGHT: int = 4           # micro-batching: concurrent model calls
+
 # ── Vector Store (ChromaDB) ──────────────────────────────────────────────────
 CHROMA_COLLECTION_PREFIX: str = "onezero"   # collection name: "{prefix}_{model_slug}"
 DISTANCE_METRIC: str = "cosine"
+# HNSW index parameters (Chroma's defaults). M and construction_ef are fixed
+# when a collection is created — changing them rebuilds the collection on the
+# next build_vectorstore(); search_ef is applied to existing collections.
+# Measure the recall / latency trade-off with benchmark_hnsw_params().
+HNSW_PARAMS: dict[str, int] = {
+    "hnsw:M": 16,                   # graph degree: recall + memory ↑ with M
+    "hnsw:construction_ef": 100,    # build-time beam width: recall + build time ↑
+    "hnsw:search_ef": 100,          # query-time beam width: recall + latency ↑
+}
+
+# ── Vector Store backends ────────────────────────────────────────────────────
+DEFAULT_VECTOR_BACKEND: str = "chroma"      # "chroma" (HNSW) or "numpy" (exact, mmap)
+NUMPY_STORE_DIR = CHROMA_PERSIST_DIR / "numpy"   # one sub-directory per model
+
+# ── Quantized vector stores (optional, built from an existing store) ─────────
+# Codes stay in RAM; the float32 matrix is memory-mapped and only read to
+# re-score the top n_results × QUANTIZATION_RESCORE_FACTOR candidates.
+# Measure memory saved vs recall lost with benchmark_quantization().
+QUANTIZED_STORE_DIR = CHROMA_PERSIST_DIR / "quantized"   # <collection>/<method>
+QUANTIZATION_RESCORE_FACTOR: int = 4        # 0 = no float32 re-score (approximate distances)
+PQ_SUBVECTOR_DIM: int = 8                   # dims per PQ code byte: 1536-dim → 192 bytes
+PQ_TRAIN_SAMPLES: int = 10_000              # k-means training sample per codebook
+PQ_KMEANS_ITERS: int = 15
+
+# ── Index builds (checkpointing) ─────────────────────────────────────────────
+INDEX_BATCH_SIZE: int = 256                 # chunks embedded + committed per batch
+# (OpenAI models raise it to MAX_IN_FLIGHT × BATCH_MAX_ITEMS so builds keep
+# every in-flight embedding request busy)
+BUILD_PROGRESS_DIR = CHROMA_PERSIST_DIR / "build_progress"   # resumable-build manifests
 
 # ── Retrieval ────────────────────────────────────────────────────────────────
 TOP_K: int = 5
@@ -59,16 +156,49 @@ RELEVANCE_THRESHOLD: float = 0.35          # max cosine distance; lower = strict
 # ── Reranking (Cross-Encoder) ────────────────────────────────────────────────
 RERANKER_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
 RETRIEVAL_CANDIDATES: int = 20        # retrieve more candidates, then rerank to top_k
+RERANKER_BATCH_SIZE: int = 32         # (query, chunk) pairs per forward pass
+RERANKER_MAX_LENGTH: int = 512        # max tokens per pair; longer pairs are truncated
+RERANKER_SORT_BY_LENGTH: bool = True  # bucket pairs by length to minimize padding
+RERANKER_BACKEND: str = "torch"       # "torch" | "onnx" | "onnx-int8" (ONNX Runtime, CPU)
+ONNX_MODEL_DIR = PROJECT_ROOT / "onnx_models"   # exported / quantized ONNX graphs
 
 # ── Hybrid Search (BM25 + Vector) ───────────────────────────────────────────
 BM25_WEIGHT: float = 0.3              # weight for BM25 score in fusion (0.0 = vector only)
 VECTOR_WEIGHT: float = 0.7            # weight for vector score in fusion
+PARALLEL_CANDIDATE_SEARCH: bool = True  # run vector + BM25 search concurrently
+RETRIEVAL_WORKERS: int = 4            # thread pool size for concurrent retrieval stages
+
+# ── Query routing (pick the source document before search) ───────────────────
+# retrieve(router=QueryRouter(...)) turns the routed sources into a `where`
+# filter on this metadata field. Keywords are matched as whole words (an
+# optional trailing "s" allowed); queries matching no / every source fall
+# back to embedding-centroid routing, then to the whole corpus.
+ROUTING_FIELD: str = "source"
+ROUTING_KEYWORDS: dict[str, list[str]] = {
+    "cards.md": [
+        "card", "atm", "cash", "withdrawal", "withdraw", "apple pay", "google pay",
+        "digital wallet", "pin", "billing day", "declined", "travel insurance",
+    ],
+    "securities.md": [
+        "securities", "stock", "share", "trade", "trading", "mutual fund", "tase",
+        "dividend", "etf", "instruction", "stop-limit", "settlement", "portfolio",
+        "custody", "adr", "sec fee", "crypto",
+    ],
+}
+ROUTING_MIN_MARGIN: float = 0.02      # centroid routing: min cosine lead of the best source
 
 # ── Generation (Anthropic Claude) ────────────────────────────────────────────
 # LLM_MODEL: str = "claude-sonnet-4-5-20250514"
 LLM_MODEL: str = "gpt-4o"
 LLM_TEMPERATURE: float = 0.0
 LLM_MAX_TOKENS: int = 1024
+LLM_PROVIDER: str = "openai"          # "openai" | "offline" (local fake, no network)
+
+# ── Offline providers (CI / air-gapped benchmarks) ───────────────────────────
+OFFLINE_EMBEDDING_SEED: int = 0             # hash seed of "offline" embedding models
+OFFLINE_EMBEDDING_LATENCY_MS: float = 0.0   # simulated latency per embedding call
+OFFLINE_LLM_LATENCY_MS: float = 200.0       # simulated time to first token
+OFFLINE_LLM_TOKENS_PER_S: float = 50.0      # simulated generation rate (0 = instant)
 
 SYSTEM_PROMPT: str = (
     "You are a helpful ONE ZERO Bank assistant. "
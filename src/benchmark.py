@@ -0,0 +1,1052 @@
+"""
+benchmark.py — Latency / throughput benchmarks for the ONE ZERO RAG Chatbot.
+
+Quality metrics live in evaluation.py; this module measures speed of the
+individual pipeline stages so performance changes can be verified with numbers:
+1. RERANKING — cross-encoder latency per candidate count, with and without
+   length-bucketed batching; PyTorch vs ONNX Runtime (fp32 / int8) parity
+   and latency.
+2. EMBEDDING VARIANTS — fp32 vs quantized embedding models: retrieval quality
+   delta, model size, load time and query latency.
+3. EMBEDDING FORMATS — memory / time of handing vectors to the store as
+   list[list[float]] vs float32 arrays.
+4. MICRO-BATCHING — concurrent query embedding, direct vs micro-batched:
+   throughput, per-request latency and achieved batch sizes.
+5. STORE LOADING — load_vectorstore() cold (client + handle registry
+   cleared), reopened (cached client, fresh handle) and warm (cached handle).
+6. HNSW PARAMETERS — M / construction_ef / search_ef sweep against exact
+   brute-force search: recall@k, query latency, build time and index size.
+7. QUANTIZATION — int8 / product-quantized stores with float32 re-scoring vs
+   exact search: resident memory saved, recall lost and query latency.
+8. FILTERED SEARCH — whole corpus vs a single routed source (metadata `where`
+   filters, per-source BM25 sub-indexes) on a many-document corpus:
+   latency and off-source results.
+
+Usage in notebook:
+    from src.benchmark import benchmark_rerank, print_benchmark_table
+    rows = benchmark_rerank(chunks, candidate_counts=(20, 50, 100))
+    print_benchmark_table("RERANK LATENCY", rows)
+
+    rows = compare_reranker_backends(chunks)
+    print_benchmark_table("RERANKER BACKENDS", rows)
+
+    rows = benchmark_embedding_variants(chunks, ["BAAI/bge-m3", "BAAI/bge-m3@int8"])
+    print_benchmark_table("BGE-M3 fp32 vs int8", rows)
+
+    rows = benchmark_embedding_formats(n_vectors=20_000, dim=3072)
+    print_benchmark_table("EMBEDDING FORMATS (indexing)", rows)
+
+    rows = benchmark_micro_batching(get_embedding_model("BAAI/bge-m3"))
+    print_benchmark_table("MICRO-BATCHING", rows)
+
+    rows = benchmark_vectorstore_load(["text-embedding-3-small", "BAAI/bge-m3"])
+    print_benchmark_table("LOAD_VECTORSTORE cold vs warm", rows)
+
+    rows = benchmark_hnsw_params(n_vectors=50_000, dim=1536)
+    print_benchmark_table("HNSW recall vs latency", rows)
+
+    rows = benchmark_quantization(vectors=load_vectorstore(model, backend="numpy").vectors)
+    print_benchmark_table("QUANTIZATION memory vs recall", rows)
+
+    rows = benchmark_filtered_search(n_sources=24, docs_per_source=1_000)
+    print_benchmark_table("FILTERED SEARCH all vs routed source", rows)
+
+    # Offline (CI, no network): deterministic hash embeddings with simulated latency
+    rows = benchmark_micro_batching(HashEmbeddingModel("offline-hash-384", 384, latency_ms=20))
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import shutil
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from src.embeddings import EmbeddingModel, get_embedding_model
+from src.micro_batching import MicroBatchingEmbedder
+from src.numpy_store import NumpyVectorStore, normalize_rows, top_k_indices, where_key
+from src.evaluation import (
+    EVAL_DATASET,
+    EvalItem,
+    compute_retrieval_summary,
+    evaluate_retrieval,
+)
+from src.reranker import RERANKER_BACKENDS, Reranker, get_reranker
+from src.vectorstore import (
+    build_vectorstore,
+    get_vector_backend,
+    invalidate_vectorstore_cache,
+    load_vectorstore,
+    set_search_ef,
+)
+from config import DISTANCE_METRIC, TOP_K
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# HELPERS
+# ══════════════════════════════════════════════════════════════════════════════
+
+def latency_summary(samples_s: list[float]) -> dict[str, float]:
+    """Summarize latency samples (seconds) as mean / p50 / p95 / p99 in ms."""
+    if not samples_s:
+        return {"mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    ms = np.asarray(samples_s) * 1000
+    return {
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+    }
+
+
+def print_benchmark_table(title: str, rows: list[dict]) -> None:
+    """Pretty-print benchmark rows (list of flat dicts) as an aligned table."""
+    print(f"\n{'='*60}")
+    print(title)
+    print(f"{'='*60}")
+    if not rows:
+        print("  (no rows)")
+        return
+
+    columns = list(rows[0].keys())
+
+    def fmt(value) -> str:
+        if isinstance(value, float):
+            return f"{value:.3f}" if abs(value) < 1000 else f"{value:.0f}"
+        return str(value)
+
+    widths = {
+        c: max(len(c), *(len(fmt(r.get(c, ""))) for r in rows)) for c in columns
+    }
+    print("  " + "  ".join(c.rjust(widths[c]) for c in columns))
+    for r in rows:
+        print("  " + "  ".join(fmt(r.get(c, "")).rjust(widths[c]) for c in columns))
+    print()
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 1. RERANKING
+# ══════════════════════════════════════════════════════════════════════════════
+
+def benchmark_rerank(
+    chunks: list,
+    candidate_counts: tuple[int, ...] = (20, 50, 100),
+    queries: list[str] | None = None,
+    n_repeats: int = 3,
+    reranker: Reranker | None = None,
+    seed: int = 0,
+) -> list[dict]:
+    """Measure rerank() latency per candidate count, bucketed vs unsorted batches.
+
+    Candidates are random chunks from the corpus (mixing short sections and
+    long sub-chunks, like real fused candidate lists).
+
+    Parameters
+    ----------
+    chunks : list[Chunk]
+        Corpus to sample candidates from.
+    candidate_counts : tuple[int, ...]
+        Candidate list sizes to benchmark.
+    queries : list[str] | None
+        Queries to rerank for. Defaults to the EVAL_DATASET questions.
+    n_repeats : int
+        Timed passes over all queries per configuration.
+    reranker : Reranker | None
+        Reranker to benchmark. Defaults to the shared get_reranker() instance.
+    seed : int
+        Random seed for candidate sampling.
+
+    Returns
+    -------
+    list[dict]
+        One row per (candidate count, batching mode) with latency percentiles
+        and per-candidate cost.
+    """
+    reranker = reranker or get_reranker()
+    queries = queries or [item.question for item in EVAL_DATASET]
+    rng = np.random.default_rng(seed)
+    original_mode = reranker.sort_by_length
+
+    rows: list[dict] = []
+    try:
+        for n_candidates in candidate_counts:
+            picks = [
+                rng.choice(len(chunks), size=min(n_candidates, len(chunks)), replace=False)
+                for _ in queries
+            ]
+            for sort_by_length in (False, True):
+                reranker.sort_by_length = sort_by_length
+                # Warm-up (first call pays lazy init / allocation costs)
+                reranker.rerank(queries[0], [{"text": chunks[i].text} for i in picks[0]])
+
+                samples: list[float] = []
+                for _ in range(n_repeats):
+                    for query, pick in zip(queries, picks):
+                        candidates = [{"text": chunks[i].text} for i in pick]
+                        t0 = time.perf_counter()
+                        reranker.rerank(query, candidates, top_k=5)
+                        samples.append(time.perf_counter() - t0)
+
+                summary = latency_summary(samples)
+                rows.append({
+                    "n_candidates": n_candidates,
+                    "batching": "length-bucketed" if sort_by_length else "unsorted",
+                    **summary,
+                    "ms_per_candidate": summary["mean_ms"] / n_candidates,
+                })
+    finally:
+        reranker.sort_by_length = original_mode
+
+    return rows
+
+
+def compare_reranker_backends(
+    chunks: list,
+    backends: tuple[str, ...] = RERANKER_BACKENDS,
+    n_candidates: int = 20,
+    top_k: int = 5,
+    queries: list[str] | None = None,
+    n_repeats: int = 3,
+    seed: int = 0,
+) -> list[dict]:
+    """Compare reranker backends on identical candidate lists: ranking parity and latency.
+
+    The first backend in `backends` is the reference; every backend's top-k
+    is compared against it.
+
+    Parameters
+    ----------
+    chunks : list[Chunk]
+        Corpus to sample candidates from.
+    backends : tuple[str, ...]
+        Reranker backends ("torch", "onnx", "onnx-int8").
+    n_candidates : int
+        Candidates reranked per query.
+    top_k : int
+        Cut-off used for the parity metrics.
+    queries : list[str] | None
+        Queries to rerank for. Defaults to the EVAL_DATASET questions.
+    n_repeats : int
+        Timed passes over all queries per backend.
+    seed : int
+        Random seed for candidate sampling.
+
+    Returns
+    -------
+    list[dict]
+        One row per backend: latency percentiles, pairs/s, top-1 agreement,
+        exact top-k order agreement, mean top-k overlap, and the maximum
+        absolute score difference vs the reference.
+    """
+    queries = queries or [item.question for item in EVAL_DATASET]
+    rng = np.random.default_rng(seed)
+    picks = [
+        rng.choice(len(chunks), size=min(n_candidates, len(chunks)), replace=False)
+        for _ in queries
+    ]
+
+    def candidates_for(pick) -> list[dict]:
+        return [{"id": int(i), "text": chunks[i].text} for i in pick]
+
+    reference: dict | None = None
+    rows: list[dict] = []
+    for backend in backends:
+        reranker = Reranker(backend=backend)
+        reranker.rerank(queries[0], candidates_for(picks[0]))   # warm-up
+
+        samples: list[float] = []
+        ranked: list[list[dict]] = []
+        for repeat in range(n_repeats):
+            for query, pick in zip(queries, picks):
+                candidates = candidates_for(pick)
+                t0 = time.perf_counter()
+                result = reranker.rerank(query, candidates, top_k=len(candidates))
+                samples.append(time.perf_counter() - t0)
+                if repeat == 0:
+                    ranked.append(result)
+
+        top_ids = [[c["id"] for c in r[:top_k]] for r in ranked]
+        scores = [{c["id"]: c["rerank_score"] for c in r} for r in ranked]
+        if reference is None:
+            reference = {"top_ids": top_ids, "scores": scores}
+
+        summary = latency_summary(samples)
+        rows.append({
+            "backend": backend,
+            **summary,
+            "pairs_per_s": n_candidates / (summary["mean_ms"] / 1000) if summary["mean_ms"] else 0.0,
+            "top1_agree": float(np.mean([
+                a[0] == b[0] for a, b in zip(top_ids, reference["top_ids"])
+            ])),
+            f"top{top_k}_order_agree": float(np.mean([
+                a == b for a, b in zip(top_ids, reference["top_ids"])
+            ])),
+            f"top{top_k}_overlap": float(np.mean([
+                len(set(a) & set(b)) / max(len(b), 1)
+                for a, b in zip(top_ids, reference["top_ids"])
+            ])),
+            "max_score_diff": float(max(
+                abs(s[i] - ref[i]) for s, ref in zip(scores, reference["scores"]) for i in ref
+            )),
+        })
+        print(f"  ✅ {backend}: {summary['p50_ms']:.1f} ms p50")
+
+    return rows
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 2. EMBEDDING VARIANTS
+# ══════════════════════════════════════════════════════════════════════════════
+
+def benchmark_embedding_variants(
+    chunks: list,
+    model_names: list[str],
+    eval_dataset: list[EvalItem] = EVAL_DATASET,
+    top_k: int = TOP_K,
+    n_repeats: int = 3,
+) -> list[dict]:
+    """Compare embedding model variants (e.g. "BAAI/bge-m3" vs "BAAI/bge-m3@int8").
+
+    Each variant gets its own collection (and cache namespace), so retrieval
+    metrics reflect the variant's document *and* query vectors. The first
+    model is the reference for the delta columns.
+
+    Parameters
+    ----------
+    chunks : list[Chunk]
+        Chunks to index.
+    model_names : list[str]
+        Keys of config.EMBEDDING_MODELS; the first one is the reference.
+    eval_dataset : list[EvalItem]
+        Questions for retrieval metrics and query latency.
+    top_k : int
+        Results per query.
+    n_repeats : int
+        Timed passes of an uncached query embedding over all questions.
+
+    Returns
+    -------
+    list[dict]
+        One row per model: load time, model size (if the model reports it),
+        index embedding time, query latency percentiles, hit@5 / MRR and their
+        deltas vs the reference.
+    """
+    questions = [item.question for item in eval_dataset]
+    reference: dict | None = None
+    rows: list[dict] = []
+
+    for model_name in model_names:
+        t0 = time.perf_counter()
+        model = get_embedding_model(model_name)
+        load_s = time.perf_counter() - t0
+
+        collection, timings = build_vectorstore(chunks, model)
+        summary = compute_retrieval_summary(
+            evaluate_retrieval(model, collection, eval_dataset, top_k)
+        )
+
+        # Bypass the query LRU: repeats would otherwise all be cache hits
+        model._embed_queries_uncached([questions[0]])   # warm-up
+        samples: list[float] = []
+        for _ in range(n_repeats):
+            for question in questions:
+                t0 = time.perf_counter()
+                model._embed_queries_uncached([question])
+                samples.append(time.perf_counter() - t0)
+
+        if reference is None:
+            reference = summary
+        size_mb = model.model_size_mb() if hasattr(model, "model_size_mb") else float("nan")
+        rows.append({
+            "model": model_name,
+            "load_s": load_s,
+            "size_mb": size_mb,
+            "index_embed_s": timings.get("embedding_time_s", 0.0),
+            **{f"query_{k}": v for k, v in latency_summary(samples).items()},
+            "hit_rate_at_5": summary["hit_rate_at_5"],
+            "mrr": summary["mrr"],
+            "delta_hit_rate_at_5": summary["hit_rate_at_5"] - reference["hit_rate_at_5"],
+            "delta_mrr": summary["mrr"] - reference["mrr"],
+        })
+        print(f"  ✅ {model_name}: MRR={summary['mrr']:.3f}, load {load_s:.1f}s")
+
+    return rows
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 3. EMBEDDING FORMATS
+# ══════════════════════════════════════════════════════════════════════════════
+
+def benchmark_embedding_formats(
+    n_vectors: int = 20_000,
+    dim: int = 3072,
+    backend: str = "numpy",
+    seed: int = 0,
+) -> list[dict]:
+    """Indexing cost of list[list[float]] vs float32 arrays between model and store.
+
+    Synthetic vectors stand in for model output (so no API / model is needed).
+    The "list" path reproduces the previous pipeline: model array →
+    .tolist() → store. The "array" path hands the float32 matrix over as is.
+    Peak memory is the Python-heap peak from tracemalloc (NumPy allocations
+    included; ChromaDB's native index memory is not).
+
+    Parameters
+    ----------
+    n_vectors : int
+        Number of vectors to index.
+    dim : int
+        Vector dimension (3072 = text-embedding-3-large).
+    backend : str
+        "numpy" (NumpyVectorStore.write) or "chroma" (in-memory collection.add).
+    seed : int
+        Random seed.
+
+    Returns
+    -------
+    list[dict]
+        One row per format: conversion time, store write time, total time and
+        peak traced memory in MB.
+    """
+    rng = np.random.default_rng(seed)
+    model_output = rng.standard_normal((n_vectors, dim), dtype=np.float32)
+    ids = [f"doc_{i}" for i in range(n_vectors)]
+    documents = [""] * n_vectors
+    metadatas = [{"i": str(i)} for i in range(n_vectors)]
+
+    def write(vectors, tmp_dir: str, run: int) -> None:
+        if backend == "numpy":
+            NumpyVectorStore.write(tmp_dir, "bench", vectors, ids, documents, metadatas)
+        else:
+            import chromadb
+
+            collection = chromadb.EphemeralClient().create_collection(
+                f"bench_formats_{run}", metadata={"hnsw:space": "cosine"}
+            )
+            for i in range(0, n_vectors, 5000):
+                collection.add(
+                    ids=ids[i : i + 5000],
+                    embeddings=vectors[i : i + 5000],
+                    documents=documents[i : i + 5000],
+                    metadatas=metadatas[i : i + 5000],
+                )
+
+    def run_once(fmt: str, run: int) -> tuple[float, float]:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            t0 = time.perf_counter()
+            vectors = model_output.tolist() if fmt == "list" else model_output
+            t1 = time.perf_counter()
+            write(vectors, tmp_dir, run)
+            t2 = time.perf_counter()
+        return t1 - t0, t2 - t1
+
+    rows: list[dict] = []
+    for k, fmt in enumerate(("list", "array")):
+        # Timed pass untraced (tracemalloc slows per-object allocation down a lot),
+        # then a traced pass for the memory peak.
+        convert_s, write_s = run_once(fmt, 2 * k)
+        tracemalloc.start()
+        run_once(fmt, 2 * k + 1)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        rows.append({
+            "format": fmt,
+            "backend": backend,
+            "n_vectors": n_vectors,
+            "dim": dim,
+            "convert_s": convert_s,
+            "write_s": write_s,
+            "total_s": convert_s + write_s,
+            "peak_mb": peak / 1e6,
+        })
+        print(f"  ✅ {fmt}: {convert_s + write_s:.2f}s, peak {peak / 1e6:.0f} MB")
+
+    return rows
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 4. MICRO-BATCHING
+# ══════════════════════════════════════════════════════════════════════════════
+
+def benchmark_micro_batching(
+    model: EmbeddingModel,
+    n_requests: int = 256,
+    concurrency: int = 32,
+    settings: tuple[tuple[float, int, int], ...] = ((1.0, 8, 4), (5.0, 32, 4), (5.0, 32, 1)),
+    queries: list[str] | None = None,
+) -> list[dict]:
+    """Embed n_requests queries from `concurrency` threads, direct vs micro-batched.
+
+    Every request gets a unique query text, so the query LRU never answers
+    and every request really reaches the model.
+
+    Parameters
+    ----------
+    model : EmbeddingModel
+        Model to benchmark (called directly for the baseline row).
+    n_requests : int
+        Total embed_query() calls per configuration.
+    concurrency : int
+        Concurrent caller threads.
+    settings : tuple[tuple[float, int, int], ...]
+        (max_wait_ms, max_batch_size, max_in_flight) settings to try.
+    queries : list[str] | None
+        Query templates. Defaults to the EVAL_DATASET questions.
+
+    Returns
+    -------
+    list[dict]
+        One row per configuration: throughput (queries/s), per-request latency
+        percentiles, number of model calls and mean / max achieved batch size.
+    """
+    templates = queries or [item.question for item in EVAL_DATASET]
+
+    def run(embedder: EmbeddingModel, tag: str) -> tuple[float, list[float]]:
+        texts = [f"{templates[i % len(templates)]} ({tag} #{i})" for i in range(n_requests)]
+
+        def timed(text: str) -> float:
+            t0 = time.perf_counter()
+            embedder.embed_query_array(text)
+            return time.perf_counter() - t0
+
+        embedder.embed_query_array(f"warm-up {tag}")
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(timed, texts))
+        return time.perf_counter() - t0, samples
+
+    rows: list[dict] = []
+    wall_s, samples = run(model, "direct")
+    rows.append({
+        "mode": "direct",
+        "queries_per_s": n_requests / wall_s,
+        **latency_summary(samples),
+        "model_calls": n_requests,
+        "mean_batch": 1.0,
+        "max_batch": 1,
+    })
+
+    for max_wait_ms, max_batch_size, max_in_flight in settings:
+        embedder = MicroBatchingEmbedder(model, max_wait_ms, max_batch_size, max_in_flight)
+        try:
+            wall_s, samples = run(
+                embedder, f"mb{max_wait_ms}-{max_batch_size}-{max_in_flight}"
+            )
+            stats = embedder.batch_stats()
+        finally:
+            embedder.close()
+        rows.append({
+            "mode": f"micro {max_wait_ms:g}ms/{max_batch_size}/x{max_in_flight}",
+            "queries_per_s": n_requests / wall_s,
+            **latency_summary(samples),
+            "model_calls": stats["n_batches"] - 1,   # minus warm-up
+            "mean_batch": stats["mean_batch_size"],
+            "max_batch": stats["max_batch_size"],
+        })
+        print(f"  ✅ {rows[-1]['mode']}: {rows[-1]['queries_per_s']:.0f} q/s, "
+              f"mean batch {stats['mean_batch_size']:.1f}")
+
+    return rows
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 5. STORE LOADING — cold vs warm load_vectorstore()
+# ══════════════════════════════════════════════════════════════════════════════
+
+def benchmark_vectorstore_load(
+    model_names: list[str],
+    backend: str | None = None,
+    n_repeats: int = 20,
+) -> list[dict]:
+    """Time load_vectorstore() with and without the client / handle registry.
+
+    Stores must already exist (build_vectorstore). Modes:
+    - cold:   registry cleared before every load (new client + lookup, as a
+              process that re-opens the store on each request would do)
+    - reopen: cached client, handle cache bypassed (use_cache=False)
+    - warm:   cached handle (what repeated loads cost now)
+
+    The registry is left cleared afterwards; the next load re-populates it.
+
+    Parameters
+    ----------
+    model_names : list[str]
+        Models whose stores to load.
+    backend : str | None
+        "chroma" or "numpy". None = per-model default.
+    n_repeats : int
+        Loads timed per mode.
+
+    Returns
+    -------
+    list[dict]
+        One row per (model, mode): latency percentiles and speedup vs cold.
+    """
+    rows: list[dict] = []
+    for model_name in model_names:
+        model_backend = get_vector_backend(model_name, backend)
+
+        def timed_loads(clear: bool, use_cache: bool) -> list[float]:
+            samples = []
+            for _ in range(n_repeats):
+                if clear:
+                    invalidate_vectorstore_cache()
+                t0 = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):  # silence "✅ Loaded ..."
+                    load_vectorstore(model_name, model_backend, use_cache=use_cache)
+                samples.append(time.perf_counter() - t0)
+            return samples
+
+        results = {
+            "cold": timed_loads(clear=True, use_cache=True),
+            "reopen": timed_loads(clear=False, use_cache=False),
+            "warm": timed_loads(clear=False, use_cache=True),
+        }
+        cold_p50 = float(np.median(results["cold"]))
+        for mode, samples in results.items():
+            rows.append({
+                "model": model_name,
+                "backend": model_backend,
+                "mode": mode,
+                **latency_summary(samples),
+                "speedup_vs_cold": cold_p50 / max(float(np.median(samples)), 1e-9),
+            })
+        print(f"  ✅ {model_name} ({model_backend}): cold p50 {cold_p50 * 1000:.2f}ms, "
+              f"warm p50 {rows[-1]['p50_ms']:.4f}ms")
+
+    invalidate_vectorstore_cache()
+    return rows
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 6. HNSW PARAMETERS — recall vs latency against exact search
+# ══════════════════════════════════════════════════════════════════════════════
+
+def _dir_size_mb(path: Path) -> float:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / 1e6
+
+
+def _clustered_vectors(
+    n_vectors: int, dim: int, n_clusters: int, rng: np.random.Generator
+) -> np.ndarray:
+    """Unit vectors around random centroids (closer to real embeddings than iid noise)."""
+    centroids = rng.standard_normal((n_clusters, dim), dtype=np.float32)
+    assignment = rng.integers(0, n_clusters, n_vectors)
+    noise = rng.standard_normal((n_vectors, dim), dtype=np.float32)
+    return normalize_rows(centroids[assignment] + 0.8 * noise)
+
+
+def benchmark_hnsw_params(
+    n_vectors: int = 20_000,
+    dim: int = 384,
+    build_params: tuple[tuple[int, int], ...] = ((8, 100), (16, 100), (32, 200)),
+    search_efs: tuple[int, ...] = (10, 25, 50, 100, 200),
+    top_k: int = 10,
+    n_queries: int = 200,
+    vectors: np.ndarray | None = None,
+    seed: int = 0,
+) -> list[dict]:
+    """Sweep Chroma HNSW parameters against exact brute-force search.
+
+    Ground truth is the exact cosine top-k (one matrix multiply); the "exact"
+    row times the same search through NumpyVectorStore. For every
+    (M, construction_ef) a persistent collection is built in a temporary
+    directory. A loaded Chroma index keeps its search_ef, so each search_ef
+    is persisted with set_search_ef() and timed on a copy of the directory
+    opened by a fresh client (no rebuild needed).
+
+    Parameters
+    ----------
+    n_vectors, dim : int
+        Size of the synthetic clustered corpus (ignored if `vectors` given).
+    build_params : tuple[tuple[int, int], ...]
+        (M, construction_ef) pairs to build.
+    search_efs : tuple[int, ...]
+        search_ef values to query each build with.
+    top_k : int
+        k of recall@k.
+    n_queries : int
+        Queries (perturbed corpus vectors), timed one at a time.
+    vectors : np.ndarray | None
+        Real (n, dim) embeddings to use instead of synthetic ones, e.g.
+        load_vectorstore(model, backend="numpy").vectors.
+    seed : int
+        Random seed.
+
+    Returns
+    -------
+    list[dict]
+        One row per configuration: M, construction_ef, search_ef, recall@k,
+        p50 / p99 query latency, build time and on-disk index size
+        (hnsw_mb = HNSW segment files; disk_mb = incl. Chroma's SQLite copy).
+    """
+    import chromadb
+
+    rng = np.random.default_rng(seed)
+    if vectors is None:
+        vectors = _clustered_vectors(n_vectors, dim, max(n_vectors // 200, 10), rng)
+    vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+    n_vectors, dim = vectors.shape
+    picks = rng.integers(0, n_vectors, n_queries)
+    queries = normalize_rows(
+        vectors[picks] + 0.3 * rng.standard_normal((n_queries, dim), dtype=np.float32)
+        / np.sqrt(dim)
+    )
+    ids = [f"doc_{i}" for i in range(n_vectors)]
+    truth = top_k_indices(queries @ vectors.T, top_k)
+    truth_sets = [{ids[i] for i in row} for row in truth]
+
+    def recall(result_ids: list[list[str]]) -> float:
+        return float(np.mean([
+            len(truth_set.intersection(found)) / top_k
+            for truth_set, found in zip(truth_sets, result_ids)
+        ]))
+
+    def time_queries(collection) -> tuple[list[float], list[list[str]]]:
+        collection.query(query_embeddings=queries[:1], n_results=top_k)  # warm-up
+        samples, found = [], []
+        for q in queries:
+            t0 = time.perf_counter()
+            result = collection.query(query_embeddings=q[None, :], n_results=top_k, include=[])
+            samples.append(time.perf_counter() - t0)
+            found.append(result["ids"][0])
+        return samples, found
+
+    rows: list[dict] = []
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+        tmp_dir = Path(tmp)
+
+        store = NumpyVectorStore.write(
+            tmp_dir / "exact", "exact", vectors, ids, [""] * n_vectors, [{}] * n_vectors
+        )
+        samples, found = time_queries(store)
+        rows.append({
+            "index": "exact (numpy)", "M": "-", "construction_ef": "-", "search_ef": "-",
+            f"recall@{top_k}": recall(found),
+            **{k: v for k, v in latency_summary(samples).items() if k in ("p50_ms", "p99_ms")},
+            "build_s": 0.0,
+            "hnsw_mb": 0.0,
+            "disk_mb": _dir_size_mb(tmp_dir / "exact"),
+        })
+
+        for m, construction_ef in build_params:
+            path = tmp_dir / f"hnsw_M{m}_ef{construction_ef}"
+            client = chromadb.PersistentClient(path=str(path))
+            collection = client.create_collection(
+                f"bench_hnsw_{m}_{construction_ef}",
+                metadata={
+                    "hnsw:space": DISTANCE_METRIC,
+                    "hnsw:M": m,
+                    "hnsw:construction_ef": construction_ef,
+                    "hnsw:search_ef": search_efs[0],
+                },
+            )
+            batch = client.get_max_batch_size()
+            t0 = time.perf_counter()
+            for i in range(0, n_vectors, batch):
+                collection.add(ids=ids[i : i + batch], embeddings=vectors[i : i + batch])
+            build_s = time.perf_counter() - t0
+            segment_mb = sum(_dir_size_mb(d) for d in path.iterdir() if d.is_dir())
+
+            for search_ef in search_efs:
+                set_search_ef(collection, search_ef)
+                copy_path = tmp_dir / f"{path.name}_ef{search_ef}"
+                shutil.copytree(path, copy_path)
+                samples, found = time_queries(
+                    chromadb.PersistentClient(path=str(copy_path)).get_collection(collection.name)
+                )
+                rows.append({
+                    "index": "hnsw", "M": m, "construction_ef": construction_ef,
+                    "search_ef": search_ef,
+                    f"recall@{top_k}": recall(found),
+                    **{k: v for k, v in latency_summary(samples).items()
+                       if k in ("p50_ms", "p99_ms")},
+                    "build_s": build_s,
+                    "hnsw_mb": segment_mb,
+                    "disk_mb": _dir_size_mb(path),
+                })
+            best = rows[-1]
+            print(f"  ✅ M={m}, construction_ef={construction_ef}: built in {build_s:.1f}s, "
+                  f"recall@{top_k} {best[f'recall@{top_k}']:.3f} at search_ef={search_efs[-1]}")
+            client.delete_collection(collection.name)
+
+    return rows
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 7. QUANTIZATION — memory saved vs recall lost (int8 / PQ + float32 re-score)
+# ══════════════════════════════════════════════════════════════════════════════
+
+def benchmark_quantization(
+    n_vectors: int = 50_000,
+    dim: int = 1536,
+    methods: tuple[str, ...] = ("int8", "pq"),
+    rescore_factors: tuple[int, ...] = (0, 1, 4, 10),
+    top_k: int = 10,
+    n_queries: int = 200,
+    vectors: np.ndarray | None = None,
+    seed: int = 0,
+) -> list[dict]:
+    """Compare quantized stores with exact float32 search.
+
+    Ground truth is the exact cosine top-k; the "float32" row times the same
+    search through NumpyVectorStore. Each method is trained once, then
+    queried with every rescore_factor (0 = codes only, approximate ranking;
+    k = exact re-score of the top k × top_k candidates).
+
+    Parameters
+    ----------
+    n_vectors, dim : int
+        Size of the synthetic clustered corpus (ignored if `vectors` given).
+    methods : tuple[str, ...]
+        Quantization methods ("int8", "pq").
+    rescore_factors : tuple[int, ...]
+        Candidate multipliers for the float32 re-score.
+    top_k : int
+        k of recall@k.
+    n_queries : int
+        Queries (perturbed corpus vectors), timed one at a time.
+    vectors : np.ndarray | None
+        Real (n, dim) embeddings, e.g. load_vectorstore(model, backend="numpy").vectors.
+    seed : int
+        Random seed.
+
+    Returns
+    -------
+    list[dict]
+        One row per (method, rescore_factor): resident index MB vs float32 MB,
+        compression, recall@k (and recall lost vs exact), p50 / p99 latency
+        and quantizer build time.
+    """
+    from src.quantized_store import QuantizedVectorStore
+
+    rng = np.random.default_rng(seed)
+    if vectors is None:
+        vectors = _clustered_vectors(n_vectors, dim, max(n_vectors // 200, 10), rng)
+    vectors = normalize_rows(np.asarray(vectors, dtype=np.float32))
+    n_vectors, dim = vectors.shape
+    picks = rng.integers(0, n_vectors, n_queries)
+    queries = normalize_rows(
+        vectors[picks] + 0.3 * rng.standard_normal((n_queries, dim), dtype=np.float32)
+        / np.sqrt(dim)
+    )
+    ids = [f"doc_{i}" for i in range(n_vectors)]
+    truth = top_k_indices(queries @ vectors.T, top_k)
+    truth_sets = [{ids[i] for i in row} for row in truth]
+    float32_mb = vectors.nbytes / 1e6
+
+    def measure(store) -> tuple[float, dict[str, float]]:
+        store.query(query_embeddings=queries[:1], n_results=top_k)  # warm-up
+        samples, hits = [], []
+        for q, truth_set in zip(queries, truth_sets):
+            t0 = time.perf_counter()
+            result = store.query(query_embeddings=q[None, :], n_results=top_k, include=[])
+            samples.append(time.perf_counter() - t0)
+            hits.append(len(truth_set.intersection(result["ids"][0])) / top_k)
+        latency = latency_summary(samples)
+        return float(np.mean(hits)), {k: latency[k] for k in ("p50_ms", "p99_ms")}
+
+    rows: list[dict] = []
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+        tmp_dir = Path(tmp)
+        docs, metas = [""] * n_vectors, [{}] * n_vectors
+
+        store = NumpyVectorStore.write(tmp_dir / "float32", "float32", vectors, ids, docs, metas)
+        recall, latency = measure(store)
+        rows.append({
+            "method": "float32", "rescore_factor": "-",
+            "resident_mb": float32_mb, "float32_mb": float32_mb, "compression": 1.0,
+            f"recall@{top_k}": recall, "recall_lost": 0.0, **latency, "build_s": 0.0,
+        })
+        exact_recall = recall
+
+        for method in methods:
+            t0 = time.perf_counter()
+            store = QuantizedVectorStore.write(
+                tmp_dir / method, method, vectors, ids, docs, metas, method=method, seed=seed
+            )
+            build_s = time.perf_counter() - t0
+            report = store.memory_report()
+            for factor in rescore_factors:
+                store.rescore_factor = factor
+                recall, latency = measure(store)
+                rows.append({
+                    "method": method, "rescore_factor": factor,
+                    "resident_mb": report["resident_mb"], "float32_mb": float32_mb,
+                    "compression": report["compression"],
+                    f"recall@{top_k}": recall, "recall_lost": exact_recall - recall,
+                    **latency, "build_s": build_s,
+                })
+            print(f"  ✅ {method}: {report['compression']:.0f}x smaller "
+                  f"({report['saved_mb']:.1f} MB saved), built in {build_s:.1f}s, "
+                  f"recall@{top_k} {rows[-1][f'recall@{top_k}']:.3f} "
+                  f"at rescore_factor={rescore_factors[-1]}")
+
+    return rows
+
+
+# ══════════════════════════════════════════════════════════════════════════════
+# 8. FILTERED SEARCH — whole corpus vs one routed source
+# ══════════════════════════════════════════════════════════════════════════════
+
+def benchmark_filtered_search(
+    n_sources: int = 24,
+    docs_per_source: int = 1_000,
+    dim: int = 384,
+    top_k: int = 10,
+    n_queries: int = 100,
+    seed: int = 0,
+) -> list[dict]:
+    """Search latency and noise with and without a per-source `where` filter.
+
+    Simulates a corpus grown to many product documents: n_sources synthetic
+    sources, each with its own vector cluster and vocabulary (plus shared
+    words). Every query comes from one source; "filtered" rows search only
+    that source (as retrieve(router=...) does when routing is right):
+    NumpyVectorStore and Chroma with where=, BM25 full index with a mask vs
+    PartitionedBM25Index sub-indexes.
+
+    Parameters
+    ----------
+    n_sources, docs_per_source : int
+        Corpus shape.
+    dim : int
+        Vector dimension.
+    top_k : int
+        Results per query.
+    n_queries : int
+        Queries, timed one at a time.
+    seed : int
+        Random seed.
+
+    Returns
+    -------
+    list[dict]
+        One row per (backend, scope): p50 / p99 latency, speedup of the
+        filtered search, and off_source@k — share of results from other
+        sources (the noise a filter removes).
+    """
+    import chromadb
+
+    from src.bm25 import BM25Index, PartitionedBM25Index
+    from src.chunking import Chunk, get_chunk_ids
+
+    rng = np.random.default_rng(seed)
+    n_docs = n_sources * docs_per_source
+    sources = [f"product_{s:02d}.md" for s in range(n_sources)]
+    labels = np.repeat(np.arange(n_sources), docs_per_source)
+
+    centroids = rng.standard_normal((n_sources, dim), dtype=np.float32)
+    vectors = normalize_rows(
+        centroids[labels] + 3.0 * rng.standard_normal((n_docs, dim), dtype=np.float32)
+    )
+    shared_vocab = [f"w{i}" for i in range(2_000)]
+    texts = [
+        " ".join(
+            [f"s{label}t{t}" for t in rng.integers(0, 300, 8)]
+            + [shared_vocab[t] for t in rng.integers(0, len(shared_vocab), 40)]
+        )
+        for label in labels.tolist()
+    ]
+    chunks = [
+        Chunk(text, {"source": sources[label], "section_path": f"s{i}", "chunk_index": 0})
+        for i, (text, label) in enumerate(zip(texts, labels.tolist()))
+    ]
+    ids = get_chunk_ids(chunks)
+    metadatas = [{"source": c.metadata["source"]} for c in chunks]
+
+    picks = rng.integers(0, n_docs, n_queries)
+    query_labels = labels[picks]
+    query_vectors = normalize_rows(
+        vectors[picks] + 0.5 * rng.standard_normal((n_queries, dim), dtype=np.float32)
+        / np.sqrt(dim)
+    )
+    query_texts = [" ".join(rng.permutation(texts[p].split())[:6]) for p in picks.tolist()]
+    wheres = [{"source": sources[label]} for label in query_labels.tolist()]
+
+    def run(search, queries) -> tuple[list[float], float]:
+        for where in {where_key(w): w for w in wheres}.values():   # warm-up + filter caches
+            search(queries[0], where)
+        samples, off_source = [], []
+        for q, where, label in zip(queries, wheres, query_labels.tolist()):
+            t0 = time.perf_counter()
+            found_sources = search(q, where)
+            samples.append(time.perf_counter() - t0)
+            if found_sources:
+                off_source.append(np.mean([s != sources[label] for s in found_sources]))
+        return samples, float(np.mean(off_source)) if off_source else 0.0
+
+    rows: list[dict] = []
+
+    def add_rows(backend: str, search, queries) -> None:
+        full_samples, full_noise = run(lambda q, where: search(q, None), queries)
+        filtered_samples, filtered_noise = run(search, queries)
+        full, filtered = latency_summary(full_samples), latency_summary(filtered_samples)
+        for scope, latency, noise, docs in (
+            ("all sources", full, full_noise, n_docs),
+            ("routed source", filtered, filtered_noise, docs_per_source),
+        ):
+            rows.append({
+                "backend": backend, "scope": scope, "docs_searched": docs,
+                "p50_ms": latency["p50_ms"], "p99_ms": latency["p99_ms"],
+                "speedup": full["p50_ms"] / latency["p50_ms"],
+                f"off_source@{top_k}": noise,
+            })
+        print(f"  ✅ {backend}: p50 {full['p50_ms']:.2f} → {filtered['p50_ms']:.2f} ms, "
+              f"off-source results {full_noise:.1%} → {filtered_noise:.1%}")
+
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+        tmp_dir = Path(tmp)
+
+        store = NumpyVectorStore.write(
+            tmp_dir / "numpy", "filtered", vectors, ids, texts, metadatas
+        )
+        add_rows("numpy", lambda q, where: [
+            m["source"] for m in store.query(
+                q[None, :], n_results=top_k, include=["metadatas"], where=where
+            )["metadatas"][0]
+        ], query_vectors)
+
+        client = chromadb.PersistentClient(path=str(tmp_dir / "chroma"))
+        collection = client.create_collection(
+            "bench_filtered", metadata={"hnsw:space": DISTANCE_METRIC}
+        )
+        batch = client.get_max_batch_size()
+        for i in range(0, n_docs, batch):
+            collection.add(
+                ids=ids[i : i + batch],
+                embeddings=vectors[i : i + batch],
+                metadatas=metadatas[i : i + batch],
+            )
+        add_rows("chroma", lambda q, where: [
+            m["source"] for m in collection.query(
+                query_embeddings=q[None, :], n_results=top_k, include=["metadatas"],
+                where=where,
+            )["metadatas"][0]
+        ], query_vectors)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        full_index = BM25Index(chunks)
+        partitioned = PartitionedBM25Index(
+            full=full_index,
+            partitions={
+                source: BM25Index([c for c in chunks if c.metadata["source"] == source])
+                for source in sources
+            },
+            field="source",
+        )
+    add_rows("bm25 (mask)", lambda q, where: [
+        r["metadata"]["source"] for r in full_index.search(q, top_k, where=where)
+    ], query_texts)
+    add_rows("bm25 (per-source)", lambda q, where: [
+        r["metadata"]["source"] for r in partitioned.search(q, top_k, where=where)
+    ], query_texts)
+
+    return rows
@@ -0,0 +1,677 @@
+"""
+bm25.py — Sparse-matrix BM25 keyword index for the ONE ZERO RAG Chatbot.
+
+Implements BM25Okapi (k1=1.5, b=0.75, epsilon=0.25 — the rank_bm25 defaults)
+on a precomputed term-document weight matrix in CSR layout:
+
+    row t of the matrix = documents containing term t, with weight
+    idf(t) * tf * (k1 + 1) / (tf + k1 * (1 - b + b * doc_len / avgdl))
+
+A query score is then the sum of its terms' rows (a sparse row-slice sum),
+and top-k selection uses np.argpartition instead of a full argsort. Scores
+are bit-for-bit identical to rank_bm25.BM25Okapi.get_scores(): weights are
+computed with the same expression and accumulated in the same term order.
+Rankings match the original np.argsort(scores)[::-1] too, tied scores
+included (rows with ties fall back to that call).
+
+The CSR arrays (indptr / indices / data) are plain NumPy, so the index has
+no dependency beyond numpy.
+
+Persistence: save() writes the vocabulary, document frequencies, document
+lengths and postings to bm25_index/ (next to vectorstore_db/); load()
+validates them against a corpus fingerprint and memory-maps the arrays.
+get_bm25_index() keeps one index per corpus fingerprint for the whole process,
+so the index is built at most once per corpus, ever.
+
+Metadata filters: search(where=...) takes a ChromaDB-style filter and drops
+non-matching documents from the scores. PartitionedBM25Index goes further and
+keeps one sub-index per value of a metadata field (e.g. source), so a query
+filtered to one source only scans that source's postings.
+
+Usage:
+    bm25_index = get_bm25_index(chunks)          # registry → disk → build
+    results = bm25_index.search("ONE PLUS fees", top_k=20)
+    batched = bm25_index.search_many(["apple pay", "dividends"], top_k=20)
+
+    by_source = get_partitioned_bm25_index(chunks)     # one sub-index per source
+    results = by_source.search("dividends", where={"source": "securities.md"})
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from src.chunking import corpus_fingerprint, corpus_key, get_chunk_ids, store_metadata
+from src.numpy_store import metadata_mask, top_k_indices, where_key
+from config import BM25_PERSIST_DIR
+
+
+_SEARCH_MANY_BLOCK: int = 1024   # queries scored per dense score block
+
+# Persisted artifact layout
+_FORMAT_VERSION: int = 1
+_MANIFEST_FILE = "manifest.json"
+_VOCAB_FILE = "vocab.json"
+_ARRAY_NAMES: tuple[str, ...] = (
+    "doc_freq", "doc_len", "idf", "indptr", "indices", "tf", "data",
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Tokenize for BM25: lowercase, split on whitespace."""
+    return text.lower().split()
+
+
+# ── Shared lexical-index helpers ─────────────────────────────────────────────
+
+def _top_k_like_argsort(scores: np.ndarray, k: int) -> np.ndarray:
+    """top_k_indices(), with tied positive scores ordered as np.argsort(row)[::-1] orders them.
+
+    The original search ranked with a full np.argsort(scores)[::-1], whose
+    order among equal scores is implementation-defined. Rows whose top k
+    (or the k-th place) contain a tie of positive scores fall back to that
+    exact call, so results match it; all other rows keep the argpartition path.
+    """
+    top = top_k_indices(scores, k)
+    if top.shape[1] == 0:
+        return top
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    kth = top_scores[:, -1:]
+    tied = ((top_scores[:, 1:] == top_scores[:, :-1]) & (top_scores[:, 1:] > 0)).any(axis=1)
+    tied |= (kth[:, 0] > 0) & ((scores == kth).sum(axis=1) > (top_scores == kth).sum(axis=1))
+    for row in np.flatnonzero(tied):
+        top[row] = np.argsort(scores[row])[::-1][: top.shape[1]]
+    return top
+
+
+class LexicalIndexMixin:
+    """Metadata filtering and result formatting shared by the lexical indexes.
+
+    Used by BM25Index and sparse_index.LearnedSparseIndex, which both score
+    every chunk into a dense array and return the top-k as result dicts.
+    Subclasses set `chunks` and `ids`, call _init_filters(), and name their
+    score field with SCORE_KEY.
+    """
+
+    SCORE_KEY: str = "score"
+
+    chunks: list
+    ids: list[str]
+
+    def _init_filters(self) -> None:
+        self._where_masks: dict[str, np.ndarray] = {}
+
+    def where_mask(self, where: dict | None) -> np.ndarray | None:
+        """Documents matching a metadata filter (cached per filter; None = all)."""
+        if not where:
+            return None
+        key = where_key(where)
+        mask = self._where_masks.get(key)
+        if mask is None:
+            # Same string form the vector stores filter on (chunk_index "0", not 0)
+            mask = metadata_mask([store_metadata(c) for c in self.chunks], where)
+            self._where_masks[key] = mask
+        return mask
+
+    def _format_results(self, scores: np.ndarray, top_indices: np.ndarray) -> list[dict]:
+        """Turn top-k document indices into result dicts (non-zero scores only)."""
+        results = []
+        for idx in top_indices:
+            if scores[idx] > 0:  # only include non-zero matches
+                chunk = self.chunks[idx]
+                results.append({
+                    "text": chunk.text,
+                    "metadata": chunk.metadata,
+                    self.SCORE_KEY: float(scores[idx]),
+                    "id": self.ids[idx],
+                })
+        return results
+
+
+# ── BM25 Index ───────────────────────────────────────────────────────────────
+
+class BM25Index(LexicalIndexMixin):
+    """BM25 keyword search index over chunk texts.
+
+    Built once from all chunks, then queried per user question.
+    Tokenization is simple whitespace + lowercasing — sufficient
+    for English bank policy documents.
+    """
+
+    SCORE_KEY = "bm25_score"
+
+    def __init__(
+        self,
+        chunks: list,
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+    ) -> None:
+        """Build BM25 index from chunks.
+
+        Parameters
+        ----------
+        chunks : list[Chunk]
+            All chunks (same set used for vector store).
+        k1, b, epsilon : float
+            BM25Okapi parameters (rank_bm25 defaults).
+        """
+        self._init_corpus(chunks, k1, b, epsilon)
+        self._build([tokenize(text) for text in self.texts])
+        print(f"  ✅ BM25 index built: {len(chunks)} documents, "
+              f"{len(self.vocab)} terms, {len(self.data)} postings")
+
+    def _init_corpus(self, chunks: list, k1: float, b: float, epsilon: float) -> None:
+        """Set the corpus-level attributes shared by building and loading."""
+        self.chunks = chunks
+        self.texts = [c.text for c in chunks]
+        self.ids = get_chunk_ids(chunks)  # same IDs as the vector store
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self._init_filters()
+
+    def _build(self, tokenized: list[list[str]]) -> None:
+        """Compute vocabulary, statistics and the CSR weight matrix."""
+        n_docs = len(tokenized)
+
+        # Vocabulary in first-appearance order (same order rank_bm25 sums IDFs in)
+        vocab: dict[str, int] = {}
+        postings: list[list[tuple[int, int]]] = []
+        doc_len = np.zeros(n_docs, dtype=np.int64)
+        for doc_idx, tokens in enumerate(tokenized):
+            doc_len[doc_idx] = len(tokens)
+            frequencies: dict[str, int] = {}
+            for token in tokens:
+                frequencies[token] = frequencies.get(token, 0) + 1
+            for token, tf in frequencies.items():
+                term_id = vocab.setdefault(token, len(vocab))
+                if term_id == len(postings):
+                    postings.append([])
+                postings[term_id].append((doc_idx, tf))
+
+        doc_freq = np.array([len(p) for p in postings], dtype=np.int64)
+
+        # IDF with epsilon floor, exactly as BM25Okapi._calc_idf
+        idf = np.empty(len(vocab), dtype=np.float64)
+        idf_sum = 0.0
+        for term_id, df in enumerate(doc_freq.tolist()):
+            value = math.log(n_docs - df + 0.5) - math.log(df + 0.5)
+            idf[term_id] = value
+            idf_sum += value
+        average_idf = idf_sum / len(vocab) if len(vocab) else 0.0
+        idf[idf < 0] = self.epsilon * average_idf
+
+        # CSR layout: term rows, document columns
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(doc_freq)
+        indices = np.fromiter(
+            (doc for p in postings for doc, _ in p), dtype=np.int32, count=int(indptr[-1])
+        )
+        tf = np.fromiter(
+            (f for p in postings for _, f in p), dtype=np.int64, count=int(indptr[-1])
+        )
+
+        self.vocab = vocab
+        self.doc_freq = doc_freq
+        self.doc_len = doc_len
+        self.avgdl = float(doc_len.sum()) / n_docs if n_docs else 0.0
+        self.idf = idf
+        self.indptr = indptr
+        self.indices = indices
+        self.tf = tf
+        self.data = self._weights(idf, indptr, indices, tf)
+
+    def _weights(
+        self,
+        idf: np.ndarray,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        tf: np.ndarray,
+    ) -> np.ndarray:
+        """Per-posting BM25 weights (same expression as BM25Okapi.get_scores)."""
+        if len(tf) == 0:
+            return np.zeros(0, dtype=np.float64)
+        term_idf = np.repeat(idf, np.diff(indptr))
+        dl = self.doc_len[indices]
+        return term_idf * (tf * (self.k1 + 1) /
+                           (tf + self.k1 * (1 - self.b + self.b * dl / self.avgdl)))
+
+    # ── Persistence ──
+
+    def save(self, path: str | Path = BM25_PERSIST_DIR) -> Path:
+        """Write the index statistics and postings to disk.
+
+        The manifest (with the corpus fingerprint) is written last, so an
+        interrupted save leaves no artifact that load() would accept.
+
+        Parameters
+        ----------
+        path : str | Path
+            Target directory (created if needed; existing artifact replaced).
+
+        Returns
+        -------
+        Path
+            The artifact directory.
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        (path / _MANIFEST_FILE).unlink(missing_ok=True)
+
+        for name in _ARRAY_NAMES:
+            np.save(path / f"{name}.npy", np.asarray(getattr(self, name)))
+        terms = sorted(self.vocab, key=self.vocab.__getitem__)
+        (path / _VOCAB_FILE).write_text(json.dumps(terms), encoding="utf-8")
+
+        manifest = {
+            "format_version": _FORMAT_VERSION,
+            "fingerprint": corpus_fingerprint(self.chunks),
+            "n_docs": len(self.chunks),
+            "avgdl": self.avgdl,
+            "k1": self.k1,
+            "b": self.b,
+            "epsilon": self.epsilon,
+        }
+        tmp_manifest = path / f".{_MANIFEST_FILE}.tmp"
+        tmp_manifest.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        os.replace(tmp_manifest, path / _MANIFEST_FILE)
+        print(f"  ✅ BM25 index saved to {path}")
+        return path
+
+    @classmethod
+    def load(
+        cls,
+        chunks: list,
+        path: str | Path = BM25_PERSIST_DIR,
+        k1: float = 1.5,
+        b: float = 0.75,
+        epsilon: float = 0.25,
+    ) -> "BM25Index":
+        """Load a persisted index for the given chunks (arrays are memory-mapped).
+
+        Parameters
+        ----------
+        chunks : list[Chunk]
+            The corpus the index must have been built from.
+        path : str | Path
+            Artifact directory written by save().
+        k1, b, epsilon : float
+            Expected BM25Okapi parameters.
+
+        Returns
+        -------
+        BM25Index
+            Ready-to-search index.
+
+        Raises
+        ------
+        ValueError
+            If no artifact exists, or it was built from a different corpus,
+            with different parameters, or by an incompatible format version.
+        """
+        path = Path(path)
+        manifest_path = path / _MANIFEST_FILE
+        if not manifest_path.exists():
+            raise ValueError(f"No BM25 index found at {path}")
+
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if manifest.get("format_version") != _FORMAT_VERSION:
+            raise ValueError(f"BM25 index at {path} has an incompatible format version")
+        if manifest["fingerprint"] != corpus_fingerprint(chunks):
+            raise ValueError(f"BM25 index at {path} was built from a different corpus")
+        if (manifest["k1"], manifest["b"], manifest["epsilon"]) != (k1, b, epsilon):
+            raise ValueError(f"BM25 index at {path} was built with different parameters")
+
+        index = cls.__new__(cls)
+        index._init_corpus(chunks, k1, b, epsilon)
+        terms = json.loads((path / _VOCAB_FILE).read_text(encoding="utf-8"))
+        index.vocab = {term: term_id for term_id, term in enumerate(terms)}
+        for name in _ARRAY_NAMES:
+            setattr(index, name, np.load(path / f"{name}.npy", mmap_mode="r"))
+        index.avgdl = manifest["avgdl"]
+
+        print(f"  ✅ BM25 index loaded from {path}: {len(chunks)} documents, "
+              f"{len(index.vocab)} terms")
+        return index
+
+    # ── Scoring ──
+
+    def _term_ids(self, query: str) -> list[int]:
+        """Vocabulary IDs of the query tokens (repeats kept, unknown terms dropped)."""
+        return [self.vocab[t] for t in tokenize(query) if t in self.vocab]
+
+    def get_scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for one query.
+
+        Parameters
+        ----------
+        query : str
+            User question.
+
+        Returns
+        -------
+        np.ndarray
+            float64 array of shape (n_docs,).
+        """
+        scores = np.zeros(len(self.chunks), dtype=np.float64)
+        for term_id in self._term_ids(query):
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            scores[self.indices[start:end]] += self.data[start:end]
+        return scores
+
+    def get_scores_many(self, queries: list[str]) -> np.ndarray:
+        """BM25 scores for a batch of queries as one dense score block.
+
+        Parameters
+        ----------
+        queries : list[str]
+            User questions.
+
+        Returns
+        -------
+        np.ndarray
+            float64 array of shape (n_queries, n_docs); row i equals
+            get_scores(queries[i]).
+        """
+        scores = np.zeros((len(queries), len(self.chunks)), dtype=np.float64)
+        for q_idx, query in enumerate(queries):
+            row = scores[q_idx]
+            for term_id in self._term_ids(query):
+                start, end = self.indptr[term_id], self.indptr[term_id + 1]
+                row[self.indices[start:end]] += self.data[start:end]
+        return scores
+
+    def search(self, query: str, top_k: int = 20, where: dict | None = None) -> list[dict]:
+        """Search for relevant chunks using BM25 keyword matching.
+
+        Parameters
+        ----------
+        query : str
+            User question.
+        top_k : int
+            Number of results to return.
+        where : dict | None
+            ChromaDB-style metadata filter; non-matching chunks are dropped.
+
+        Returns
+        -------
+        list[dict]
+            Results with text, metadata, bm25_score. Sorted by score descending.
+        """
+        scores = self.get_scores(query)
+        mask = self.where_mask(where)
+        if mask is not None:
+            scores[~mask] = 0.0
+        top_indices = _top_k_like_argsort(scores[None, :], top_k)[0]
+        return self._format_results(scores, top_indices)
+
+    def search_many(
+        self,
+        queries: list[str],
+        top_k: int = 20,
+        where: dict | list[dict | None] | None = None,
+    ) -> list[list[dict]]:
+        """Batched search(): one result list per query, same format and order.
+
+        Parameters
+        ----------
+        queries : list[str]
+            User questions.
+        top_k : int
+            Number of results per query.
+        where : dict | list[dict | None] | None
+            Metadata filter for all queries, or one per query.
+
+        Returns
+        -------
+        list[list[dict]]
+            One search() result list per query.
+        """
+        if isinstance(where, (list, tuple)):
+            return _search_grouped(self.search_many, queries, top_k, where)
+
+        mask = self.where_mask(where)
+        all_results: list[list[dict]] = []
+        for start in range(0, len(queries), _SEARCH_MANY_BLOCK):
+            block = queries[start : start + _SEARCH_MANY_BLOCK]
+            scores = self.get_scores_many(block)
+            if mask is not None:
+                scores[:, ~mask] = 0.0
+            top_indices = _top_k_like_argsort(scores, top_k)
+            for row_scores, row_top in zip(scores, top_indices):
+                all_results.append(self._format_results(row_scores, row_top))
+        return all_results
+
+    def __repr__(self) -> str:
+        return f"BM25Index(docs={len(self.chunks)}, terms={len(self.vocab)})"
+
+
+def _search_grouped(
+    search_many,
+    queries: list[str],
+    top_k: int,
+    where: list[dict | None],
+) -> list[list[dict]]:
+    """Run search_many once per distinct filter and restore the query order."""
+    if len(where) != len(queries):
+        raise ValueError(f"Got {len(where)} where filters for {len(queries)} queries")
+    groups: dict[str, list[int]] = {}
+    for i, query_where in enumerate(where):
+        groups.setdefault(where_key(query_where or None), []).append(i)
+    output: list[list[dict]] = [[] for _ in queries]
+    for members in groups.values():
+        group_results = search_many([queries[i] for i in members], top_k, where[members[0]])
+        for i, results in zip(members, group_results):
+            output[i] = results
+    return output
+
+
+# ── Partitioned index (one sub-index per metadata value) ─────────────────────
+
+def _partition_slug(value: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", value.lower()).strip("_") or "_empty"
+
+
+class PartitionedBM25Index:
+    """BM25 sub-indexes, one per value of a metadata field (default: source).
+
+    A query whose `where` filter pins the field ({"source": "cards.md"},
+    {"source": {"$in": [...]}}, possibly inside "$and") is scored only
+    against the matching sub-indexes; any remaining conditions are applied
+    as a mask inside them. Unfiltered queries use the full-corpus index.
+
+    Each sub-index has its own IDF / average-length statistics, so a
+    single-partition search ranks documents as a BM25 index over that slice
+    would. Results merged from several partitions are ordered by their
+    per-partition scores — fine for rank fusion, not comparable to the
+    full index's scores.
+    """
+
+    def __init__(
+        self,
+        full: BM25Index,
+        partitions: dict[str, BM25Index],
+        field: str,
+    ) -> None:
+        """Wrap a full-corpus index and its per-value sub-indexes.
+
+        Use get_partitioned_bm25_index() rather than calling this directly.
+        """
+        self.full = full
+        self.partitions = partitions
+        self.field = field
+        self.chunks = full.chunks
+
+    def _split_where(self, where: dict | None) -> tuple[list[str] | None, dict | None]:
+        """(partition values the filter allows, remaining filter); None = all partitions."""
+        if not where:
+            return None, None
+        residual = {k: v for k, v in where.items() if k not in (self.field, "$and")}
+        condition = where.get(self.field)
+        if "$and" in where:
+            rest = []
+            for clause in where["$and"]:
+                if condition is None and list(clause) == [self.field]:
+                    condition = clause[self.field]
+                else:
+                    rest.append(clause)
+            if rest:
+                residual["$and"] = rest
+        if condition is None:
+            return None, where
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        if set(condition) == {"$eq"}:
+            values = [condition["$eq"]]
+        elif set(condition) == {"$in"}:
+            values = list(condition["$in"])
+        else:   # $ne / $nin / ranges: filter by mask inside every partition
+            return None, where
+        return [str(v) for v in values], residual or None
+
+    def search(self, query: str, top_k: int = 20, where: dict | None = None) -> list[dict]:
+        """BM25Index.search() over the partitions selected by `where`."""
+        return self.search_many([query], top_k, where)[0]
+
+    def search_many(
+        self,
+        queries: list[str],
+        top_k: int = 20,
+        where: dict | list[dict | None] | None = None,
+    ) -> list[list[dict]]:
+        """BM25Index.search_many() over the partitions selected by `where`."""
+        if isinstance(where, (list, tuple)):
+            return _search_grouped(self.search_many, queries, top_k, where)
+
+        values, residual = self._split_where(where)
+        if values is None:
+            return self.full.search_many(queries, top_k, residual)
+        indexes = [self.partitions[v] for v in values if v in self.partitions]
+        if len(indexes) == 1:
+            return indexes[0].search_many(queries, top_k, residual)
+
+        merged: list[list[dict]] = [[] for _ in queries]
+        for index in indexes:
+            for results, partial in zip(merged, index.search_many(queries, top_k, residual)):
+                results.extend(partial)
+        return [
+            sorted(results, key=lambda r: r["bm25_score"], reverse=True)[:top_k]
+            for results in merged
+        ]
+
+    def __repr__(self) -> str:
+        sizes = {value: len(index.chunks) for value, index in self.partitions.items()}
+        return f"PartitionedBM25Index(field={self.field!r}, partitions={sizes})"
+
+
+# ── Registry (process-wide) ──────────────────────────────────────────────────
+
+_registry: dict[str, BM25Index] = {}
+_registry_lock = threading.Lock()
+
+
+def get_bm25_index(
+    chunks: list,
+    path: str | Path = BM25_PERSIST_DIR,
+    persist: bool = True,
+) -> BM25Index:
+    """Get the BM25 index for a chunk set, building it at most once.
+
+    Lookup order: in-process registry (keyed by corpus fingerprint, memoized
+    per chunk list — see chunking.corpus_key) → persisted artifact on disk →
+    fresh build (saved to disk if persist=True).
+
+    Parameters
+    ----------
+    chunks : list[Chunk]
+        All chunks (same set used for vector store).
+    path : str | Path
+        Artifact directory.
+    persist : bool
+        If True, save freshly built indexes to disk.
+
+    Returns
+    -------
+    BM25Index
+        Shared index instance for this corpus.
+    """
+    fingerprint = corpus_key(chunks)
+    with _registry_lock:
+        index = _registry.get(fingerprint)
+        if index is None:
+            try:
+                index = BM25Index.load(chunks, path)
+            except ValueError:
+                index = BM25Index(chunks)
+                if persist:
+                    index.save(path)
+            _registry[fingerprint] = index
+    return index
+
+
+_partitioned_registry: dict[tuple[str, str], PartitionedBM25Index] = {}
+_partitioned_lock = threading.Lock()
+
+
+def get_partitioned_bm25_index(
+    chunks: list,
+    field: str = "source",
+    path: str | Path = BM25_PERSIST_DIR,
+    persist: bool = True,
+) -> PartitionedBM25Index:
+    """Get the per-`field` partitioned BM25 index for a chunk set.
+
+    The full-corpus index is the one get_bm25_index(chunks, path) returns;
+    sub-indexes go through the same registry → disk → build lookup, stored
+    under path / "by_<field>" / <value>.
+
+    Parameters
+    ----------
+    chunks : list[Chunk]
+        All chunks (same set used for vector store).
+    field : str
+        Chunk metadata field to partition by.
+    path : str | Path
+        Artifact directory of the full index.
+    persist : bool
+        If True, save freshly built indexes to disk.
+
+    Returns
+    -------
+    PartitionedBM25Index
+        Shared partitioned index for this corpus and field.
+    """
+    key = (corpus_key(chunks), field)
+    with _partitioned_lock:
+        index = _partitioned_registry.get(key)
+        if index is None:
+            groups: dict[str, list] = {}
+            for chunk in chunks:
+                groups.setdefault(str(chunk.metadata.get(field, "")), []).append(chunk)
+            partition_dir = Path(path) / f"by_{_partition_slug(field)}"
+            index = PartitionedBM25Index(
+                full=get_bm25_index(chunks, path, persist),
+                partitions={
+                    value: get_bm25_index(group, partition_dir / _partition_slug(value), persist)
+                    for value, group in groups.items()
+                },
+                field=field,
+            )
+            _partitioned_registry[key] = index
+    return index
+
+
+def clear_bm25_registry() -> None:
+    """Drop all in-process BM25 indexes (persisted artifacts are kept)."""
+    with _registry_lock:
+        _registry.clear()
+    with _partitioned_lock:
+        _partitioned_registry.clear()
@@ -3,22 +3,70 @@ chatbot.py — High-level chatbot interface for the ONE ZERO RAG Chatbot.
 
 Provides a single ask() function that orchestrates the full pipeline:
     question → hybrid retrieve → rerank → generate → display answer with sources.
+aask() is the async counterpart for serving many concurrent users from one process.
+ask_stream() prints the answer as tokens arrive (lower perceived latency).
 
 Usage in notebook:
     from src.chatbot import ask
     ask("What is the ATM withdrawal limit?", embedding_model, collection, bm25_index=bm25_index)
+    await aask("What is the ATM withdrawal limit?", embedding_model, collection, bm25_index=bm25_index)
 """
 
 from __future__ import annotations
 
+import time
+
 import chromadb
 
 from src.embeddings import EmbeddingModel
-from src.retrieval import retrieve, BM25Index
-from src.generation import generate_answer
+from src.retrieval import aretrieve, retrieve, BM25Index
+from src.routing import QueryRouter
+from src.generation import agenerate_answer, generate_answer, generate_answer_stream
 from config import TOP_K, RELEVANCE_THRESHOLD
 
 
+def _print_answer(
+    question: str,
+    answer: str,
+    results: list[dict],
+    context: str,
+    show_sources: bool,
+    show_context: bool,
+) -> None:
+    """Print the answer and, optionally, its sources and the full LLM context."""
+    print(f"Q: {question}")
+    print(f"\nA: {answer}")
+    _print_sources(results, context, show_sources, show_context)
+
+
+def _print_sources(
+    results: list[dict],
+    context: str,
+    show_sources: bool,
+    show_context: bool,
+) -> None:
+    """Print the source chunks and/or the full context sent to the LLM."""
+    if show_sources and results:
+        print(f"\n{'─'*50}")
+        print(f"Sources ({len(results)} chunks retrieved):")
+        for i, r in enumerate(results, 1):
+            source = r["metadata"].get("source", "?")
+            section = r["metadata"].get("section_path", "?")
+            dist = r.get("distance", 0.0)
+            rerank = r.get("rerank_score", None)
+
+            score_str = f"dist={dist:.4f}"
+            if rerank is not None:
+                score_str += f", rerank={rerank:.4f}"
+
+            print(f"  [{i}] {source} | {section} ({score_str})")
+
+    if show_context:
+        print(f"\n{'─'*50}")
+        print("Full context sent to LLM:")
+        print(context)
+
+
 def ask(
     question: str,
     embedding_model: EmbeddingModel,
@@ -31,6 +79,7 @@ def ask(
     use_reranker: bool = True,
     show_sources: bool = True,
     show_context: bool = False,
+    router: QueryRouter | None = None,
 ) -> str:
     """Ask a question and get an answer from the RAG chatbot.
 
@@ -61,6 +110,8 @@ def ask(
         If True, print the source sections used for the answer.
     show_context : bool
         If True, print the full context sent to the LLM (verbose debug).
+    router : QueryRouter | None
+        If given, search only the source(s) the router picks for the question.
 
     Returns
     -------
@@ -78,33 +129,113 @@ def ask(
         relevance_threshold=relevance_threshold,
         use_hybrid=use_hybrid,
         use_reranker=use_reranker,
+        router=router,
     )
 
     # Generate
     answer = generate_answer(query=question, context=context)
 
-    # Display
-    print(f"Q: {question}")
-    print(f"\nA: {answer}")
+    _print_answer(question, answer, results, context, show_sources, show_context)
 
-    if show_sources and results:
-        print(f"\n{'─'*50}")
-        print(f"Sources ({len(results)} chunks retrieved):")
-        for i, r in enumerate(results, 1):
-            source = r["metadata"].get("source", "?")
-            section = r["metadata"].get("section_path", "?")
-            dist = r.get("distance", 0.0)
-            rerank = r.get("rerank_score", None)
+    return answer
 
-            score_str = f"dist={dist:.4f}"
-            if rerank is not None:
-                score_str += f", rerank={rerank:.4f}"
 
-            print(f"  [{i}] {source} | {section} ({score_str})")
+async def aask(
+    question: str,
+    embedding_model: EmbeddingModel,
+    collection: chromadb.Collection,
+    chunks: list | None = None,
+    bm25_index: BM25Index | None = None,
+    top_k: int = TOP_K,
+    relevance_threshold: float | None = RELEVANCE_THRESHOLD,
+    use_hybrid: bool = True,
+    use_reranker: bool = True,
+    show_sources: bool = True,
+    show_context: bool = False,
+    router: QueryRouter | None = None,
+) -> str:
+    """Async ask(): same pipeline and output, awaiting each network round trip.
 
-    if show_context:
-        print(f"\n{'─'*50}")
-        print("Full context sent to LLM:")
-        print(context)
+    Many aask() calls can run concurrently in one event loop (e.g. via
+    asyncio.gather); CPU stages run on a thread pool and OpenAI calls share
+    one pooled AsyncOpenAI client. Parameters and return value match ask().
+    """
+    results, context = await aretrieve(
+        query=question,
+        embedding_model=embedding_model,
+        collection=collection,
+        chunks=chunks,
+        bm25_index=bm25_index,
+        top_k=top_k,
+        relevance_threshold=relevance_threshold,
+        use_hybrid=use_hybrid,
+        use_reranker=use_reranker,
+        router=router,
+    )
+
+    answer = await agenerate_answer(query=question, context=context)
+
+    _print_answer(question, answer, results, context, show_sources, show_context)
+
+    return answer
+
+
+def ask_stream(
+    question: str,
+    embedding_model: EmbeddingModel,
+    collection: chromadb.Collection,
+    chunks: list | None = None,
+    bm25_index: BM25Index | None = None,
+    top_k: int = TOP_K,
+    relevance_threshold: float | None = RELEVANCE_THRESHOLD,
+    use_hybrid: bool = True,
+    use_reranker: bool = True,
+    show_sources: bool = True,
+    show_context: bool = False,
+    metrics: dict[str, float] | None = None,
+    router: QueryRouter | None = None,
+) -> str:
+    """Streaming ask(): prints the answer token by token as it is generated.
+
+    Parameters match ask(), plus:
+
+    metrics : dict[str, float] | None
+        If given, filled with retrieval_s plus the generation stream metrics
+        (ttft_s, total_s, completion_tokens, tokens_per_s — see
+        generation.generate_answer_stream).
+
+    Returns
+    -------
+    str
+        The full generated answer.
+    """
+    t0 = time.perf_counter()
+    results, context = retrieve(
+        query=question,
+        embedding_model=embedding_model,
+        collection=collection,
+        chunks=chunks,
+        bm25_index=bm25_index,
+        top_k=top_k,
+        relevance_threshold=relevance_threshold,
+        use_hybrid=use_hybrid,
+        use_reranker=use_reranker,
+        router=router,
+    )
+    retrieval_s = time.perf_counter() - t0
 
-    return answer
\ No newline at end of file
+    print(f"Q: {question}")
+    print("\nA: ", end="", flush=True)
+    stream_metrics: dict[str, float] = {}
+    parts: list[str] = []
+    for token in generate_answer_stream(question, context, metrics=stream_metrics):
+        parts.append(token)
+        print(token, end="", flush=True)
+    print()
+
+    _print_sources(results, context, show_sources, show_context)
+
+    if metrics is not None:
+        metrics["retrieval_s"] = retrieval_s
+        metrics.update(stream_metrics)
+    return "".join(parts)
@@ -17,6 +17,9 @@ Why not naive RecursiveCharacterTextSplitter everywhere?
 
 from __future__ import annotations
 
+import hashlib
+import threading
+from collections import OrderedDict
 from dataclasses import dataclass, field
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
@@ -162,4 +165,103 @@ def chunk_sections(
 
     print(f"  Chunking complete: {len(sections)} sections → {len(chunks)} chunks")
     print(f"  Sections sub-split: {sub_split_count}")
-    return chunks
\ No newline at end of file
+    return chunks
+
+
+def content_hash(text: str) -> str:
+    """Short SHA-256 digest of a chunk text, used to detect edited chunks."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def store_metadata(chunk: Chunk) -> dict[str, str]:
+    """Chunk metadata as stored in the vector stores: string values + content hash.
+
+    ChromaDB requires string values, so `where` filters are evaluated on
+    this form everywhere (vector stores and lexical indexes alike).
+    """
+    meta = {key: str(value) for key, value in chunk.metadata.items()}
+    meta["content_hash"] = content_hash(chunk.text)
+    return meta
+
+
+def get_chunk_ids(chunks: list[Chunk]) -> list[str]:
+    """Build stable IDs for chunks, derived from where each chunk lives.
+
+    The ID hashes (source, section_path, chunk_index), so it survives edits to
+    the chunk text and to unrelated sections — unlike positional IDs, which
+    shift whenever a section is added or removed. A repeated location (same
+    heading twice in one document) gets an occurrence counter appended.
+
+    Parameters
+    ----------
+    chunks : list[Chunk]
+        Chunks in corpus order.
+
+    Returns
+    -------
+    list[str]
+        One ID per chunk, e.g. "chunk_3f9a1c0d2b7e4a15".
+    """
+    seen: dict[str, int] = {}
+    ids: list[str] = []
+    for chunk in chunks:
+        location = "|".join(
+            str(chunk.metadata.get(key, ""))
+            for key in ("source", "section_path", "chunk_index")
+        )
+        occurrence = seen.get(location, 0)
+        seen[location] = occurrence + 1
+        if occurrence:
+            location = f"{location}|{occurrence}"
+        digest = hashlib.sha1(location.encode("utf-8")).hexdigest()[:16]
+        ids.append(f"chunk_{digest}")
+    return ids
+
+
+def corpus_fingerprint(chunks: list[Chunk]) -> str:
+    """SHA-256 over the IDs and texts of a chunk list, in order.
+
+    Used to check that a persisted index artifact was built from exactly
+    this corpus.
+    """
+    digest = hashlib.sha256()
+    for chunk_id, chunk in zip(get_chunk_ids(chunks), chunks):
+        digest.update(chunk_id.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(chunk.text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+# ── Per-list fingerprint memo (index registries) ─────────────────────────────
+
+_FINGERPRINT_MEMO_SIZE: int = 16
+_fingerprint_memo: OrderedDict[int, tuple[list, int, str]] = OrderedDict()
+_fingerprint_memo_lock = threading.Lock()
+
+
+def corpus_key(chunks: list[Chunk]) -> str:
+    """corpus_fingerprint(), memoized per list object.
+
+    The BM25 / learned-sparse registries are consulted on every query, and
+    hashing the corpus is O(corpus). A list seen before (same object, same
+    length) returns its fingerprint from a small LRU; only a new list is
+    hashed. The memo holds a reference to each list, so an id() cannot be
+    reused by another list while its entry exists. Lists edited in place
+    without changing length are not detected — pass a new list after
+    changing chunks.
+    """
+    key = id(chunks)
+    with _fingerprint_memo_lock:
+        entry = _fingerprint_memo.get(key)
+        if entry is not None and entry[0] is chunks and entry[1] == len(chunks):
+            _fingerprint_memo.move_to_end(key)
+            return entry[2]
+
+    fingerprint = corpus_fingerprint(chunks)
+    with _fingerprint_memo_lock:
+        _fingerprint_memo[key] = (chunks, len(chunks), fingerprint)
+        _fingerprint_memo.move_to_end(key)
+        while len(_fingerprint_memo) > _FINGERPRINT_MEMO_SIZE:
+            _fingerprint_memo.popitem(last=False)
+    return fingerprint
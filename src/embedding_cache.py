@@ -0,0 +1,319 @@
+"""
+embedding_cache.py — Persistent, content-addressed embedding cache.
+
+Stores one float32 vector per (model name, SHA-256 of text) in a local SQLite
+file, so re-indexing an unchanged corpus never re-embeds a chunk:
+    - OpenAI models: cache hits skip the API call entirely.
+    - BGE-M3: cache hits skip the forward pass entirely.
+
+Design decisions:
+- Content-addressed: the key is the hash of the exact text that was embedded,
+  so an edited chunk is a miss and an unchanged chunk is a hit, regardless of
+  its position or ID in the corpus.
+- Namespaced by model name: vectors from different models never mix.
+- SQLite (stdlib) instead of one .npy per model: cheap incremental appends,
+  atomic commits, safe to share between threads via a single lock.
+
+QueryEmbeddingCache is the in-memory counterpart for queries: a bounded,
+thread-safe LRU (optionally with TTL) keyed by normalized query text, so
+repeated questions skip the API round trip / forward pass.
+
+Usage:
+    cache = get_embedding_cache()
+    model = get_embedding_model("text-embedding-3-small")   # cache attached
+    model.embed_texts(texts)
+    print(cache.stats("text-embedding-3-small"))
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from config import EMBEDDING_CACHE_PATH, QUERY_CACHE_SIZE, QUERY_CACHE_TTL_S
+
+
+_SQLITE_MAX_VARS: int = 500   # stay well below SQLite's bound-parameter limit
+
+
+def text_hash(text: str) -> str:
+    """Return the SHA-256 hex digest used as the cache key for a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# ── Cache class ──────────────────────────────────────────────────────────────
+
+class EmbeddingCache:
+    """On-disk (model name + text hash → float32 vector) cache.
+
+    Hit/miss counters are kept per model name for the lifetime of the
+    process and exposed via stats().
+    """
+
+    def __init__(self, path: str | Path = EMBEDDING_CACHE_PATH) -> None:
+        """Open (or create) the cache database.
+
+        Parameters
+        ----------
+        path : str | Path
+            SQLite file location. Parent directories are created if needed.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "  model TEXT NOT NULL,"
+            "  key TEXT NOT NULL,"
+            "  dim INTEGER NOT NULL,"
+            "  vector BLOB NOT NULL,"
+            "  PRIMARY KEY (model, key)"
+            ")"
+        )
+        self._conn.commit()
+        self._hits: dict[str, int] = {}
+        self._misses: dict[str, int] = {}
+
+    def get_many(self, model_name: str, texts: list[str]) -> list[np.ndarray | None]:
+        """Look up cached vectors for a list of texts.
+
+        Parameters
+        ----------
+        model_name : str
+            Embedding model name (cache namespace).
+        texts : list[str]
+            Texts to look up.
+
+        Returns
+        -------
+        list[np.ndarray | None]
+            One entry per input text: the cached float32 vector, or None on a miss.
+        """
+        keys = [text_hash(t) for t in texts]
+        found: dict[str, np.ndarray] = {}
+        unique_keys = list(dict.fromkeys(keys))
+
+        with self._lock:
+            for i in range(0, len(unique_keys), _SQLITE_MAX_VARS):
+                batch = unique_keys[i : i + _SQLITE_MAX_VARS]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings "
+                    f"WHERE model = ? AND key IN ({placeholders})",
+                    [model_name, *batch],
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+
+            hits = sum(1 for k in keys if k in found)
+            self._hits[model_name] = self._hits.get(model_name, 0) + hits
+            self._misses[model_name] = self._misses.get(model_name, 0) + len(keys) - hits
+
+        return [found.get(k) for k in keys]
+
+    def put_many(
+        self,
+        model_name: str,
+        texts: list[str],
+        vectors: list[list[float]],
+    ) -> None:
+        """Store vectors for a list of texts (overwrites existing entries).
+
+        Parameters
+        ----------
+        model_name : str
+            Embedding model name (cache namespace).
+        texts : list[str]
+            Texts that were embedded.
+        vectors : list[list[float]]
+            One vector per text, in the same order.
+        """
+        rows = []
+        for text, vector in zip(texts, vectors):
+            arr = np.asarray(vector, dtype=np.float32)
+            rows.append((model_name, text_hash(text), arr.shape[0], arr.tobytes()))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, key, dim, vector) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def stats(self, model_name: str | None = None) -> dict[str, float]:
+        """Hit/miss counters since process start (or the last reset_stats()).
+
+        Parameters
+        ----------
+        model_name : str | None
+            Restrict to one model. None = aggregate over all models.
+
+        Returns
+        -------
+        dict[str, float]
+            Keys: hits, misses, hit_rate.
+        """
+        with self._lock:
+            if model_name is None:
+                hits = sum(self._hits.values())
+                misses = sum(self._misses.values())
+            else:
+                hits = self._hits.get(model_name, 0)
+                misses = self._misses.get(model_name, 0)
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+        }
+
+    def reset_stats(self) -> None:
+        """Reset the hit/miss counters (stored vectors are kept)."""
+        with self._lock:
+            self._hits.clear()
+            self._misses.clear()
+
+    def clear(self, model_name: str | None = None) -> None:
+        """Delete cached vectors for one model, or for all models if None."""
+        with self._lock:
+            if model_name is None:
+                self._conn.execute("DELETE FROM embeddings")
+            else:
+                self._conn.execute("DELETE FROM embeddings WHERE model = ?", (model_name,))
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def __repr__(self) -> str:
+        return f"EmbeddingCache(path={str(self.path)!r}, entries={len(self)})"
+
+
+# ── Query cache (in-memory LRU) ──────────────────────────────────────────────
+
+def normalize_query(query: str) -> str:
+    """Cache key for a query: NFKC, case-folded, whitespace collapsed.
+
+    "ATM  withdrawal limit" and "atm withdrawal limit" share one entry.
+    """
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+class QueryEmbeddingCache:
+    """Bounded, thread-safe LRU of normalized query → float32 vector.
+
+    Entries older than ttl_s (if set) are treated as misses and dropped.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = QUERY_CACHE_SIZE,
+        ttl_s: float | None = QUERY_CACHE_TTL_S,
+    ) -> None:
+        """Create an empty cache holding at most maxsize vectors."""
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self._entries: OrderedDict[str, tuple[float, np.ndarray]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, query: str) -> np.ndarray | None:
+        """Return the cached vector for a query (marking it most recent), or None."""
+        key = normalize_query(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_s is not None \
+                    and time.monotonic() - entry[0] > self.ttl_s:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, query: str, vector: np.ndarray) -> None:
+        """Store a (read-only copy of the) vector, evicting the LRU entry if full."""
+        if self.maxsize <= 0:
+            return
+        vector = np.array(vector, dtype=np.float32)
+        vector.flags.writeable = False
+        key = normalize_query(query)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict[str, float]:
+        """Counters since creation (or the last clear()).
+
+        Returns
+        -------
+        dict[str, float]
+            Keys: hits, misses, hit_rate, evictions, expirations, size, maxsize.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self) -> None:
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __repr__(self) -> str:
+        return f"QueryEmbeddingCache(size={len(self)}, maxsize={self.maxsize}, ttl_s={self.ttl_s})"
+
+
+# ── Factory (singleton) ─────────────────────────────────────────────────────
+
+_cache: EmbeddingCache | None = None
+
+
+def get_embedding_cache(path: str | Path = EMBEDDING_CACHE_PATH) -> EmbeddingCache:
+    """Get or create the process-wide embedding cache.
+
+    Parameters
+    ----------
+    path : str | Path
+        SQLite file location.
+
+    Returns
+    -------
+    EmbeddingCache
+        Shared cache instance.
+    """
+    global _cache
+    if _cache is None or _cache.path != Path(path):
+        _cache = EmbeddingCache(path)
+    return _cache
@@ -0,0 +1,317 @@
+"""
+embedding_scheduler.py — Concurrent, rate-limit-aware OpenAI embedding batches.
+
+Indexing a large corpus through the embeddings API is bounded by the account's
+rate limits (requests/min and tokens/min), not by one HTTP round trip at a
+time. The scheduler:
+1. Packs texts into batches by estimated token count (not item count), so
+   every request is close to OPENAI_EMBEDDING_BATCH_MAX_TOKENS.
+2. Keeps up to OPENAI_EMBEDDING_MAX_IN_FLIGHT requests in flight on a thread pool.
+3. Paces requests with a token-bucket limiter for RPM and TPM.
+4. Retries 429s, timeouts, connection errors and 5xx with exponential backoff
+   plus full jitter (honouring Retry-After when the server sends it).
+5. Reassembles results in input order, directly into one float32 matrix.
+   Vectors are requested base64-encoded and decoded with np.frombuffer, so
+   no per-element Python floats are ever created.
+
+Token counts use tiktoken when it is installed, otherwise a chars/4 estimate.
+
+Usage:
+    scheduler = EmbeddingBatchScheduler(client, "text-embedding-3-small")
+    vectors = scheduler.embed(texts)
+"""
+
+from __future__ import annotations
+
+import base64
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import openai
+
+from config import (
+    OPENAI_EMBEDDING_RPM,
+    OPENAI_EMBEDDING_TPM,
+    OPENAI_EMBEDDING_MAX_IN_FLIGHT,
+    OPENAI_EMBEDDING_BATCH_MAX_TOKENS,
+    OPENAI_EMBEDDING_BATCH_MAX_ITEMS,
+    OPENAI_EMBEDDING_MAX_RETRIES,
+    OPENAI_EMBEDDING_BACKOFF_BASE_S,
+    OPENAI_EMBEDDING_BACKOFF_MAX_S,
+)
+
+
+RETRYABLE_ERRORS: tuple[type[Exception], ...] = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+def decode_embedding(embedding: str | list[float]) -> np.ndarray:
+    """Decode one API embedding (base64 float32 bytes, or a float list) to float32."""
+    if isinstance(embedding, str):
+        return np.frombuffer(base64.b64decode(embedding), dtype=np.float32)
+    return np.asarray(embedding, dtype=np.float32)
+
+
+# ── Token counting ───────────────────────────────────────────────────────────
+
+def get_token_counter(model_name: str):
+    """Return a callable text -> token count for the given embedding model.
+
+    Uses tiktoken if available (exact), otherwise ~4 characters per token.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return lambda text: len(text) // 4 + 1
+
+    try:
+        encoding = tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        encoding = tiktoken.get_encoding("cl100k_base")
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def pack_batches(
+    token_counts: list[int],
+    max_tokens: int = OPENAI_EMBEDDING_BATCH_MAX_TOKENS,
+    max_items: int = OPENAI_EMBEDDING_BATCH_MAX_ITEMS,
+) -> list[list[int]]:
+    """Greedily pack consecutive inputs into batches under token and item caps.
+
+    Parameters
+    ----------
+    token_counts : list[int]
+        Estimated tokens per input.
+    max_tokens : int
+        Token budget per request. An input larger than this gets its own batch.
+    max_items : int
+        Maximum inputs per request.
+
+    Returns
+    -------
+    list[list[int]]
+        Input positions per batch, in input order.
+    """
+    batches: list[list[int]] = []
+    current: list[int] = []
+    current_tokens = 0
+    for i, n_tokens in enumerate(token_counts):
+        if current and (current_tokens + n_tokens > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += n_tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+# ── Rate limiter ─────────────────────────────────────────────────────────────
+
+class TokenBucketLimiter:
+    """Thread-safe token buckets for requests/min and tokens/min.
+
+    Each bucket holds up to one minute of budget and refills continuously.
+    acquire() blocks until both buckets can cover the request.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int | None = OPENAI_EMBEDDING_RPM,
+        tokens_per_minute: int | None = OPENAI_EMBEDDING_TPM,
+    ) -> None:
+        """Create full buckets. None disables the corresponding limit."""
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self._requests = float(requests_per_minute or 0)
+        self._tokens = float(tokens_per_minute or 0)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._last
+        self._last = now
+        if self.rpm:
+            self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60.0)
+
+    @staticmethod
+    def _wait_s(available: float, needed: float, per_minute: int | None) -> float:
+        if not per_minute or available >= needed:
+            return 0.0
+        return (needed - available) * 60.0 / per_minute
+
+    def acquire(self, n_tokens: int) -> None:
+        """Block until one request carrying n_tokens fits both limits, then spend it."""
+        if self.tpm:
+            n_tokens = min(n_tokens, self.tpm)
+        while True:
+            with self._lock:
+                self._refill()
+                wait = max(
+                    self._wait_s(self._requests, 1, self.rpm),
+                    self._wait_s(self._tokens, n_tokens, self.tpm),
+                )
+                if wait <= 0.0:
+                    if self.rpm:
+                        self._requests -= 1
+                    if self.tpm:
+                        self._tokens -= n_tokens
+                    return
+            time.sleep(wait)
+
+
+# ── Scheduler ────────────────────────────────────────────────────────────────
+
+class EmbeddingBatchScheduler:
+    """Token-packed, concurrent, rate-limited embeddings.create() calls.
+
+    The OpenAI client should be created with max_retries=0; retries are
+    handled here so they also respect the rate limiter.
+    """
+
+    def __init__(
+        self,
+        client,
+        model_name: str,
+        requests_per_minute: int | None = OPENAI_EMBEDDING_RPM,
+        tokens_per_minute: int | None = OPENAI_EMBEDDING_TPM,
+        max_in_flight: int = OPENAI_EMBEDDING_MAX_IN_FLIGHT,
+        max_batch_tokens: int = OPENAI_EMBEDDING_BATCH_MAX_TOKENS,
+        max_batch_items: int = OPENAI_EMBEDDING_BATCH_MAX_ITEMS,
+        max_retries: int = OPENAI_EMBEDDING_MAX_RETRIES,
+        backoff_base_s: float = OPENAI_EMBEDDING_BACKOFF_BASE_S,
+        backoff_max_s: float = OPENAI_EMBEDDING_BACKOFF_MAX_S,
+        dimensions: int | None = None,
+    ) -> None:
+        """Configure the scheduler.
+
+        Parameters
+        ----------
+        client : openai.OpenAI
+            Sync client used for embeddings.create().
+        model_name : str
+            OpenAI embedding model name.
+        requests_per_minute, tokens_per_minute : int | None
+            Account rate limits (None = unlimited).
+        max_in_flight : int
+            Maximum concurrent requests.
+        max_batch_tokens, max_batch_items : int
+            Per-request packing caps.
+        max_retries : int
+            Retries per batch for retryable errors before giving up.
+        backoff_base_s, backoff_max_s : float
+            Exponential backoff base and cap (full jitter is applied).
+        dimensions : int | None
+            Output dimension requested from the API (text-embedding-3
+            Matryoshka truncation). None = the model's native dimension.
+        """
+        self.client = client
+        self.model_name = model_name
+        self.limiter = TokenBucketLimiter(requests_per_minute, tokens_per_minute)
+        self.max_in_flight = max_in_flight
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_items = max_batch_items
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.request_kwargs = {"dimensions": dimensions} if dimensions is not None else {}
+        self.count_tokens = get_token_counter(model_name)
+        self.n_retries = 0
+        self._retries_lock = threading.Lock()   # n_retries is bumped from worker threads
+
+    def _backoff_s(self, attempt: int, error: Exception) -> float:
+        """Delay before retry `attempt` (0-based): Retry-After, else full-jitter backoff."""
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.backoff_max_s)
+            except ValueError:
+                pass
+        return random.uniform(0.0, min(self.backoff_max_s, self.backoff_base_s * 2 ** attempt))
+
+    def _embed_batch(self, texts: list[str], n_tokens: int) -> np.ndarray:
+        """One rate-limited embeddings.create() call, retried on transient errors.
+
+        Returns a float32 array of shape (len(texts), dim).
+        """
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(n_tokens)
+            try:
+                response = self.client.embeddings.create(
+                    model=self.model_name,
+                    input=texts,
+                    encoding_format="base64",
+                    **self.request_kwargs,
+                )
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                with self._retries_lock:
+                    self.n_retries += 1
+                delay = self._backoff_s(attempt, e)
+                print(f"    ⚠️ {type(e).__name__}; retrying batch in {delay:.1f}s "
+                      f"(attempt {attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+                continue
+            return np.stack([
+                decode_embedding(item.embedding)
+                for item in sorted(response.data, key=lambda d: d.index)
+            ])
+        raise RuntimeError("unreachable")
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Embed texts with packed, concurrent requests; results in input order.
+
+        Parameters
+        ----------
+        texts : list[str]
+            Input texts to embed.
+
+        Returns
+        -------
+        np.ndarray
+            float32 array of shape (len(texts), dim).
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        token_counts = [self.count_tokens(t) for t in texts]
+        batches = pack_batches(token_counts, self.max_batch_tokens, self.max_batch_items)
+
+        if len(batches) == 1:
+            return self._embed_batch(texts, sum(token_counts))
+
+        results: np.ndarray | None = None
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            futures = {
+                pool.submit(
+                    self._embed_batch,
+                    [texts[i] for i in batch],
+                    sum(token_counts[i] for i in batch),
+                ): batch
+                for batch in batches
+            }
+            try:
+                for n_done, future in enumerate(as_completed(futures), start=1):
+                    vectors = future.result()
+                    if results is None:
+                        results = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+                    results[futures[future]] = vectors
+                    print(f"    Embedded batch {n_done}/{len(batches)}")
+            except BaseException:
+                # Don't spend rate limit on batches whose results are discarded
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+
+        return results
@@ -2,37 +2,153 @@
 embeddings.py — Embedding model factory for the ONE ZERO RAG Chatbot.
 
 Provides a unified interface for embedding text using different models:
-- OpenAI: text-embedding-3-small, text-embedding-3-large (API-based)
-- HuggingFace: BAAI/bge-m3 (local, via FlagEmbedding library)
+- OpenAI: text-embedding-3-small, text-embedding-3-large (API-based), plus
+  reduced-dimension variants ("text-embedding-3-large@256", ...)
+- HuggingFace: BAAI/bge-m3 (local, via FlagEmbedding library), optionally
+  with int8 dynamic quantization ("BAAI/bge-m3@int8")
+- Offline: deterministic hash embeddings ("offline-hash-384", ...) that need
+  no network or model download (CI, air-gapped benchmarks)
 
 All models expose the same interface via the EmbeddingModel protocol:
+    embed_texts_array(texts: list[str]) -> np.ndarray   # float32 (n, dim)
     embed_texts(texts: list[str]) -> list[list[float]]
 
+Document embeddings go through an optional on-disk EmbeddingCache
+(see embedding_cache.py): cache hits skip the API call / forward pass.
+Query embeddings go through a per-model in-memory LRU (QueryEmbeddingCache),
+so repeated questions skip it too.
+
 Usage:
     model = get_embedding_model("text-embedding-3-small")
-    vectors = model.embed_texts(["How do I withdraw cash?", "What are the fees?"])
+    vectors = model.embed_texts_array(["How do I withdraw cash?", "What are the fees?"])
 """
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import re
 import time
 from abc import ABC, abstractmethod
 
-from config import EMBEDDING_MODELS, OPENAI_API_KEY
+import numpy as np
+
+from src.embedding_cache import (
+    EmbeddingCache,
+    QueryEmbeddingCache,
+    get_embedding_cache,
+    normalize_query,
+)
+from config import (
+    EMBEDDING_MODELS,
+    INDEX_BATCH_SIZE,
+    OFFLINE_EMBEDDING_LATENCY_MS,
+    OFFLINE_EMBEDDING_SEED,
+    OPENAI_API_KEY,
+    OPENAI_TIMEOUT_S,
+    QUERY_CACHE_SIZE,
+    QUERY_CACHE_TTL_S,
+    USE_EMBEDDING_CACHE,
+)
 
 
 # ── Abstract base ────────────────────────────────────────────────────────────
 
+def as_float32_matrix(vectors) -> np.ndarray:
+    """Return vectors as a C-contiguous float32 (n, dim) array (no copy if already one)."""
+    matrix = np.ascontiguousarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    return matrix
+
+
 class EmbeddingModel(ABC):
-    """Common interface for all embedding models."""
+    """Common interface for all embedding models.
+
+    Subclasses implement _embed_texts() (the raw model call), returning one
+    float32 (n_texts, dim) array. embed_texts_array() layers the optional
+    content-addressed cache on top of it. The *_array methods are the native
+    API used by the indexing and query paths; embed_texts() / embed_queries()
+    / embed_query() return Python lists for callers that need them.
+
+    Query methods (sync and async) embed the normalized query text
+    (embedding_cache.normalize_query), so a query's vector does not depend on
+    which spelling of it arrived first. They check an in-memory LRU of
+    normalized query → vector first; only misses reach _embed_queries_uncached().
+    """
 
-    def __init__(self, model_name: str, dimensions: int) -> None:
+    def __init__(
+        self,
+        model_name: str,
+        dimensions: int,
+        cache: EmbeddingCache | None = None,
+        query_cache_size: int = QUERY_CACHE_SIZE,
+        query_cache_ttl_s: float | None = QUERY_CACHE_TTL_S,
+    ) -> None:
         self.model_name = model_name
         self.dimensions = dimensions
+        self.cache = cache
+        # On-disk cache namespace; subclasses whose vectors depend on more
+        # than the model name (e.g. a hash seed) extend it.
+        self.cache_namespace = model_name
+        # Chunks per build_vectorstore() checkpoint batch (one embed call each)
+        self.index_batch_size = INDEX_BATCH_SIZE
+        self.query_cache = (
+            QueryEmbeddingCache(query_cache_size, query_cache_ttl_s)
+            if query_cache_size > 0 else None
+        )
 
     @abstractmethod
+    def _embed_texts(self, texts: list[str]) -> np.ndarray:
+        """Embed texts with the underlying model (no caching).
+
+        Returns a float32 array of shape (len(texts), dim).
+        """
+        ...
+
+    def embed_texts_array(self, texts: list[str]) -> np.ndarray:
+        """Embed a list of texts into a float32 matrix, reusing cached vectors.
+
+        Only texts missing from the cache are sent to the model; duplicates
+        within one call are embedded once.
+
+        Parameters
+        ----------
+        texts : list[str]
+            Input texts to embed.
+
+        Returns
+        -------
+        np.ndarray
+            C-contiguous float32 array of shape (len(texts), dim).
+        """
+        if not texts:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        if self.cache is None:
+            return as_float32_matrix(self._embed_texts(texts))
+
+        cached = self.cache.get_many(self.cache_namespace, texts)
+        missing = list(dict.fromkeys(
+            text for text, vec in zip(texts, cached) if vec is None
+        ))
+
+        fresh_rows: dict[str, int] = {}
+        fresh = None
+        if missing:
+            fresh = as_float32_matrix(self._embed_texts(missing))
+            self.cache.put_many(self.cache_namespace, missing, fresh)
+            fresh_rows = {text: i for i, text in enumerate(missing)}
+
+        dim = fresh.shape[1] if fresh is not None else next(
+            vec.shape[0] for vec in cached if vec is not None
+        )
+        out = np.empty((len(texts), dim), dtype=np.float32)
+        for i, (text, vec) in enumerate(zip(texts, cached)):
+            out[i] = vec if vec is not None else fresh[fresh_rows[text]]
+        return out
+
     def embed_texts(self, texts: list[str]) -> list[list[float]]:
-        """Embed a list of texts into vectors.
+        """List form of embed_texts_array().
 
         Parameters
         ----------
@@ -44,10 +160,79 @@ class EmbeddingModel(ABC):
         list[list[float]]
             One vector per input text, each of length self.dimensions.
         """
-        ...
+        return self.embed_texts_array(texts).tolist()
 
-    def embed_query(self, query: str) -> list[float]:
-        """Embed a single query string. Convenience wrapper.
+    def _embed_queries_uncached(self, queries: list[str]) -> np.ndarray:
+        """Embed queries with the model, bypassing the query cache."""
+        return as_float32_matrix(self._embed_texts(queries))
+
+    async def _aembed_queries_uncached(self, queries: list[str]) -> np.ndarray:
+        """Async _embed_queries_uncached(). Default: run it in the default executor.
+
+        Subclasses with a native async client override this.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._embed_queries_uncached, queries)
+
+    def _query_cache_lookup(
+        self, queries: list[str]
+    ) -> tuple[list[np.ndarray | None], list[str]]:
+        """Cached vector (or None) per query, plus the distinct missing queries."""
+        cached = [self.query_cache.get(q) for q in queries]
+        missing = list(dict.fromkeys(q for q, vec in zip(queries, cached) if vec is None))
+        return cached, missing
+
+    def _query_cache_merge(
+        self,
+        queries: list[str],
+        cached: list[np.ndarray | None],
+        missing: list[str],
+        fresh: np.ndarray | None,
+    ) -> np.ndarray:
+        """Store freshly embedded queries and assemble the (n_queries, dim) result."""
+        fresh_rows = {q: i for i, q in enumerate(missing)}
+        for q, i in fresh_rows.items():
+            self.query_cache.put(q, fresh[i])
+        dim = fresh.shape[1] if fresh is not None else cached[0].shape[0]
+        out = np.empty((len(queries), dim), dtype=np.float32)
+        for i, (q, vec) in enumerate(zip(queries, cached)):
+            out[i] = vec if vec is not None else fresh[fresh_rows[q]]
+        return out
+
+    def embed_queries_array(self, queries: list[str]) -> np.ndarray:
+        """Embed several query strings in one model call.
+
+        Queries bypass the on-disk cache so ad-hoc user questions do not
+        accumulate in it; repeated queries are served from the in-memory
+        query LRU instead. Queries are normalized (normalize_query) before
+        they are embedded, with or without the LRU.
+
+        Parameters
+        ----------
+        queries : list[str]
+            Query texts.
+
+        Returns
+        -------
+        np.ndarray
+            float32 array of shape (len(queries), dim).
+        """
+        if not queries:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        queries = [normalize_query(q) for q in queries]
+        if self.query_cache is None:
+            return self._embed_queries_uncached(queries)
+
+        cached, missing = self._query_cache_lookup(queries)
+        fresh = self._embed_queries_uncached(missing) if missing else None
+        return self._query_cache_merge(queries, cached, missing, fresh)
+
+    def embed_queries(self, queries: list[str]) -> list[list[float]]:
+        """List form of embed_queries_array()."""
+        return self.embed_queries_array(queries).tolist()
+
+    def embed_query_array(self, query: str) -> np.ndarray:
+        """Embed a single query string into a float32 vector of shape (dim,).
 
         Parameters
         ----------
@@ -56,10 +241,36 @@ class EmbeddingModel(ABC):
 
         Returns
         -------
-        list[float]
+        np.ndarray
             Embedding vector.
         """
-        return self.embed_texts([query])[0]
+        return self.embed_queries_array([query])[0]
+
+    def embed_query(self, query: str) -> list[float]:
+        """List form of embed_query_array(). Convenience wrapper."""
+        return self.embed_query_array(query).tolist()
+
+    async def aembed_queries(self, queries: list[str]) -> list[list[float]]:
+        """Async embed_queries() (query LRU first, then _aembed_queries_uncached)."""
+        if not queries:
+            return []
+        queries = [normalize_query(q) for q in queries]
+        if self.query_cache is None:
+            return (await self._aembed_queries_uncached(queries)).tolist()
+
+        cached, missing = self._query_cache_lookup(queries)
+        fresh = await self._aembed_queries_uncached(missing) if missing else None
+        return self._query_cache_merge(queries, cached, missing, fresh).tolist()
+
+    async def aembed_query(self, query: str) -> list[float]:
+        """Async embed_query()."""
+        return (await self.aembed_queries([query]))[0]
+
+    def query_cache_stats(self) -> dict[str, float]:
+        """Query LRU counters (hits, misses, hit_rate, evictions, expirations, size)."""
+        if self.query_cache is None:
+            return {}
+        return self.query_cache.stats()
 
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}(model={self.model_name!r}, dim={self.dimensions})"
@@ -70,24 +281,52 @@ class EmbeddingModel(ABC):
 class OpenAIEmbeddingModel(EmbeddingModel):
     """Embedding model using OpenAI's API (text-embedding-3-small/large).
 
-    Handles batching automatically — OpenAI supports up to 2048 texts per call,
-    but we batch at 100 for safety and progress logging.
-    """
+    Reduced-dimension (Matryoshka) variants such as
+    "text-embedding-3-large@256" call base_model with the API's `dimensions`
+    parameter; they are separate models as far as caching and collections
+    are concerned.
 
-    BATCH_SIZE: int = 100  # texts per API call
+    Document embedding goes through EmbeddingBatchScheduler: batches packed by
+    token count, several requests in flight under the configured RPM/TPM
+    limits, and retries with backoff on 429s / timeouts. The SDK's own retries
+    are disabled so every attempt is paced by the scheduler.
+    """
 
-    def __init__(self, model_name: str, dimensions: int) -> None:
-        super().__init__(model_name, dimensions)
+    def __init__(
+        self,
+        model_name: str,
+        dimensions: int,
+        cache: EmbeddingCache | None = None,
+        base_model: str | None = None,
+    ) -> None:
+        super().__init__(model_name, dimensions, cache)
         from openai import OpenAI
 
+        from src.embedding_scheduler import EmbeddingBatchScheduler
+
         if not OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY not set. Check your .env file.")
 
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+        self.client = OpenAI(
+            api_key=OPENAI_API_KEY,
+            max_retries=0,
+            timeout=OPENAI_TIMEOUT_S,
+        )
+        # Variants send base_model + dimensions; base entries keep the API default
+        self.api_model = base_model or model_name
+        self.request_kwargs = {"dimensions": dimensions} if base_model else {}
+        self.scheduler = EmbeddingBatchScheduler(
+            self.client, self.api_model, **self.request_kwargs
+        )
+        # A checkpoint batch must span enough requests to fill every in-flight
+        # slot, or the scheduler's concurrency goes unused during builds.
+        self.index_batch_size = max(
+            INDEX_BATCH_SIZE, self.scheduler.max_in_flight * self.scheduler.max_batch_items
+        )
         print(f"  ✅ OpenAI embedding model loaded: {model_name} (dim={dimensions})")
 
-    def embed_texts(self, texts: list[str]) -> list[list[float]]:
-        """Embed texts via OpenAI API with batching.
+    def _embed_texts(self, texts: list[str]) -> np.ndarray:
+        """Embed texts via the OpenAI API using the batch scheduler.
 
         Parameters
         ----------
@@ -96,26 +335,37 @@ class OpenAIEmbeddingModel(EmbeddingModel):
 
         Returns
         -------
-        list[list[float]]
-            One vector per input text.
+        np.ndarray
+            float32 array of shape (len(texts), dim), in input order.
         """
-        all_embeddings: list[list[float]] = []
+        return self.scheduler.embed(texts)
 
-        for i in range(0, len(texts), self.BATCH_SIZE):
-            batch = texts[i : i + self.BATCH_SIZE]
-            response = self.client.embeddings.create(
-                model=self.model_name,
-                input=batch,
-            )
-            # Response objects are ordered by index
-            batch_embeddings = [item.embedding for item in response.data]
-            all_embeddings.extend(batch_embeddings)
+    async def _aembed_queries_uncached(self, queries: list[str]) -> np.ndarray:
+        """Embed queries with the shared AsyncOpenAI client (no thread blocked).
 
-            if len(texts) > self.BATCH_SIZE:
-                print(f"    Embedded batch {i // self.BATCH_SIZE + 1}"
-                      f"/{(len(texts) - 1) // self.BATCH_SIZE + 1}")
+        Parameters
+        ----------
+        queries : list[str]
+            Query texts (one API call, so keep below OpenAI's 2048-input limit).
 
-        return all_embeddings
+        Returns
+        -------
+        np.ndarray
+            float32 array of shape (len(queries), dim).
+        """
+        from src.embedding_scheduler import decode_embedding
+        from src.openai_clients import get_async_openai_client
+
+        response = await get_async_openai_client().embeddings.create(
+            model=self.api_model,
+            input=queries,
+            encoding_format="base64",
+            **self.request_kwargs,
+        )
+        return np.stack([
+            decode_embedding(item.embedding)
+            for item in sorted(response.data, key=lambda d: d.index)
+        ])
 
 
 # ── HuggingFace BGE-M3 implementation ────────────────────────────────────────
@@ -123,26 +373,65 @@ class OpenAIEmbeddingModel(EmbeddingModel):
 class BGEM3EmbeddingModel(EmbeddingModel):
     """Embedding model using BAAI/bge-m3 via FlagEmbedding (local, CPU).
 
-    BGE-M3 supports dense, sparse, and ColBERT embeddings.
-    We use dense embeddings only for vector store compatibility.
+    BGE-M3 supports dense, sparse, and ColBERT embeddings. The vector store
+    uses the dense output; encode_dense_sparse() also returns the sparse
+    lexical weights of the same forward pass (see sparse_index.py).
+
+    With quantization="int8", every nn.Linear of the encoder is replaced by
+    PyTorch's dynamically quantized int8 Linear (weights int8, activations
+    quantized on the fly). This roughly quarters the size of the Linear weights
+    and speeds up CPU inference; it is not supported on GPU.
 
     First load downloads the model (~2GB). Subsequent loads use cache.
     """
 
-    def __init__(self, model_name: str, dimensions: int) -> None:
-        super().__init__(model_name, dimensions)
+    QUANTIZATIONS: tuple[str, ...] = ("int8",)
+
+    def __init__(
+        self,
+        model_name: str,
+        dimensions: int,
+        cache: EmbeddingCache | None = None,
+        base_model: str | None = None,
+        quantization: str | None = None,
+    ) -> None:
+        super().__init__(model_name, dimensions, cache)
         from FlagEmbedding import BGEM3FlagModel
 
+        if quantization is not None and quantization not in self.QUANTIZATIONS:
+            raise ValueError(
+                f"Unknown quantization: {quantization!r}. Available: {self.QUANTIZATIONS}"
+            )
+        self.base_model = base_model or model_name
+        self.quantization = quantization
+
         print(f"  Loading BGE-M3 model (first run downloads ~2GB)...")
         t0 = time.time()
         self.model = BGEM3FlagModel(
-            model_name,
+            self.base_model,
             use_fp16=False,  # CPU — fp16 not supported
         )
+        if quantization == "int8":
+            import torch
+
+            # BGEM3FlagModel.model is the torch module wrapping the encoder
+            self.model.model = torch.ao.quantization.quantize_dynamic(
+                self.model.model, {torch.nn.Linear}, dtype=torch.qint8
+            )
         elapsed = time.time() - t0
         print(f"  ✅ BGE-M3 model loaded: {model_name} (dim={dimensions}) in {elapsed:.1f}s")
 
-    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+    def model_size_mb(self) -> float:
+        """Serialized size of the model weights in MB (int8 packed weights included)."""
+        import io
+
+        import torch
+
+        buffer = io.BytesIO()
+        torch.save(self.model.model.state_dict(), buffer)
+        return buffer.tell() / 1e6
+
+    def _embed_texts(self, texts: list[str]) -> np.ndarray:
         """Embed texts using BGE-M3 dense embeddings.
 
         Parameters
@@ -152,8 +441,8 @@ class BGEM3EmbeddingModel(EmbeddingModel):
 
         Returns
         -------
-        list[list[float]]
-            One vector per input text (dense embeddings only).
+        np.ndarray
+            float32 array of shape (len(texts), dim) (dense embeddings only).
         """
         output = self.model.encode(
             texts,
@@ -162,19 +451,171 @@ class BGEM3EmbeddingModel(EmbeddingModel):
             return_colbert_vecs=False,
         )
         # output["dense_vecs"] is a numpy array of shape (n_texts, dimensions)
-        return output["dense_vecs"].tolist()
+        return as_float32_matrix(output["dense_vecs"])
+
+    def encode_dense_sparse(
+        self, texts: list[str]
+    ) -> tuple[np.ndarray, list[dict[int, float]]]:
+        """Dense vectors and sparse lexical weights from one forward pass (no caching).
+
+        Parameters
+        ----------
+        texts : list[str]
+            Input texts to encode.
+
+        Returns
+        -------
+        tuple[np.ndarray, list[dict[int, float]]]
+            float32 array of shape (len(texts), dim), and one
+            {token_id: weight} dict per text.
+        """
+        output = self.model.encode(
+            texts,
+            return_dense=True,
+            return_sparse=True,
+            return_colbert_vecs=False,
+        )
+        # lexical_weights: one {token_id (str): weight} mapping per text
+        weights = [
+            {int(token_id): float(weight) for token_id, weight in lexical.items()}
+            for lexical in output["lexical_weights"]
+        ]
+        return as_float32_matrix(output["dense_vecs"]), weights
+
+    def embed_texts_with_sparse(
+        self, texts: list[str]
+    ) -> tuple[np.ndarray, list[dict[int, float]]]:
+        """Document-side encode_dense_sparse(): dense vectors go to the embedding cache.
+
+        A later embed_texts_array() / build_vectorstore() over the same texts
+        is then served from the cache, so indexing needs a single pass.
+        """
+        dense, weights = self.encode_dense_sparse(texts)
+        if self.cache is not None:
+            self.cache.put_many(self.cache_namespace, texts, dense)
+        return dense, weights
+
+    def embed_queries_with_sparse(
+        self, queries: list[str]
+    ) -> tuple[np.ndarray, list[dict[int, float]]]:
+        """Query-side encode_dense_sparse(): dense vectors go to the query LRU.
+
+        Sparse weights are not cached, so this always runs the model once for
+        all queries; plain dense lookups of the same queries then hit the LRU.
+        Like embed_queries_array(), it encodes the normalized query text.
+        """
+        if not queries:
+            return np.zeros((0, self.dimensions), dtype=np.float32), []
+        queries = [normalize_query(q) for q in queries]
+        dense, weights = self.encode_dense_sparse(queries)
+        if self.query_cache is not None:
+            for query, vector in zip(queries, dense):
+                self.query_cache.put(query, vector)
+        return dense, weights
+
+
+# ── Offline (hash) implementation ────────────────────────────────────────────
+
+class HashEmbeddingModel(EmbeddingModel):
+    """Deterministic, dependency-free embeddings for CI and offline benchmarks.
+
+    Signed feature hashing: every lowercased word token adds +-1 at
+    n_features positions derived from a keyed BLAKE2b hash of the token, and
+    the sum is L2-normalized. Texts sharing words get high cosine similarity,
+    so retrieval behaves like a crude lexical model. Vectors depend only on
+    (text, dimensions, seed) — identical across processes and machines. The
+    on-disk cache namespace includes them, so changing the seed never serves
+    another seed's vectors.
+
+    latency_ms simulates per-call model / network time, so concurrency
+    benchmarks (micro-batching, async retrieval) have something to overlap.
+    """
+
+    _TOKEN_RE = re.compile(r"\w+")
+
+    def __init__(
+        self,
+        model_name: str,
+        dimensions: int,
+        cache: EmbeddingCache | None = None,
+        seed: int = OFFLINE_EMBEDDING_SEED,
+        n_features: int = 4,
+        latency_ms: float = OFFLINE_EMBEDDING_LATENCY_MS,
+    ) -> None:
+        super().__init__(model_name, dimensions, cache)
+        self.seed = seed
+        self.n_features = n_features
+        self.latency_s = latency_ms / 1000.0
+        self._key = seed.to_bytes(8, "little", signed=True)
+        self.cache_namespace = f"{model_name}#dim={dimensions}#seed={seed}#features={n_features}"
+        print(f"  ✅ Offline hash embedding model loaded: {model_name} (dim={dimensions})")
+
+    def _token_features(self, token: str) -> tuple[np.ndarray, np.ndarray]:
+        """Positions and signs of one token's hashed features."""
+        digest = hashlib.blake2b(
+            token.encode("utf-8"), digest_size=4 * self.n_features, key=self._key
+        ).digest()
+        hashes = np.frombuffer(digest, dtype=np.uint32)
+        signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+        return hashes % self.dimensions, signs
+
+    def _hash_embed(self, texts: list[str]) -> np.ndarray:
+        """Signed feature hashing of word tokens, rows L2-normalized."""
+        out = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in zip(out, texts):
+            for token in self._TOKEN_RE.findall(text.lower()):
+                positions, signs = self._token_features(token)
+                np.add.at(row, positions, signs)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+    def _embed_texts(self, texts: list[str]) -> np.ndarray:
+        """Embed texts by signed feature hashing of their word tokens.
+
+        Parameters
+        ----------
+        texts : list[str]
+            Input texts to embed.
+
+        Returns
+        -------
+        np.ndarray
+            float32 array of shape (len(texts), dim), rows L2-normalized
+            (all-zero for texts without word characters).
+        """
+        if self.latency_s > 0:
+            time.sleep(self.latency_s)
+        return self._hash_embed(texts)
+
+    async def _aembed_queries_uncached(self, queries: list[str]) -> np.ndarray:
+        """Async path: simulated latency is awaited, not slept on a thread."""
+        if self.latency_s > 0:
+            await asyncio.sleep(self.latency_s)
+        return self._hash_embed(queries)
 
 
 # ── Factory ──────────────────────────────────────────────────────────────────
 
-def get_embedding_model(model_name: str) -> EmbeddingModel:
+def get_embedding_model(
+    model_name: str,
+    use_cache: bool = USE_EMBEDDING_CACHE,
+    micro_batch: bool = False,
+) -> EmbeddingModel:
     """Factory: create an embedding model by name.
 
     Parameters
     ----------
     model_name : str
         Must be a key in config.EMBEDDING_MODELS.
-        Supported: "text-embedding-3-small", "text-embedding-3-large", "BAAI/bge-m3"
+        Supported: "text-embedding-3-small", "text-embedding-3-large", "BAAI/bge-m3",
+        plus variants such as "text-embedding-3-large@256" and "BAAI/bge-m3@int8",
+        and offline hash models ("offline-hash-384", "offline-hash-1536")
+    use_cache : bool
+        If True, attach the shared on-disk embedding cache.
+    micro_batch : bool
+        If True, wrap the model in a MicroBatchingEmbedder so concurrent
+        query embeddings share model calls.
 
     Returns
     -------
@@ -196,11 +637,35 @@ def get_embedding_model(model_name: str) -> EmbeddingModel:
     provider = spec["provider"]
     dimensions = spec["dimensions"]
 
+    cache = get_embedding_cache() if use_cache else None
+
     print(f"Initializing embedding model: {model_name} (provider={provider})")
 
     if provider == "openai":
-        return OpenAIEmbeddingModel(model_name, dimensions)
+        model: EmbeddingModel = OpenAIEmbeddingModel(
+            model_name, dimensions, cache, base_model=spec.get("base_model")
+        )
     elif provider == "huggingface":
-        return BGEM3EmbeddingModel(model_name, dimensions)
+        model = BGEM3EmbeddingModel(
+            model_name,
+            dimensions,
+            cache,
+            base_model=spec.get("base_model"),
+            quantization=spec.get("quantization"),
+        )
+    elif provider == "offline":
+        model = HashEmbeddingModel(
+            model_name,
+            dimensions,
+            cache,
+            seed=spec.get("seed", OFFLINE_EMBEDDING_SEED),
+            latency_ms=spec.get("latency_ms", OFFLINE_EMBEDDING_LATENCY_MS),
+        )
     else:
-        raise ValueError(f"Unknown provider: {provider!r} for model {model_name!r}")
\ No newline at end of file
+        raise ValueError(f"Unknown provider: {provider!r} for model {model_name!r}")
+
+    if micro_batch:
+        from src.micro_batching import MicroBatchingEmbedder
+
+        model = MicroBatchingEmbedder(model)
+    return model
@@ -3,9 +3,11 @@ evaluation.py — Evaluation framework for the ONE ZERO RAG Chatbot.
 
 Four components:
 1. EVAL DATASET — 20 Q&A pairs covering both documents, edge cases, Hebrew terms.
-2. RETRIEVAL METRICS — Hit Rate @k, MRR, Context Precision, avg distance.
+2. RETRIEVAL METRICS — Hit Rate @k, MRR, Context Precision, avg distance;
+   routing accuracy of a QueryRouter against the expected source.
 3. GENERATION METRICS — LLM-as-judge (GPT-4o) for faithfulness, relevance, correctness.
-4. EMBEDDING COMPARISON — run all models, collect timings + metrics into one report.
+4. EMBEDDING COMPARISON — run all models, collect timings + metrics into one report
+   (print_dimension_tradeoff: quality vs index size for reduced-dimension variants).
 
 Usage in notebook:
     from src.evaluation import (
@@ -23,10 +25,11 @@ from dataclasses import dataclass
 import chromadb
 
 from src.embeddings import EmbeddingModel, get_embedding_model
-from src.retrieval import retrieve
-from src.generation import generate_answer
+from src.retrieval import retrieve, retrieve_many
+from src.routing import QueryRouter
+from src.generation import _get_client, generate_answer
 from src.vectorstore import build_vectorstore
-from config import TOP_K, RELEVANCE_THRESHOLD, OPENAI_API_KEY, EMBEDDING_MODELS
+from config import TOP_K, RELEVANCE_THRESHOLD, EMBEDDING_MODELS
 
 
 # ══════════════════════════════════════════════════════════════════════════════
@@ -249,6 +252,8 @@ def evaluate_retrieval(
     collection: chromadb.Collection,
     eval_dataset: list[EvalItem] = EVAL_DATASET,
     top_k: int = TOP_K,
+    batched: bool = False,
+    router: QueryRouter | None = None,
 ) -> list[RetrievalResult]:
     """Evaluate retrieval quality for all eval questions.
 
@@ -265,6 +270,12 @@ def evaluate_retrieval(
         Questions to evaluate.
     top_k : int
         Number of results to retrieve per query.
+    batched : bool
+        If True, run all questions through retrieve_many() at once. Results
+        are identical; retrieval_time_s becomes the amortized per-question time.
+    router : QueryRouter | None
+        If given, each question is routed to its predicted source first
+        (compare context_precision with and without it).
 
     Returns
     -------
@@ -273,16 +284,33 @@ def evaluate_retrieval(
     """
     results: list[RetrievalResult] = []
 
-    for item in eval_dataset:
+    if batched:
         t0 = time.time()
-        retrieved, _ = retrieve(
-            query=item.question,
+        batch_output = retrieve_many(
+            queries=[item.question for item in eval_dataset],
             embedding_model=embedding_model,
             collection=collection,
             top_k=top_k,
             relevance_threshold=None,  # no filtering — we want to measure raw retrieval
+            router=router,
         )
-        elapsed = time.time() - t0
+        amortized = (time.time() - t0) / max(len(eval_dataset), 1)
+
+    for i, item in enumerate(eval_dataset):
+        if batched:
+            retrieved, _ = batch_output[i]
+            elapsed = amortized
+        else:
+            t0 = time.time()
+            retrieved, _ = retrieve(
+                query=item.question,
+                embedding_model=embedding_model,
+                collection=collection,
+                top_k=top_k,
+                relevance_threshold=None,  # no filtering — we want to measure raw retrieval
+                router=router,
+            )
+            elapsed = time.time() - t0
 
         # Find rank of first correct hit
         hit_at_1 = False
@@ -383,6 +411,51 @@ def print_retrieval_summary(
     print()
 
 
+def evaluate_routing(
+    router: QueryRouter,
+    embedding_model: EmbeddingModel | None = None,
+    eval_dataset: list[EvalItem] = EVAL_DATASET,
+) -> dict[str, float]:
+    """Score a QueryRouter's source predictions against EvalItem.source.
+
+    Parameters
+    ----------
+    router : QueryRouter
+        Router to evaluate.
+    embedding_model : EmbeddingModel | None
+        Model for centroid routing (None = keyword routing only).
+    eval_dataset : list[EvalItem]
+        Questions with their expected source.
+
+    Returns
+    -------
+    dict[str, float]
+        - routed_rate: share of questions the router narrowed (not None)
+        - accuracy: share of routed questions sent to exactly their source
+        - misroute_rate: share of all questions whose route excludes the
+          expected source (those lose every relevant chunk)
+        - avg_route_ms: routing time per question (batched)
+    """
+    n = len(eval_dataset)
+    if n == 0:
+        return {}
+    t0 = time.perf_counter()
+    routes = router.route_many([item.question for item in eval_dataset], embedding_model)
+    elapsed = time.perf_counter() - t0
+
+    routed = [(route, item) for route, item in zip(routes, eval_dataset) if route is not None]
+    return {
+        "routed_rate": len(routed) / n,
+        "accuracy": (
+            sum(route == [item.source] for route, item in routed) / len(routed)
+            if routed else 0.0
+        ),
+        "misroute_rate": sum(item.source not in route for route, item in routed) / n,
+        "avg_route_ms": elapsed / n * 1000,
+        "n_questions": n,
+    }
+
+
 # ══════════════════════════════════════════════════════════════════════════════
 # 3. GENERATION METRICS (LLM-as-judge)
 # ══════════════════════════════════════════════════════════════════════════════
@@ -426,9 +499,7 @@ def _llm_judge(
         Keys: faithfulness_score, relevance_score, faithfulness_reason,
         relevance_reason (all strings/ints).
     """
-    from openai import OpenAI
-
-    client = OpenAI(api_key=OPENAI_API_KEY)
+    client = _get_client()  # OpenAI, or the offline stand-in (LLM_PROVIDER)
 
     judge_prompt = f"""You are evaluating a RAG chatbot's answer about bank policies.
 
@@ -510,6 +581,7 @@ def evaluate_generation(
     bm25_index=None,
     use_hybrid: bool = True,
     use_reranker: bool = True,
+    batched: bool = False,
 ) -> list[GenerationResult]:
     """Evaluate end-to-end generation quality using LLM-as-judge.
 
@@ -535,6 +607,9 @@ def evaluate_generation(
         If True, combine vector + BM25 search.
     use_reranker : bool
         If True, apply cross-encoder reranking.
+    batched : bool
+        If True, retrieve contexts for all questions up front with
+        retrieve_many() (same contexts, fewer model/index round trips).
 
     Returns
     -------
@@ -543,21 +618,29 @@ def evaluate_generation(
     """
     results: list[GenerationResult] = []
 
+    retrieval_kwargs = dict(
+        embedding_model=embedding_model,
+        collection=collection,
+        chunks=chunks,
+        bm25_index=bm25_index,
+        top_k=top_k,
+        relevance_threshold=relevance_threshold,
+        use_hybrid=use_hybrid,
+        use_reranker=use_reranker,
+    )
+    if batched:
+        batch_output = retrieve_many(
+            queries=[item.question for item in eval_dataset], **retrieval_kwargs
+        )
+
     for i, item in enumerate(eval_dataset):
         print(f"  Evaluating [{i+1}/{len(eval_dataset)}]: {item.question[:60]}...")
 
         # Retrieve
-        _, context = retrieve(
-            query=item.question,
-            embedding_model=embedding_model,
-            collection=collection,
-            chunks=chunks,
-            bm25_index=bm25_index,
-            top_k=top_k,
-            relevance_threshold=relevance_threshold,
-            use_hybrid=use_hybrid,
-            use_reranker=use_reranker,
-        )
+        if batched:
+            _, context = batch_output[i]
+        else:
+            _, context = retrieve(query=item.question, **retrieval_kwargs)
 
         # Generate
         answer = generate_answer(query=item.question, context=context)
@@ -641,7 +724,8 @@ def compare_embeddings(
     chunks : list[Chunk]
         Chunks to index (same for all models).
     model_names : list[str] | None
-        Embedding model names to compare. Defaults to all in config.
+        Embedding model names to compare. Defaults to all in config,
+        including reduced-dimension / quantized variants.
     eval_dataset : list[EvalItem]
         Questions to evaluate.
     top_k : int
@@ -654,6 +738,7 @@ def compare_embeddings(
     dict[str, dict]
         Keyed by model name. Each value contains:
         - All retrieval summary metrics (hit_rate_at_1/3/5, mrr, context_precision, ...)
+        - dimensions / index_size_mb (float32 vector payload of the collection)
         - Build timings (embedding_time_s, indexing_time_s, total_build_time_s)
         - Per-question results (retrieval_results)
     """
@@ -679,6 +764,10 @@ def compare_embeddings(
         )
         summary = compute_retrieval_summary(retrieval_results)
 
+        # Index footprint: float32 vector payload (dimension drives it)
+        summary["dimensions"] = embedding_model.dimensions
+        summary["index_size_mb"] = collection.count() * embedding_model.dimensions * 4 / 1e6
+
         # Merge timings into summary
         summary["embedding_time_s"] = timings.get("embedding_time_s", 0.0)
         summary["indexing_time_s"] = timings.get("indexing_time_s", 0.0)
@@ -690,4 +779,28 @@ def compare_embeddings(
         print_retrieval_summary(model_name, summary)
         comparison[model_name] = summary
 
-    return comparison
\ No newline at end of file
+    return comparison
+
+
+def print_dimension_tradeoff(comparison: dict[str, dict]) -> None:
+    """Print quality vs index size / latency, smallest index first.
+
+    Use with reduced-dimension variants (e.g. "text-embedding-3-large@256")
+    to pick the cheapest dimension that keeps retrieval quality.
+
+    Parameters
+    ----------
+    comparison : dict[str, dict]
+        Output from compare_embeddings().
+    """
+    print(f"\n{'='*78}")
+    print("QUALITY vs INDEX SIZE")
+    print(f"{'='*78}")
+    print(f"  {'model':<30} {'dim':>5} {'index MB':>9} {'Hit@5':>7} {'MRR':>6} {'latency ms':>11}")
+    for model_name, summary in sorted(
+        comparison.items(), key=lambda item: item[1]["index_size_mb"]
+    ):
+        print(f"  {model_name:<30} {summary['dimensions']:>5} "
+              f"{summary['index_size_mb']:>9.2f} {summary['hit_rate_at_5']:>7.1%} "
+              f"{summary['mrr']:>6.3f} {summary['avg_latency_ms']:>11.1f}")
+    print()
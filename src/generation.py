@@ -3,6 +3,8 @@ generation.py — LLM answer generation for the ONE ZERO RAG Chatbot.
 
 Sends retrieved context + user question to OpenAI GPT-4o and returns
 an answer grounded in the provided bank policy documents.
+With LLM_PROVIDER = "offline", requests go to the local OpenAI-compatible
+stand-in in offline_llm.py instead (no network; simulated latency).
 
 The LLM is instructed to:
 - Answer ONLY from the provided context (no hallucination)
@@ -11,13 +13,32 @@ The LLM is instructed to:
 
 Usage:
     answer = generate_answer(query, context)
+    answer = await agenerate_answer(query, context)   # shared AsyncOpenAI pool
+
+    metrics = {}
+    for token in generate_answer_stream(query, context, metrics=metrics):
+        print(token, end="", flush=True)
+    # metrics: ttft_s, total_s, completion_tokens, tokens_per_s
 """
 
 from __future__ import annotations
 
+import time
+from typing import AsyncIterator, Iterator
+
 from openai import OpenAI
 
-from config import OPENAI_API_KEY, LLM_MODEL, LLM_TEMPERATURE, LLM_MAX_TOKENS, SYSTEM_PROMPT
+from src.openai_clients import get_async_openai_client
+from config import (
+    OPENAI_API_KEY,
+    LLM_MODEL,
+    LLM_PROVIDER,
+    LLM_TEMPERATURE,
+    LLM_MAX_TOKENS,
+    SYSTEM_PROMPT,
+)
+
+LLM_PROVIDERS: tuple[str, ...] = ("openai", "offline")
 
 
 # ── Client (module-level singleton) ──────────────────────────────────────────
@@ -25,9 +46,19 @@ from config import OPENAI_API_KEY, LLM_MODEL, LLM_TEMPERATURE, LLM_MAX_TOKENS, S
 _client: OpenAI | None = None
 
 
+def _check_provider() -> None:
+    if LLM_PROVIDER not in LLM_PROVIDERS:
+        raise ValueError(f"Unknown LLM_PROVIDER: {LLM_PROVIDER!r}. Available: {LLM_PROVIDERS}")
+
+
 def _get_client() -> OpenAI:
-    """Lazy-initialize the OpenAI client."""
+    """Lazy-initialize the OpenAI client (or return the offline stand-in)."""
     global _client
+    _check_provider()
+    if LLM_PROVIDER == "offline":
+        from src.offline_llm import get_offline_chat_client
+
+        return get_offline_chat_client()
     if _client is None:
         if not OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY not set. Check your .env file.")
@@ -35,8 +66,43 @@ def _get_client() -> OpenAI:
     return _client
 
 
+def _get_async_client():
+    """Shared AsyncOpenAI client for the running loop (or the offline stand-in)."""
+    _check_provider()
+    if LLM_PROVIDER == "offline":
+        from src.offline_llm import get_async_offline_chat_client
+
+        return get_async_offline_chat_client()
+    return get_async_openai_client()
+
+
 # ── Generation ───────────────────────────────────────────────────────────────
 
+def _build_messages(query: str, context: str, system_prompt: str) -> list[dict]:
+    """Build the chat messages (system prompt + context-grounded question)."""
+    if context:
+        user_message = (
+            f"Context from bank policy documents:\n\n"
+            f"{context}\n\n"
+            f"---\n\n"
+            f"Question: {query}\n\n"
+            f"Answer the question based ONLY on the context above. "
+            f"Cite the source document and section for each claim."
+        )
+    else:
+        user_message = (
+            f"Question: {query}\n\n"
+            f"No relevant documents were found in the bank's policy database. "
+            f"Please let the user know you couldn't find relevant information "
+            f"and suggest they contact a bank representative."
+        )
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_message},
+    ]
+
+
 def generate_answer(
     query: str,
     context: str,
@@ -69,32 +135,162 @@ def generate_answer(
         The generated answer.
     """
     client = _get_client()
-
-    if context:
-        user_message = (
-            f"Context from bank policy documents:\n\n"
-            f"{context}\n\n"
-            f"---\n\n"
-            f"Question: {query}\n\n"
-            f"Answer the question based ONLY on the context above. "
-            f"Cite the source document and section for each claim."
-        )
-    else:
-        user_message = (
-            f"Question: {query}\n\n"
-            f"No relevant documents were found in the bank's policy database. "
-            f"Please let the user know you couldn't find relevant information "
-            f"and suggest they contact a bank representative."
-        )
+    messages = _build_messages(query, context, system_prompt)
 
     response = client.chat.completions.create(
         model=model,
         temperature=temperature,
         max_tokens=max_tokens,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_message},
-        ],
+        messages=messages,
+    )
+
+    return response.choices[0].message.content
+
+
+async def agenerate_answer(
+    query: str,
+    context: str,
+    model: str = LLM_MODEL,
+    temperature: float = LLM_TEMPERATURE,
+    max_tokens: int = LLM_MAX_TOKENS,
+    system_prompt: str = SYSTEM_PROMPT,
+) -> str:
+    """Async generate_answer() using the shared AsyncOpenAI connection pool.
+
+    Parameters and return value are the same as generate_answer().
+    """
+    client = _get_async_client()
+    response = await client.chat.completions.create(
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        messages=_build_messages(query, context, system_prompt),
+    )
+    return response.choices[0].message.content
+
+
+# ── Streaming ────────────────────────────────────────────────────────────────
+
+def _stream_metrics(
+    t_start: float,
+    t_first: float | None,
+    t_end: float,
+    completion_tokens: int,
+) -> dict[str, float]:
+    """Latency metrics for one streamed completion."""
+    generation_s = t_end - t_first if t_first is not None else 0.0
+    return {
+        "ttft_s": (t_first - t_start) if t_first is not None else t_end - t_start,
+        "total_s": t_end - t_start,
+        "completion_tokens": completion_tokens,
+        "tokens_per_s": completion_tokens / generation_s if generation_s > 0 else 0.0,
+    }
+
+
+def generate_answer_stream(
+    query: str,
+    context: str,
+    model: str = LLM_MODEL,
+    temperature: float = LLM_TEMPERATURE,
+    max_tokens: int = LLM_MAX_TOKENS,
+    system_prompt: str = SYSTEM_PROMPT,
+    metrics: dict[str, float] | None = None,
+) -> Iterator[str]:
+    """Stream the answer token by token as GPT-4o produces it.
+
+    Parameters are the same as generate_answer(), plus:
+
+    metrics : dict[str, float] | None
+        If given, filled when the stream ends (or is closed early) with:
+        - "ttft_s": time to first token
+        - "total_s": total request time
+        - "completion_tokens": tokens generated (from the API usage report)
+        - "tokens_per_s": generation rate after the first token
+
+    Yields
+    ------
+    str
+        Answer text deltas, in order. Joined, they equal the full answer.
+    """
+    client = _get_client()
+    t_start = time.perf_counter()
+    stream = client.chat.completions.create(
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        messages=_build_messages(query, context, system_prompt),
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+
+    t_first: float | None = None
+    n_deltas = 0
+    usage_tokens: int | None = None
+    try:
+        for chunk in stream:
+            if chunk.usage is not None:
+                usage_tokens = chunk.usage.completion_tokens
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if t_first is None:
+                    t_first = time.perf_counter()
+                n_deltas += 1
+                yield delta
+    finally:
+        stream.close()   # early exit: release the pooled connection now, not at GC
+        if metrics is not None:
+            metrics.update(_stream_metrics(
+                t_start, t_first, time.perf_counter(),
+                usage_tokens if usage_tokens is not None else n_deltas,
+            ))
+
+
+async def agenerate_answer_stream(
+    query: str,
+    context: str,
+    model: str = LLM_MODEL,
+    temperature: float = LLM_TEMPERATURE,
+    max_tokens: int = LLM_MAX_TOKENS,
+    system_prompt: str = SYSTEM_PROMPT,
+    metrics: dict[str, float] | None = None,
+) -> AsyncIterator[str]:
+    """Async generate_answer_stream() using the shared AsyncOpenAI pool.
+
+    Parameters, yielded values and metrics are the same as
+    generate_answer_stream().
+    """
+    client = _get_async_client()
+    t_start = time.perf_counter()
+    stream = await client.chat.completions.create(
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        messages=_build_messages(query, context, system_prompt),
+        stream=True,
+        stream_options={"include_usage": True},
     )
 
-    return response.choices[0].message.content
\ No newline at end of file
+    t_first: float | None = None
+    n_deltas = 0
+    usage_tokens: int | None = None
+    try:
+        async for chunk in stream:
+            if chunk.usage is not None:
+                usage_tokens = chunk.usage.completion_tokens
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if t_first is None:
+                    t_first = time.perf_counter()
+                n_deltas += 1
+                yield delta
+    finally:
+        await stream.close()
+        if metrics is not None:
+            metrics.update(_stream_metrics(
+                t_start, t_first, time.perf_counter(),
+                usage_tokens if usage_tokens is not None else n_deltas,
+            ))
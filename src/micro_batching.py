@@ -0,0 +1,234 @@
+"""
+micro_batching.py — Micro-batching query embedder for concurrent requests.
+
+When many users ask at once, every embed_query() is its own HTTP request
+(OpenAI) or its own single-item forward pass (BGE-M3). MicroBatchingEmbedder
+sits in front of any EmbeddingModel: a background worker collects concurrent
+query-embedding requests for up to max_wait_ms or max_batch_size queries,
+embeds them with one model call, and fans the vectors back out to the
+waiting callers.
+
+Knobs:
+- max_wait_ms:    latency the first request of a batch may wait for company
+                  (0 = only batch what is already queued).
+- max_batch_size: upper bound on queries per model call.
+- max_in_flight:  batches running concurrently (>1 for HTTP-backed models;
+                  while all slots are busy, new requests pile up into the
+                  next, larger batch).
+
+It is an EmbeddingModel itself (same model_name, dimensions and caches), so it
+is a drop-in replacement everywhere a model is accepted:
+    model = MicroBatchingEmbedder(get_embedding_model("BAAI/bge-m3"))
+    results = retrieve(query, model, collection, chunks=chunks)
+    print(model.batch_stats())
+"""
+
+from __future__ import annotations
+
+import asyncio
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+
+import numpy as np
+
+from src.embeddings import EmbeddingModel
+from config import (
+    MICROBATCH_MAX_WAIT_MS,
+    MICROBATCH_MAX_BATCH_SIZE,
+    MICROBATCH_MAX_IN_FLIGHT,
+)
+
+
+def _resolve(setter, value) -> None:
+    """Set one caller's future; a future resolved elsewhere must not stop the rest."""
+    try:
+        setter(value)
+    except InvalidStateError:
+        pass
+
+
+class MicroBatchingEmbedder(EmbeddingModel):
+    """Coalesces concurrent query embeddings into batched model calls.
+
+    Document embedding (embed_texts*) is passed straight through — it is
+    already batched. Only cache misses of the query path are micro-batched;
+    the query LRU still answers repeated questions immediately.
+    """
+
+    def __init__(
+        self,
+        model: EmbeddingModel,
+        max_wait_ms: float = MICROBATCH_MAX_WAIT_MS,
+        max_batch_size: int = MICROBATCH_MAX_BATCH_SIZE,
+        max_in_flight: int = MICROBATCH_MAX_IN_FLIGHT,
+    ) -> None:
+        """Wrap an embedding model.
+
+        Parameters
+        ----------
+        model : EmbeddingModel
+            Model that performs the actual (batched) embedding calls.
+        max_wait_ms : float
+            Maximum time the oldest queued request waits before its batch runs.
+        max_batch_size : int
+            Maximum number of queries per model call.
+        max_in_flight : int
+            Maximum number of batches embedded concurrently.
+        """
+        super().__init__(model.model_name, model.dimensions, model.cache)
+        self.model = model
+        self.cache_namespace = model.cache_namespace
+        self.index_batch_size = model.index_batch_size
+        self.max_wait_s = max_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.max_in_flight = max_in_flight
+
+        self._queue: queue.Queue[tuple[list[str], Future] | None] = queue.Queue()
+        self._worker: threading.Thread | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._slots = threading.Semaphore(max_in_flight)
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Counter[int] = Counter()
+        self._n_requests = 0
+
+    # ── Pass-through ──
+
+    def _embed_texts(self, texts: list[str]) -> np.ndarray:
+        """Documents go straight to the wrapped model (already batched)."""
+        return self.model._embed_texts(texts)
+
+    # ── Micro-batched query path ──
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            with self._start_lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_in_flight, thread_name_prefix="micro-batch"
+                    )
+                    self._worker = threading.Thread(
+                        target=self._run, name="micro-batch-embedder", daemon=True
+                    )
+                    self._worker.start()
+
+    def submit(self, queries: list[str]) -> Future:
+        """Queue queries for the next batch; the future resolves to a (n, dim) array."""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((list(queries), future))
+        return future
+
+    def _embed_queries_uncached(self, queries: list[str]) -> np.ndarray:
+        """Block until the batch containing these queries has been embedded."""
+        return self.submit(queries).result()
+
+    async def _aembed_queries_uncached(self, queries: list[str]) -> np.ndarray:
+        """Await the batch containing these queries (no executor thread blocked)."""
+        return await asyncio.wrap_future(self.submit(queries))
+
+    def _collect(self, first: tuple[list[str], Future]) -> tuple[list, bool]:
+        """Gather requests until max_batch_size queries or max_wait_s has passed.
+
+        Returns the batch and whether close() was requested meanwhile.
+        """
+        batch = [first]
+        n_queries = len(first[0])
+        deadline = time.monotonic() + self.max_wait_s
+        while n_queries < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 \
+                    else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+            n_queries += len(item[0])
+        return batch, False
+
+    def _execute(self, batch: list[tuple[list[str], Future]]) -> None:
+        """Embed one batch with a single model call and resolve its futures."""
+        try:
+            # Drop callers that were cancelled while queued (e.g. an awaiting
+            # task was cancelled); RUNNING futures can no longer be cancelled.
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                return
+            texts = [q for queries, _ in batch for q in queries]
+            with self._stats_lock:
+                self._batch_sizes[len(texts)] += 1
+                self._n_requests += len(batch)
+            try:
+                vectors = self.model._embed_queries_uncached(texts)
+            except Exception as e:   # fan the failure out to every waiting caller
+                for _, future in batch:
+                    _resolve(future.set_exception, e)
+            else:
+                offset = 0
+                for queries, future in batch:
+                    _resolve(future.set_result, vectors[offset : offset + len(queries)])
+                    offset += len(queries)
+        finally:
+            self._slots.release()
+
+    def _run(self) -> None:
+        """Worker loop: collect a batch, wait for a free slot, dispatch it."""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, closing = self._collect(first)
+            # While every slot is busy, new requests keep queueing and
+            # form the next (larger) batch.
+            self._slots.acquire()
+            self._executor.submit(self._execute, batch)
+            if closing:
+                return
+
+    def close(self) -> None:
+        """Stop the worker after the requests already queued have been served."""
+        if self._worker is not None and self._worker.is_alive():
+            self._queue.put(None)
+            self._worker.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    # ── Metrics ──
+
+    def batch_stats(self) -> dict[str, float]:
+        """Achieved batching since creation (or the last reset_batch_stats()).
+
+        Returns
+        -------
+        dict[str, float]
+            Keys: n_batches, n_requests, n_queries, mean_batch_size,
+            max_batch_size, batch_size_hist ({size: count}).
+        """
+        with self._stats_lock:
+            n_batches = sum(self._batch_sizes.values())
+            n_queries = sum(size * count for size, count in self._batch_sizes.items())
+            return {
+                "n_batches": n_batches,
+                "n_requests": self._n_requests,
+                "n_queries": n_queries,
+                "mean_batch_size": n_queries / n_batches if n_batches else 0.0,
+                "max_batch_size": max(self._batch_sizes, default=0),
+                "batch_size_hist": dict(sorted(self._batch_sizes.items())),
+            }
+
+    def reset_batch_stats(self) -> None:
+        """Reset the batching counters."""
+        with self._stats_lock:
+            self._batch_sizes.clear()
+            self._n_requests = 0
+
+    def __repr__(self) -> str:
+        return (f"MicroBatchingEmbedder({self.model!r}, "
+                f"max_wait_ms={self.max_wait_s * 1000:g}, "
+                f"max_batch_size={self.max_batch_size}, "
+                f"max_in_flight={self.max_in_flight})")
@@ -0,0 +1,374 @@
+"""
+numpy_store.py — Exact-search vector store on a memory-mapped NumPy matrix.
+
+An alternative to ChromaDB for corpora of a few hundred to a few hundred
+thousand chunks. All vectors live in one contiguous, L2-normalized float32
+matrix, so a search is a single matmul plus np.argpartition — exact results,
+no HNSW approximation, and no per-call client/SQLite overhead.
+
+On-disk layout (one directory per model):
+    vectors.npy  — float32 (n_docs, dim), opened with np.load(mmap_mode="r")
+    meta.json    — side table: ids, documents, metadatas, model info
+
+NumpyVectorStore mirrors the subset of the chromadb.Collection API used by
+this project (name, count, get, query — including ChromaDB-style `where`
+metadata filters), so query_vectorstore() and the retrieval pipeline work
+with either backend unchanged. A filtered query scores only the matching
+rows; the row set per filter is computed once and cached.
+
+Usage:
+    store = NumpyVectorStore.load(path)
+    results = store.query(query_embeddings=[q1, q2], n_results=5)
+    cards = store.query(query_embeddings=[q1], n_results=5, where={"source": "cards.md"})
+"""
+
+from __future__ import annotations
+
+import json
+import operator
+import os
+from pathlib import Path
+
+import numpy as np
+
+
+_VECTORS_FILE = "vectors.npy"
+_META_FILE = "meta.json"
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Return a float32, C-contiguous copy of vectors with unit-length rows."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0.0] = 1.0
+    return np.ascontiguousarray(vectors / norms, dtype=np.float32)
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores per row, sorted descending.
+
+    Uses np.argpartition (O(n)) and only sorts the k winners.
+
+    Parameters
+    ----------
+    scores : np.ndarray
+        Shape (n_queries, n_docs).
+    k : int
+        Number of indices to return per row (clipped to n_docs).
+
+    Returns
+    -------
+    np.ndarray
+        Shape (n_queries, k) of document indices.
+    """
+    n_docs = scores.shape[1]
+    k = min(k, n_docs)
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    if k < n_docs:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(n_docs), scores.shape).copy()
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1)
+
+
+# ── Metadata filters ─────────────────────────────────────────────────────────
+
+_WHERE_OPERATORS = {
+    "$eq": operator.eq,
+    "$ne": operator.ne,
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le,
+    "$in": lambda value, arg: value in arg,
+    "$nin": lambda value, arg: value not in arg,
+}
+
+
+def metadata_matches(metadata: dict, where: dict | None) -> bool:
+    """Evaluate a ChromaDB-style `where` filter against one metadata dict.
+
+    Supports {"field": value}, {"field": {"$op": arg}} with $eq, $ne, $gt,
+    $gte, $lt, $lte, $in, $nin, and nested {"$and": [...]} / {"$or": [...]}.
+    Several top-level fields are combined with AND. A field missing from
+    the metadata never matches (as in ChromaDB).
+
+    Raises
+    ------
+    ValueError
+        If the filter uses an unsupported operator.
+    """
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(metadata_matches(metadata, c) for c in condition):
+                return False
+        elif key == "$or":
+            if not any(metadata_matches(metadata, c) for c in condition):
+                return False
+        else:
+            if key not in metadata:
+                return False
+            conditions = condition if isinstance(condition, dict) else {"$eq": condition}
+            for op, arg in conditions.items():
+                compare = _WHERE_OPERATORS.get(op)
+                if compare is None:
+                    raise ValueError(f"Unsupported where operator: {op!r}")
+                try:
+                    if not compare(metadata[key], arg):
+                        return False
+                except TypeError:   # e.g. $gt between str and int
+                    return False
+    return True
+
+
+def metadata_mask(metadatas: list[dict], where: dict | None) -> np.ndarray:
+    """Boolean mask of the metadata dicts matching a `where` filter."""
+    return np.fromiter(
+        (metadata_matches(meta or {}, where) for meta in metadatas),
+        dtype=bool, count=len(metadatas),
+    )
+
+
+def where_key(where: dict | None) -> str:
+    """Canonical string for a filter (cache / grouping key)."""
+    return json.dumps(where, sort_keys=True)
+
+
+# ── Store class ──────────────────────────────────────────────────────────────
+
+class NumpyVectorStore:
+    """Brute-force cosine search over a normalized float32 matrix.
+
+    Distances follow ChromaDB's cosine convention (1 - cosine similarity),
+    so RELEVANCE_THRESHOLD means the same thing for both backends.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        vectors: np.ndarray,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict],
+        path: Path | None = None,
+    ) -> None:
+        """Wrap an already-normalized vector matrix and its side table.
+
+        Use NumpyVectorStore.load() / NumpyVectorStore.write() rather than
+        calling this directly.
+        """
+        self.name = name
+        self.vectors = vectors
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.path = path
+        self._id_to_row = {doc_id: i for i, doc_id in enumerate(ids)}
+        self._where_rows_cache: dict[str, np.ndarray] = {}
+
+    # ── Persistence ──
+
+    @classmethod
+    def write(
+        cls,
+        path: str | Path,
+        name: str,
+        vectors: np.ndarray,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict],
+    ) -> "NumpyVectorStore":
+        """Normalize and persist vectors + side table, then return the loaded store.
+
+        Files are written to temporaries and renamed into place, so readers
+        holding the previous memory map are never exposed to a partial file.
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        matrix = normalize_rows(vectors) if len(ids) else np.zeros((0, 0), np.float32)
+
+        tmp_vectors = path / f".{_VECTORS_FILE}.tmp"
+        with open(tmp_vectors, "wb") as f:
+            np.save(f, matrix)
+        os.replace(tmp_vectors, path / _VECTORS_FILE)
+
+        tmp_meta = path / f".{_META_FILE}.tmp"
+        tmp_meta.write_text(json.dumps({
+            "name": name,
+            "ids": ids,
+            "documents": documents,
+            "metadatas": metadatas,
+        }), encoding="utf-8")
+        os.replace(tmp_meta, path / _META_FILE)
+
+        return cls.load(path)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "NumpyVectorStore":
+        """Open a persisted store; the vector matrix is memory-mapped read-only.
+
+        Raises
+        ------
+        ValueError
+            If the directory does not contain a store.
+        """
+        path = Path(path)
+        if not (path / _VECTORS_FILE).exists() or not (path / _META_FILE).exists():
+            raise ValueError(f"No NumPy vector store found at {path}")
+
+        meta = json.loads((path / _META_FILE).read_text(encoding="utf-8"))
+        vectors = np.load(path / _VECTORS_FILE, mmap_mode="r")
+        return cls(
+            name=meta["name"],
+            vectors=vectors,
+            ids=meta["ids"],
+            documents=meta["documents"],
+            metadatas=meta["metadatas"],
+            path=path,
+        )
+
+    # ── chromadb.Collection-compatible API ──
+
+    def count(self) -> int:
+        """Number of stored documents."""
+        return len(self.ids)
+
+    def where_rows(self, where: dict | None) -> np.ndarray | None:
+        """Sorted row indices matching a `where` filter (None = no filter).
+
+        Cached per filter, so repeated filtered queries (e.g. one per
+        routed source) do not re-scan the metadata.
+        """
+        if not where:
+            return None
+        key = where_key(where)
+        rows = self._where_rows_cache.get(key)
+        if rows is None:
+            rows = np.flatnonzero(metadata_mask(self.metadatas, where))
+            self._where_rows_cache[key] = rows
+        return rows
+
+    def get(
+        self,
+        ids: list[str] | None = None,
+        include: list[str] | None = None,
+        where: dict | None = None,
+    ) -> dict:
+        """Fetch stored entries by ID (all entries if ids is None).
+
+        Returns the same flat dict shape as chromadb.Collection.get().
+        """
+        include = include if include is not None else ["documents", "metadatas"]
+        if ids is None:
+            rows = list(range(len(self.ids)))
+        else:
+            rows = [self._id_to_row[i] for i in ids if i in self._id_to_row]
+        if where:
+            rows = [r for r in rows if metadata_matches(self.metadatas[r] or {}, where)]
+
+        result: dict = {"ids": [self.ids[r] for r in rows]}
+        result["documents"] = (
+            [self.documents[r] for r in rows] if "documents" in include else None
+        )
+        result["metadatas"] = (
+            [self.metadatas[r] for r in rows] if "metadatas" in include else None
+        )
+        result["embeddings"] = (
+            np.asarray(self.vectors[rows]) if "embeddings" in include else None
+        )
+        return result
+
+    def query(
+        self,
+        query_embeddings: list | np.ndarray,
+        n_results: int = 10,
+        include: list[str] | None = None,
+        where: dict | None = None,
+    ) -> dict:
+        """Exact top-k cosine search for one or more query vectors.
+
+        All queries are scored with one matrix multiplication.
+
+        Parameters
+        ----------
+        query_embeddings : list | np.ndarray
+            One vector or a batch of vectors, shape (n_queries, dim).
+        n_results : int
+            Number of results per query.
+        include : list[str] | None
+            Fields to return, as in chromadb ("documents", "metadatas",
+            "distances", "embeddings").
+        where : dict | None
+            ChromaDB-style metadata filter (see metadata_matches). Only
+            matching rows are returned (see _subset_scores).
+
+        Returns
+        -------
+        dict
+            ChromaDB nested-list format: one inner list per query.
+        """
+        include = include if include is not None else ["documents", "metadatas", "distances"]
+        queries = normalize_rows(query_embeddings)
+        subset = self.where_rows(where)
+
+        if self.count() == 0 or (subset is not None and len(subset) == 0):
+            rows = np.empty((queries.shape[0], 0), dtype=np.int64)
+            sims = np.empty((queries.shape[0], 0), dtype=np.float32)
+        else:
+            all_sims = self._subset_scores(queries, subset)   # (n_queries, n_matching_docs)
+            top = top_k_indices(all_sims, n_results)
+            sims = np.take_along_axis(all_sims, top, axis=1)
+            rows = top if subset is None else subset[top]
+
+        return self._format_query_result(rows, sims, include)
+
+    def _subset_scores(self, queries: np.ndarray, subset: np.ndarray | None) -> np.ndarray:
+        """Cosine similarities of queries to the rows in subset (all rows if None).
+
+        Never copies matrix rows out of the memory map: a contiguous subset
+        (e.g. one source's chunks) is scored through a slice view, any other
+        subset by scoring the whole matrix and keeping its columns.
+        """
+        if subset is None:
+            return queries @ self.vectors.T
+        start, stop = int(subset[0]), int(subset[-1]) + 1
+        if stop - start == len(subset):
+            return queries @ self.vectors[start:stop].T
+        return (queries @ self.vectors.T)[:, subset]
+
+    def _format_query_result(
+        self,
+        rows: np.ndarray,
+        sims: np.ndarray,
+        include: list[str],
+    ) -> dict:
+        """Build the ChromaDB nested-list result from row indices and similarities."""
+        result: dict = {"ids": [[self.ids[r] for r in row] for row in rows]}
+        result["documents"] = (
+            [[self.documents[r] for r in row] for row in rows]
+            if "documents" in include else None
+        )
+        result["metadatas"] = (
+            [[self.metadatas[r] for r in row] for row in rows]
+            if "metadatas" in include else None
+        )
+        result["distances"] = (
+            [(1.0 - row_sims).astype(float).tolist() for row_sims in sims]
+            if "distances" in include else None
+        )
+        result["embeddings"] = (
+            [np.asarray(self.vectors[row]) for row in rows]
+            if "embeddings" in include else None
+        )
+        return result
+
+    def __repr__(self) -> str:
+        dim = self.vectors.shape[1] if self.vectors.ndim == 2 else 0
+        return f"NumpyVectorStore(name={self.name!r}, count={self.count()}, dim={dim})"
@@ -0,0 +1,351 @@
+"""
+offline_llm.py — OpenAI-compatible local stand-in for chat completions.
+
+generate_answer(), the streaming / async variants and the evaluation judge all
+call client.chat.completions.create(). With config.LLM_PROVIDER = "offline"
+they get an OfflineChatClient / AsyncOfflineChatClient instead of OpenAI: same
+call signature, same response objects (openai.types ChatCompletion /
+ChatCompletionChunk, including the final usage chunk of a stream), no network.
+
+Replies are deterministic:
+- Answer prompts: the first sentences of the top retrieved source, with a
+  citation (or the "no relevant documents" reply when there is no context).
+- Judge prompts: FAITHFULNESS/RELEVANCE/CORRECTNESS scores from word overlap
+  (answer vs context, question, expected answer), in the judge's format.
+
+Timing is simulated: latency_ms before the first token, then tokens_per_s
+(whitespace-delimited "tokens"), so TTFT, throughput and concurrency
+benchmarks produce meaningful numbers. Sync clients sleep; async clients
+await asyncio.sleep, so many requests overlap on one event loop.
+
+Usage:
+    import src.generation as generation
+    generation.LLM_PROVIDER = "offline"       # or set it in config.py
+    answer = generate_answer(query, context)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+import uuid
+from types import SimpleNamespace
+from typing import AsyncIterator, Iterator
+
+from openai.types import CompletionUsage
+from openai.types.chat import ChatCompletion, ChatCompletionChunk, ChatCompletionMessage
+from openai.types.chat.chat_completion import Choice
+from openai.types.chat.chat_completion_chunk import Choice as ChunkChoice, ChoiceDelta
+
+from config import OFFLINE_LLM_LATENCY_MS, OFFLINE_LLM_TOKENS_PER_S
+
+
+_WORD_RE = re.compile(r"\w+")
+_TOKEN_RE = re.compile(r"\S+\s*")
+_SOURCE_RE = re.compile(r"\[Source 1: (?P<source>[^|\]]+)\|(?P<section>[^|\]]+)\|[^\]]*\]\n")
+_JUDGE_RE = re.compile(
+    r"Question: (?P<question>.*?)\nExpected Answer: (?P<expected>.*?)\n"
+    r"Generated Answer: (?P<generated>.*?)\nContext Provided: (?P<context>.*?)\n\n"
+    r"Evaluate on",
+    re.DOTALL,
+)
+
+NO_CONTEXT_REPLY = (
+    "I couldn't find relevant information about this in the bank's policy "
+    "documents. Please contact a ONE ZERO Bank representative."
+)
+
+
+# ── Deterministic replies ────────────────────────────────────────────────────
+
+def _words(text: str) -> set[str]:
+    return set(_WORD_RE.findall(text.lower()))
+
+
+def _overlap_score(part: str, whole: str) -> int:
+    """1-5 score: share of `part`'s words that also occur in `whole`."""
+    words = _words(part)
+    if not words:
+        return 1
+    return 1 + round(4 * len(words & _words(whole)) / len(words))
+
+
+def _judge_reply(prompt: str) -> str:
+    """Scores in the evaluation judge's response format."""
+    match = _JUDGE_RE.search(prompt)
+    if match is None:
+        return "FAITHFULNESS_SCORE: 3\nFAITHFULNESS_REASON: Unparsed prompt.\n" \
+               "RELEVANCE_SCORE: 3\nRELEVANCE_REASON: Unparsed prompt.\n" \
+               "CORRECTNESS_SCORE: 3\nCORRECTNESS_REASON: Unparsed prompt."
+    generated = match["generated"]
+    return (
+        f"FAITHFULNESS_SCORE: {_overlap_score(generated, match['context'])}\n"
+        f"FAITHFULNESS_REASON: Word overlap of the answer with the context.\n"
+        f"RELEVANCE_SCORE: {_overlap_score(match['question'], generated)}\n"
+        f"RELEVANCE_REASON: Question words covered by the answer.\n"
+        f"CORRECTNESS_SCORE: {_overlap_score(match['expected'], generated)}\n"
+        f"CORRECTNESS_REASON: Expected-answer words covered by the answer."
+    )
+
+
+def _answer_reply(prompt: str, n_sentences: int = 2) -> str:
+    """Extractive answer from the top source block, with a citation."""
+    match = _SOURCE_RE.search(prompt)
+    if match is None:
+        return NO_CONTEXT_REPLY
+    body = prompt[match.end():].split("\n\n---\n\n", 1)[0]
+    # Drop the "## H2 / ### H3" heading lines that prefix every chunk
+    lines = [line for line in body.splitlines() if line.strip() and not line.startswith("#")]
+    sentences = re.split(r"(?<=[.!?])\s+", " ".join(lines))
+    answer = " ".join(sentences[:n_sentences]).strip()
+    return (f"{answer}\n\n(Source: {match['source'].strip()} — "
+            f"{match['section'].strip()})")
+
+
+def offline_reply(messages: list[dict]) -> str:
+    """Deterministic reply for a chat transcript (answer or judge prompt)."""
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+    if "FAITHFULNESS_SCORE" in prompt:
+        return _judge_reply(prompt)
+    return _answer_reply(prompt)
+
+
+# ── Shared request logic ─────────────────────────────────────────────────────
+
+class _OfflineCompletion:
+    """One simulated request: reply tokens, timing, and response objects."""
+
+    def __init__(
+        self,
+        model: str,
+        messages: list[dict],
+        max_tokens: int | None,
+        latency_s: float,
+        tokens_per_s: float,
+    ) -> None:
+        tokens = _TOKEN_RE.findall(offline_reply(messages))
+        self.truncated = max_tokens is not None and len(tokens) > max_tokens
+        self.tokens = tokens[:max_tokens] if max_tokens is not None else tokens
+        self.model = model
+        self.id = f"chatcmpl-offline-{uuid.uuid4().hex[:12]}"
+        self.created = int(time.time())
+        self.latency_s = latency_s
+        self.token_interval_s = 1.0 / tokens_per_s if tokens_per_s > 0 else 0.0
+        prompt_chars = sum(len(str(m.get("content", ""))) for m in messages)
+        self.usage = CompletionUsage(
+            prompt_tokens=prompt_chars // 4 + 1,
+            completion_tokens=len(self.tokens),
+            total_tokens=prompt_chars // 4 + 1 + len(self.tokens),
+        )
+
+    @property
+    def finish_reason(self) -> str:
+        return "length" if self.truncated else "stop"
+
+    @property
+    def total_s(self) -> float:
+        """Simulated duration of a non-streamed request."""
+        return self.latency_s + self.token_interval_s * len(self.tokens)
+
+    def completion(self) -> ChatCompletion:
+        return ChatCompletion(
+            id=self.id,
+            object="chat.completion",
+            created=self.created,
+            model=self.model,
+            choices=[Choice(
+                index=0,
+                finish_reason=self.finish_reason,
+                message=ChatCompletionMessage(role="assistant", content="".join(self.tokens)),
+            )],
+            usage=self.usage,
+        )
+
+    def chunk(
+        self,
+        content: str | None = None,
+        finish_reason: str | None = None,
+        usage: bool = False,
+    ) -> ChatCompletionChunk:
+        choices = [] if usage else [ChunkChoice(
+            index=0,
+            delta=ChoiceDelta(role="assistant", content=content),
+            finish_reason=finish_reason,
+        )]
+        return ChatCompletionChunk(
+            id=self.id,
+            object="chat.completion.chunk",
+            created=self.created,
+            model=self.model,
+            choices=choices,
+            usage=self.usage if usage else None,
+        )
+
+
+class _OfflineStream:
+    """Iterator over chunks with close(), like openai.Stream."""
+
+    def __init__(self, chunks: Iterator[ChatCompletionChunk]) -> None:
+        self._chunks = chunks
+
+    def __iter__(self) -> Iterator[ChatCompletionChunk]:
+        return self._chunks
+
+    def __next__(self) -> ChatCompletionChunk:
+        return next(self._chunks)
+
+    def close(self) -> None:
+        self._chunks.close()
+
+
+class _AsyncOfflineStream:
+    """Async iterator over chunks with awaitable close(), like openai.AsyncStream."""
+
+    def __init__(self, chunks: AsyncIterator[ChatCompletionChunk]) -> None:
+        self._chunks = chunks
+
+    def __aiter__(self) -> AsyncIterator[ChatCompletionChunk]:
+        return self._chunks
+
+    async def __anext__(self) -> ChatCompletionChunk:
+        return await self._chunks.__anext__()
+
+    async def close(self) -> None:
+        await self._chunks.aclose()
+
+
+# ── Sync client ──────────────────────────────────────────────────────────────
+
+class _Completions:
+    def __init__(self, client: "OfflineChatClient") -> None:
+        self._client = client
+
+    def create(
+        self,
+        model: str,
+        messages: list[dict],
+        max_tokens: int | None = None,
+        stream: bool = False,
+        stream_options: dict | None = None,
+        **kwargs,
+    ) -> ChatCompletion | Iterator[ChatCompletionChunk]:
+        """Same signature as openai's chat.completions.create (extra kwargs ignored)."""
+        request = _OfflineCompletion(
+            model, messages, max_tokens, self._client.latency_s, self._client.tokens_per_s
+        )
+        if stream:
+            include_usage = bool(stream_options and stream_options.get("include_usage"))
+            return _OfflineStream(self._stream(request, include_usage))
+        time.sleep(request.total_s)
+        return request.completion()
+
+    @staticmethod
+    def _stream(request: _OfflineCompletion, include_usage: bool) -> Iterator[ChatCompletionChunk]:
+        time.sleep(request.latency_s)
+        for i, token in enumerate(request.tokens):
+            if i:
+                time.sleep(request.token_interval_s)
+            yield request.chunk(token)
+        yield request.chunk(finish_reason=request.finish_reason)
+        if include_usage:
+            yield request.chunk(usage=True)
+
+
+class OfflineChatClient:
+    """Sync stand-in for openai.OpenAI — only client.chat.completions.create()."""
+
+    def __init__(
+        self,
+        latency_ms: float = OFFLINE_LLM_LATENCY_MS,
+        tokens_per_s: float = OFFLINE_LLM_TOKENS_PER_S,
+    ) -> None:
+        """Create the client.
+
+        Parameters
+        ----------
+        latency_ms : float
+            Simulated time to first token per request.
+        tokens_per_s : float
+            Simulated generation rate after the first token (0 = instant).
+        """
+        self.latency_s = latency_ms / 1000.0
+        self.tokens_per_s = tokens_per_s
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+    def __repr__(self) -> str:
+        return (f"{self.__class__.__name__}(latency_ms={self.latency_s * 1000:g}, "
+                f"tokens_per_s={self.tokens_per_s:g})")
+
+
+# ── Async client ─────────────────────────────────────────────────────────────
+
+class _AsyncCompletions:
+    def __init__(self, client: "AsyncOfflineChatClient") -> None:
+        self._client = client
+
+    async def create(
+        self,
+        model: str,
+        messages: list[dict],
+        max_tokens: int | None = None,
+        stream: bool = False,
+        stream_options: dict | None = None,
+        **kwargs,
+    ) -> ChatCompletion | AsyncIterator[ChatCompletionChunk]:
+        """Same signature as AsyncOpenAI's chat.completions.create."""
+        request = _OfflineCompletion(
+            model, messages, max_tokens, self._client.latency_s, self._client.tokens_per_s
+        )
+        if stream:
+            include_usage = bool(stream_options and stream_options.get("include_usage"))
+            return _AsyncOfflineStream(self._stream(request, include_usage))
+        await asyncio.sleep(request.total_s)
+        return request.completion()
+
+    @staticmethod
+    async def _stream(
+        request: _OfflineCompletion, include_usage: bool
+    ) -> AsyncIterator[ChatCompletionChunk]:
+        await asyncio.sleep(request.latency_s)
+        for i, token in enumerate(request.tokens):
+            if i:
+                await asyncio.sleep(request.token_interval_s)
+            yield request.chunk(token)
+        yield request.chunk(finish_reason=request.finish_reason)
+        if include_usage:
+            yield request.chunk(usage=True)
+
+
+class AsyncOfflineChatClient(OfflineChatClient):
+    """Async stand-in for openai.AsyncOpenAI — only chat.completions.create()."""
+
+    def __init__(
+        self,
+        latency_ms: float = OFFLINE_LLM_LATENCY_MS,
+        tokens_per_s: float = OFFLINE_LLM_TOKENS_PER_S,
+    ) -> None:
+        super().__init__(latency_ms, tokens_per_s)
+        self.chat.completions = _AsyncCompletions(self)
+
+
+# ── Singletons ───────────────────────────────────────────────────────────────
+
+_client: OfflineChatClient | None = None
+_async_client: AsyncOfflineChatClient | None = None
+
+
+def get_offline_chat_client() -> OfflineChatClient:
+    """Get the shared sync offline client (configured from config.OFFLINE_LLM_*)."""
+    global _client
+    if _client is None:
+        _client = OfflineChatClient()
+    return _client
+
+
+def get_async_offline_chat_client() -> AsyncOfflineChatClient:
+    """Get the shared async offline client (holds no loop-bound resources)."""
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncOfflineChatClient()
+    return _async_client
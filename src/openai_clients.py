@@ -0,0 +1,68 @@
+"""
+openai_clients.py — Shared async OpenAI client for the ONE ZERO RAG Chatbot.
+
+All async pipeline stages (query embedding, answer generation) share one
+AsyncOpenAI client per event loop, backed by a single pooled httpx connection
+pool. That lets one process keep dozens of requests in flight over a bounded
+number of keep-alive connections instead of opening a client per call.
+
+The client is cached per running event loop: httpx connections belong to the
+loop that opened them, so a notebook that calls asyncio.run() repeatedly gets
+a fresh pool per loop instead of "Event loop is closed" errors.
+
+Usage:
+    client = get_async_openai_client()
+    response = await client.chat.completions.create(...)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import weakref
+
+import httpx
+from openai import AsyncOpenAI
+
+from config import (
+    OPENAI_API_KEY,
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+    OPENAI_TIMEOUT_S,
+)
+
+
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """Get the shared AsyncOpenAI client for the running event loop.
+
+    Must be called from inside a coroutine.
+
+    Returns
+    -------
+    AsyncOpenAI
+        Client with a pooled connection limit of OPENAI_MAX_CONNECTIONS.
+
+    Raises
+    ------
+    ValueError
+        If OPENAI_API_KEY is not set.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        if not OPENAI_API_KEY:
+            raise ValueError("OPENAI_API_KEY not set. Check your .env file.")
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=OPENAI_TIMEOUT_S,
+        )
+        client = AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=http_client)
+        _async_clients[loop] = client
+    return client
@@ -0,0 +1,403 @@
+"""
+quantized_store.py — Compressed (int8 / product-quantized) vector store.
+
+A float32 text-embedding-3-large vector is 12 KB; a corpus kept resident for
+three models costs three times that. QuantizedVectorStore keeps only compact
+codes in RAM and searches in two steps:
+
+1. Approximate scores for every document from the codes.
+2. Exact float32 re-score of the top n_results × rescore_factor candidates,
+   reading just those rows from the memory-mapped float32 matrix on disk.
+
+Methods:
+- "int8": per-dimension 8-bit scalar quantization, x_d ≈ offset_d + scale_d·c_d
+  with c_d in 0..255 — 4x smaller. q·x = q·offset + (q∘scale)·c, scored in
+  row blocks so no full float32 copy of the codes is ever materialized.
+- "pq": product quantization — the vector is split into dim / PQ_SUBVECTOR_DIM
+  sub-vectors, each replaced by the index of its nearest of 256 k-means
+  centroids (1 byte) — 32x smaller at 8 dims per sub-vector. Scores use
+  per-query lookup tables (asymmetric distance computation).
+
+On-disk layout: a NumpyVectorStore directory (vectors.npy + meta.json) plus
+codes.npy, the quantizer arrays and quant.json. The class is a
+NumpyVectorStore subclass with the same chromadb.Collection-like API, so
+query_vectorstore() / retrieve() accept it like any other store.
+
+Usage:
+    store = build_quantized_store("text-embedding-3-large", method="pq")
+    results = query_vectorstore(query, model, store, top_k=5)
+    print(store.memory_report())
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from src.numpy_store import NumpyVectorStore, normalize_rows, top_k_indices
+from config import (
+    QUANTIZATION_RESCORE_FACTOR,
+    PQ_SUBVECTOR_DIM,
+    PQ_TRAIN_SAMPLES,
+    PQ_KMEANS_ITERS,
+)
+
+
+QUANTIZATION_METHODS: tuple[str, ...] = ("int8", "pq")
+
+_QUANT_FILE = "quant.json"
+_CODES_FILE = "codes.npy"
+_PQ_CENTROIDS: int = 256         # one uint8 code per sub-vector
+_SCORE_BLOCK_ROWS: int = 16_384  # rows de-quantized at a time during int8 scoring
+
+
+def source_signature(ids: list[str], metadatas: list[dict]) -> str:
+    """Fingerprint of a store's contents (IDs + content hashes) to detect staleness."""
+    h = hashlib.sha256()
+    for doc_id, meta in zip(ids, metadatas):
+        h.update(f"{doc_id}\0{(meta or {}).get('content_hash', '')}\n".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+# ── Quantizers ───────────────────────────────────────────────────────────────
+
+def _train_int8(vectors: np.ndarray) -> dict[str, np.ndarray]:
+    """Per-dimension min / step of an 8-bit affine quantizer."""
+    lo = vectors.min(axis=0)
+    step = (vectors.max(axis=0) - lo) / 255.0
+    step[step == 0.0] = 1.0
+    return {"offset": lo.astype(np.float32), "scale": step.astype(np.float32)}
+
+
+def _encode_int8(vectors: np.ndarray, offset: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    codes = np.rint((vectors - offset) / scale)
+    return np.clip(codes, 0, 255).astype(np.uint8)
+
+
+def _nearest_centroid(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid (squared L2) for every row of x."""
+    dists = (centroids * centroids).sum(axis=1) - 2.0 * (x @ centroids.T)
+    return dists.argmin(axis=1)
+
+
+def _train_pq(
+    vectors: np.ndarray,
+    sub_dim: int,
+    n_train: int,
+    n_iter: int,
+    rng: np.random.Generator,
+) -> dict[str, np.ndarray]:
+    """k-means codebooks, shape (n_subvectors, n_centroids, sub_dim)."""
+    n, dim = vectors.shape
+    if dim % sub_dim:
+        raise ValueError(f"PQ sub-vector size {sub_dim} does not divide dimension {dim}")
+    sample = vectors[rng.choice(n, min(n, n_train), replace=False)]
+    n_sub = dim // sub_dim
+    k = min(_PQ_CENTROIDS, len(sample))
+
+    codebooks = np.empty((n_sub, k, sub_dim), dtype=np.float32)
+    for s in range(n_sub):
+        x = sample[:, s * sub_dim : (s + 1) * sub_dim]
+        centroids = x[rng.choice(len(x), k, replace=False)].copy()
+        for _ in range(n_iter):
+            assign = _nearest_centroid(x, centroids)
+            counts = np.bincount(assign, minlength=k)
+            filled = counts > 0   # empty clusters keep their previous centroid
+            for d in range(sub_dim):
+                sums = np.bincount(assign, weights=x[:, d], minlength=k)
+                centroids[filled, d] = sums[filled] / counts[filled]
+        codebooks[s] = centroids
+    return {"codebooks": codebooks}
+
+
+def _encode_pq(vectors: np.ndarray, codebooks: np.ndarray) -> np.ndarray:
+    """PQ codes, stored transposed as (n_subvectors, n_docs) for contiguous scoring."""
+    n_sub, _, sub_dim = codebooks.shape
+    codes = np.empty((n_sub, len(vectors)), dtype=np.uint8)
+    for s in range(n_sub):
+        x = vectors[:, s * sub_dim : (s + 1) * sub_dim]
+        for start in range(0, len(x), _SCORE_BLOCK_ROWS):
+            codes[s, start : start + _SCORE_BLOCK_ROWS] = _nearest_centroid(
+                x[start : start + _SCORE_BLOCK_ROWS], codebooks[s]
+            )
+    return codes
+
+
+# ── Store class ──────────────────────────────────────────────────────────────
+
+class QuantizedVectorStore(NumpyVectorStore):
+    """Approximate search over int8 / PQ codes, re-scored in float32.
+
+    `vectors` (inherited) is the memory-mapped float32 matrix, used only for
+    re-scoring candidates and for get(include=["embeddings"]). Distances
+    follow ChromaDB's cosine convention; with rescore_factor > 0 they are
+    exact for every returned result.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        vectors: np.ndarray,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict],
+        path: Path | None = None,
+        method: str = "int8",
+        codes: np.ndarray | None = None,
+        quantizer: dict[str, np.ndarray] | None = None,
+        signature: str | None = None,
+        rescore_factor: int = QUANTIZATION_RESCORE_FACTOR,
+    ) -> None:
+        """Wrap codes, quantizer arrays and the float32 side of a store.
+
+        Use QuantizedVectorStore.write() / load() / from_store() rather
+        than calling this directly.
+        """
+        super().__init__(name, vectors, ids, documents, metadatas, path)
+        self.method = method
+        self.codes = codes
+        self.quantizer = quantizer or {}
+        self.signature = signature
+        self.rescore_factor = rescore_factor
+
+    # ── Persistence ──
+
+    @classmethod
+    def write(
+        cls,
+        path: str | Path,
+        name: str,
+        vectors: np.ndarray,
+        ids: list[str],
+        documents: list[str],
+        metadatas: list[dict],
+        method: str = "int8",
+        sub_dim: int = PQ_SUBVECTOR_DIM,
+        seed: int = 0,
+    ) -> "QuantizedVectorStore":
+        """Train the quantizer, encode all vectors and persist the store.
+
+        Parameters
+        ----------
+        path : str | Path
+            Store directory.
+        name : str
+            Store name (usually the source collection's name).
+        vectors : np.ndarray
+            float32 (n_docs, dim) vectors (normalized here).
+        ids, documents, metadatas : list
+            Side table, as for NumpyVectorStore.write().
+        method : str
+            "int8" or "pq".
+        sub_dim : int
+            Dimensions per PQ sub-vector (PQ only).
+        seed : int
+            Random seed for PQ training.
+
+        Returns
+        -------
+        QuantizedVectorStore
+            The loaded store.
+
+        Raises
+        ------
+        ValueError
+            If the method is unknown or the corpus is empty.
+        """
+        if method not in QUANTIZATION_METHODS:
+            raise ValueError(f"Unknown quantization: {method!r}. Available: {QUANTIZATION_METHODS}")
+        if not ids:
+            raise ValueError("Cannot quantize an empty store.")
+
+        path = Path(path)
+        (path / _QUANT_FILE).unlink(missing_ok=True)   # store is invalid until rewritten
+        NumpyVectorStore.write(path, name, vectors, ids, documents, metadatas)
+        matrix = np.load(path / "vectors.npy", mmap_mode="r")
+        matrix = np.asarray(matrix)
+
+        if method == "int8":
+            quantizer = _train_int8(matrix)
+            codes = _encode_int8(matrix, quantizer["offset"], quantizer["scale"])
+        else:
+            rng = np.random.default_rng(seed)
+            quantizer = _train_pq(matrix, sub_dim, PQ_TRAIN_SAMPLES, PQ_KMEANS_ITERS, rng)
+            codes = _encode_pq(matrix, quantizer["codebooks"])
+
+        np.save(path / _CODES_FILE, codes)
+        for key, array in quantizer.items():
+            np.save(path / f"{key}.npy", array)
+        tmp_quant = path / f".{_QUANT_FILE}.tmp"
+        tmp_quant.write_text(json.dumps({
+            "method": method,
+            "arrays": sorted(quantizer),
+            "signature": source_signature(ids, metadatas),
+        }), encoding="utf-8")
+        os.replace(tmp_quant, path / _QUANT_FILE)
+        return cls.load(path)
+
+    @classmethod
+    def load(
+        cls,
+        path: str | Path,
+        rescore_factor: int = QUANTIZATION_RESCORE_FACTOR,
+    ) -> "QuantizedVectorStore":
+        """Open a persisted store: codes in RAM, float32 matrix memory-mapped.
+
+        Raises
+        ------
+        ValueError
+            If the directory does not contain a quantized store.
+        """
+        path = Path(path)
+        if not (path / _QUANT_FILE).exists():
+            raise ValueError(f"No quantized vector store found at {path}")
+        base = NumpyVectorStore.load(path)
+        quant = json.loads((path / _QUANT_FILE).read_text(encoding="utf-8"))
+        return cls(
+            name=base.name,
+            vectors=base.vectors,
+            ids=base.ids,
+            documents=base.documents,
+            metadatas=base.metadatas,
+            path=path,
+            method=quant["method"],
+            codes=np.load(path / _CODES_FILE),
+            quantizer={key: np.load(path / f"{key}.npy") for key in quant["arrays"]},
+            signature=quant["signature"],
+            rescore_factor=rescore_factor,
+        )
+
+    @classmethod
+    def from_store(
+        cls,
+        source,
+        path: str | Path,
+        method: str = "int8",
+        sub_dim: int = PQ_SUBVECTOR_DIM,
+    ) -> "QuantizedVectorStore":
+        """Quantize an existing Chroma collection or NumpyVectorStore."""
+        data = source.get(include=["embeddings", "documents", "metadatas"])
+        return cls.write(
+            path,
+            name=source.name,
+            vectors=np.asarray(data["embeddings"], dtype=np.float32),
+            ids=list(data["ids"]),
+            documents=list(data["documents"]),
+            metadatas=list(data["metadatas"]),
+            method=method,
+            sub_dim=sub_dim,
+        )
+
+    # ── Search ──
+
+    def approximate_scores(
+        self,
+        queries: np.ndarray,
+        rows: np.ndarray | None = None,
+    ) -> np.ndarray:
+        """Approximate cosine similarities from the codes.
+
+        Parameters
+        ----------
+        queries : np.ndarray
+            Normalized (n_queries, dim) query vectors.
+        rows : np.ndarray | None
+            Only score these documents (e.g. a `where` subset). None = all.
+
+        Returns
+        -------
+        np.ndarray
+            float32 (n_queries, n_scored_docs).
+        """
+        if self.method == "int8":
+            codes = self.codes if rows is None else self.codes[rows]
+            offset, scale = self.quantizer["offset"], self.quantizer["scale"]
+            scaled = queries * scale
+            scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+            for start in range(0, len(codes), _SCORE_BLOCK_ROWS):
+                block = codes[start : start + _SCORE_BLOCK_ROWS].astype(np.float32)
+                scores[:, start : start + len(block)] = scaled @ block.T
+            scores += (queries @ offset)[:, None]
+            return scores
+
+        codes = self.codes if rows is None else self.codes[:, rows]
+        codebooks = self.quantizer["codebooks"]
+        n_sub, _, sub_dim = codebooks.shape
+        # Lookup tables: similarity of each query sub-vector to each centroid
+        tables = np.einsum(
+            "qsd,skd->qsk", queries.reshape(len(queries), n_sub, sub_dim), codebooks
+        )
+        scores = np.zeros((len(queries), codes.shape[1]), dtype=np.float32)
+        for s in range(n_sub):
+            scores += tables[:, s, :][:, codes[s]]
+        return scores
+
+    def query(
+        self,
+        query_embeddings: list | np.ndarray,
+        n_results: int = 10,
+        include: list[str] | None = None,
+        where: dict | None = None,
+    ) -> dict:
+        """Top-k cosine search: approximate scoring, then float32 re-score.
+
+        The top n_results × rescore_factor candidates by approximate score
+        are re-scored exactly (rescore_factor=0 skips re-scoring; distances
+        are then approximate). Parameters, `where` filtering and return
+        format are the same as NumpyVectorStore.query().
+        """
+        include = include if include is not None else ["documents", "metadatas", "distances"]
+        queries = normalize_rows(query_embeddings)
+        subset = self.where_rows(where)
+
+        if self.count() == 0 or (subset is not None and len(subset) == 0):
+            rows = np.empty((queries.shape[0], 0), dtype=np.int64)
+            sims = np.empty((queries.shape[0], 0), dtype=np.float32)
+        else:
+            approx = self.approximate_scores(queries, subset)
+            if self.rescore_factor > 0:
+                candidates = top_k_indices(approx, n_results * self.rescore_factor)
+                if subset is not None:
+                    candidates = subset[candidates]
+                exact = np.stack([
+                    np.asarray(self.vectors[cand]) @ q for q, cand in zip(queries, candidates)
+                ])
+                order = top_k_indices(exact, n_results)
+                rows = np.take_along_axis(candidates, order, axis=1)
+                sims = np.take_along_axis(exact, order, axis=1)
+            else:
+                top = top_k_indices(approx, n_results)
+                sims = np.take_along_axis(approx, top, axis=1)
+                rows = top if subset is None else subset[top]
+
+        return self._format_query_result(rows, sims, include)
+
+    # ── Reporting ──
+
+    def memory_report(self) -> dict[str, float]:
+        """Resident index memory vs keeping the float32 matrix in RAM.
+
+        Returns
+        -------
+        dict[str, float]
+            float32_mb, resident_mb (codes + quantizer), saved_mb,
+            compression (float32 / resident), bytes_per_vector.
+        """
+        float32_bytes = self.count() * self.vectors.shape[1] * 4
+        resident = self.codes.nbytes + sum(a.nbytes for a in self.quantizer.values())
+        return {
+            "float32_mb": float32_bytes / 1e6,
+            "resident_mb": resident / 1e6,
+            "saved_mb": (float32_bytes - resident) / 1e6,
+            "compression": float32_bytes / resident if resident else 0.0,
+            "bytes_per_vector": self.codes.nbytes / max(self.count(), 1),
+        }
+
+    def __repr__(self) -> str:
+        dim = self.vectors.shape[1] if self.vectors.ndim == 2 else 0
+        return (f"QuantizedVectorStore(name={self.name!r}, method={self.method!r}, "
+                f"count={self.count()}, dim={dim}, rescore_factor={self.rescore_factor})")
@@ -9,17 +9,166 @@ simultaneously, catching semantic nuances that embedding similarity misses.
 Model: cross-encoder/ms-marco-MiniLM-L-6-v2 — small, fast on CPU, proven
 on information retrieval benchmarks.
 
+Batching: candidates mix short sections (~300 chars) with 1000-char
+sub-chunks, and every batch is padded to its longest pair. Pairs are
+therefore sorted by length before scoring (length-bucketed batches of
+RERANKER_BATCH_SIZE), and scores are mapped back to the original order.
+
 Usage:
     reranker = get_reranker()
     reranked = reranker.rerank(query, candidates, top_k=5)
+    batched = reranker.rerank_many(queries, candidate_lists, top_k=5)
 """
 
 from __future__ import annotations
 
+import re
+import threading
 import time
+from pathlib import Path
+
+import numpy as np
 from sentence_transformers import CrossEncoder
 
-from config import RERANKER_MODEL
+from config import (
+    RERANKER_MODEL,
+    RERANKER_BATCH_SIZE,
+    RERANKER_MAX_LENGTH,
+    RERANKER_SORT_BY_LENGTH,
+    RERANKER_BACKEND,
+    ONNX_MODEL_DIR,
+)
+
+RERANKER_BACKENDS: tuple[str, ...] = ("torch", "onnx", "onnx-int8")
+
+
+# ── ONNX Runtime backend ─────────────────────────────────────────────────────
+
+def export_cross_encoder_onnx(
+    model_name: str = RERANKER_MODEL,
+    quantize: bool = False,
+    onnx_dir: str | Path = ONNX_MODEL_DIR,
+) -> Path:
+    """Export a HuggingFace cross-encoder to ONNX (once), optionally int8-quantized.
+
+    Parameters
+    ----------
+    model_name : str
+        HuggingFace model name for the cross-encoder.
+    quantize : bool
+        If True, also write a dynamically int8-quantized copy and return it.
+    onnx_dir : str | Path
+        Root directory for exported models (one sub-directory per model).
+
+    Returns
+    -------
+    Path
+        Path of the .onnx file to load. The tokenizer is saved next to it.
+    """
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    target_dir = Path(onnx_dir) / re.sub(r"[^a-z0-9]+", "_", model_name.lower()).strip("_")
+    fp32_path = target_dir / "model.onnx"
+    int8_path = target_dir / "model_int8.onnx"
+
+    if not fp32_path.exists():
+        print(f"  Exporting {model_name} to ONNX...")
+        target_dir.mkdir(parents=True, exist_ok=True)
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+        dummy = tokenizer(["query"], ["document text"], return_tensors="pt")
+        # Positional order of BERT-style forward(): input_ids, attention_mask, token_type_ids
+        input_names = [
+            n for n in ("input_ids", "attention_mask", "token_type_ids") if n in dummy
+        ]
+        dynamic_axes = {n: {0: "batch", 1: "sequence"} for n in input_names}
+        dynamic_axes["logits"] = {0: "batch"}
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                tuple(dummy[n] for n in input_names),
+                str(fp32_path),
+                input_names=input_names,
+                output_names=["logits"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14,
+            )
+        tokenizer.save_pretrained(target_dir)
+        model.config.save_pretrained(target_dir)
+
+    if quantize and not int8_path.exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print(f"  Quantizing {fp32_path.name} to int8...")
+        quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+
+    return int8_path if quantize else fp32_path
+
+
+class OnnxCrossEncoder:
+    """CrossEncoder-compatible predict() on ONNX Runtime (CPU).
+
+    Tokenization, truncation and the output activation match
+    sentence_transformers.CrossEncoder, so scores are directly comparable.
+    """
+
+    def __init__(
+        self,
+        model_name: str = RERANKER_MODEL,
+        quantize: bool = False,
+        max_length: int = RERANKER_MAX_LENGTH,
+    ) -> None:
+        import onnxruntime as ort
+        from transformers import AutoConfig, AutoTokenizer
+
+        model_path = export_cross_encoder_onnx(model_name, quantize=quantize)
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path.parent)
+        self.max_length = max_length
+
+        config = AutoConfig.from_pretrained(model_path.parent)
+        activation = (
+            getattr(config, "sbert_ce_default_activation_function", None)
+            or (getattr(config, "sentence_transformers", None) or {}).get("activation_fn")
+        )
+        # CrossEncoder's default for single-label models without an explicit
+        # activation is a sigmoid
+        self.apply_sigmoid = config.num_labels == 1 and (
+            activation is None or activation.endswith("Sigmoid")
+        )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            str(model_path), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+
+    def predict(
+        self,
+        pairs: list[tuple[str, str]],
+        batch_size: int = RERANKER_BATCH_SIZE,
+        show_progress_bar: bool = False,
+    ) -> np.ndarray:
+        """Score (query, document) pairs in batches; returns one score per pair."""
+        scores: list[np.ndarray] = []
+        for i in range(0, len(pairs), batch_size):
+            batch = pairs[i : i + batch_size]
+            encoded = self.tokenizer(
+                [q for q, _ in batch],
+                [d for _, d in batch],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors="np",
+            )
+            feeds = {n: encoded[n].astype(np.int64) for n in self.input_names}
+            logits = self.session.run(None, feeds)[0]
+            batch_scores = logits[:, 0] if logits.shape[1] == 1 else logits
+            if self.apply_sigmoid:
+                batch_scores = 1.0 / (1.0 + np.exp(-batch_scores))
+            scores.append(batch_scores.astype(np.float32))
+        return np.concatenate(scores) if scores else np.zeros(0, dtype=np.float32)
 
 
 # ── Reranker class ───────────────────────────────────────────────────────────
@@ -31,21 +180,86 @@ class Reranker:
     the top-k results sorted by cross-encoder score (descending).
     """
 
-    def __init__(self, model_name: str = RERANKER_MODEL) -> None:
+    def __init__(
+        self,
+        model_name: str = RERANKER_MODEL,
+        batch_size: int = RERANKER_BATCH_SIZE,
+        max_length: int = RERANKER_MAX_LENGTH,
+        sort_by_length: bool = RERANKER_SORT_BY_LENGTH,
+        backend: str = RERANKER_BACKEND,
+    ) -> None:
         """Load the cross-encoder model.
 
         Parameters
         ----------
         model_name : str
             HuggingFace model name for the cross-encoder.
+        batch_size : int
+            (query, document) pairs per forward pass.
+        max_length : int
+            Max tokens per pair; longer pairs are truncated.
+        sort_by_length : bool
+            If True, score pairs in length-sorted batches to minimize padding.
+        backend : str
+            "torch", "onnx" or "onnx-int8".
         """
+        if backend not in RERANKER_BACKENDS:
+            raise ValueError(
+                f"Unknown reranker backend: {backend!r}. Available: {RERANKER_BACKENDS}"
+            )
         self.model_name = model_name
-        print(f"  Loading cross-encoder reranker: {model_name}...")
+        self.backend = backend
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.sort_by_length = sort_by_length
+        print(f"  Loading cross-encoder reranker: {model_name} (backend={backend})...")
         t0 = time.time()
-        self.model = CrossEncoder(model_name)
+        if backend == "torch":
+            self.model = CrossEncoder(model_name, max_length=max_length)
+        else:
+            self.model = OnnxCrossEncoder(
+                model_name, quantize=(backend == "onnx-int8"), max_length=max_length
+            )
         elapsed = time.time() - t0
         print(f"  ✅ Reranker loaded in {elapsed:.1f}s")
 
+    def score_pairs(
+        self,
+        pairs: list[tuple[str, str]],
+        batch_size: int | None = None,
+    ) -> np.ndarray:
+        """Score (query, document) pairs, returning scores in input order.
+
+        Parameters
+        ----------
+        pairs : list[tuple[str, str]]
+            Pairs to score.
+        batch_size : int | None
+            Pairs per forward pass. None = self.batch_size.
+
+        Returns
+        -------
+        np.ndarray
+            One cross-encoder score per pair.
+        """
+        if not pairs:
+            return np.zeros(0, dtype=np.float32)
+        batch_size = batch_size or self.batch_size
+
+        if not self.sort_by_length:
+            return np.asarray(self.model.predict(
+                pairs, batch_size=batch_size, show_progress_bar=False
+            ))
+
+        # Length-bucketed batching: similar-length pairs share a batch
+        order = np.argsort([len(q) + len(d) for q, d in pairs], kind="stable")
+        sorted_scores = np.asarray(self.model.predict(
+            [pairs[i] for i in order], batch_size=batch_size, show_progress_bar=False
+        ))
+        scores = np.empty_like(sorted_scores)
+        scores[order] = sorted_scores
+        return scores
+
     def rerank(
         self,
         query: str,
@@ -77,7 +291,7 @@ class Reranker:
         pairs = [(query, c["text"]) for c in candidates]
 
         # Score all pairs
-        scores = self.model.predict(pairs)
+        scores = self.score_pairs(pairs)
 
         # Attach scores to candidates
         for candidate, score in zip(candidates, scores):
@@ -88,19 +302,72 @@ class Reranker:
 
         return ranked[:top_k]
 
+    def rerank_many(
+        self,
+        queries: list[str],
+        candidate_lists: list[list[dict]],
+        top_k: int = 5,
+        batch_size: int | None = None,
+    ) -> list[list[dict]]:
+        """Rerank candidates for many queries with one cross-encoder pass.
+
+        All (query, candidate) pairs are flattened and scored together in
+        batches of batch_size, then split back per query. Equivalent to
+        calling rerank() once per query.
+
+        Parameters
+        ----------
+        queries : list[str]
+            User questions.
+        candidate_lists : list[list[dict]]
+            One candidate list per query (same format as rerank()).
+        top_k : int
+            Number of top results to return per query.
+        batch_size : int | None
+            Pairs per forward pass. None = self.batch_size.
+
+        Returns
+        -------
+        list[list[dict]]
+            One reranked top-k list per query.
+        """
+        pairs = [
+            (query, c["text"])
+            for query, candidates in zip(queries, candidate_lists)
+            for c in candidates
+        ]
+        scores = self.score_pairs(pairs, batch_size=batch_size)
+
+        reranked: list[list[dict]] = []
+        offset = 0
+        for candidates in candidate_lists:
+            for candidate, score in zip(candidates, scores[offset : offset + len(candidates)]):
+                candidate["rerank_score"] = float(score)
+            offset += len(candidates)
+            ranked = sorted(candidates, key=lambda x: x["rerank_score"], reverse=True)
+            reranked.append(ranked[:top_k])
+
+        return reranked
+
 
 # ── Factory (singleton) ─────────────────────────────────────────────────────
 
 _reranker: Reranker | None = None
+_reranker_lock = threading.Lock()
 
 
-def get_reranker(model_name: str = RERANKER_MODEL) -> Reranker:
+def get_reranker(
+    model_name: str = RERANKER_MODEL,
+    backend: str = RERANKER_BACKEND,
+) -> Reranker:
     """Get or create the singleton reranker instance.
 
     Parameters
     ----------
     model_name : str
         HuggingFace cross-encoder model name.
+    backend : str
+        "torch", "onnx" or "onnx-int8".
 
     Returns
     -------
@@ -108,6 +375,13 @@ def get_reranker(model_name: str = RERANKER_MODEL) -> Reranker:
         Initialized reranker ready for rerank().
     """
     global _reranker
-    if _reranker is None or _reranker.model_name != model_name:
-        _reranker = Reranker(model_name)
-    return _reranker
\ No newline at end of file
+    # Concurrent first calls (thread pool / async retrieval) load and export
+    # the cross-encoder once; later calls wait for it instead of duplicating it.
+    with _reranker_lock:
+        if (
+            _reranker is None
+            or _reranker.model_name != model_name
+            or _reranker.backend != backend
+        ):
+            _reranker = Reranker(model_name, backend=backend)
+        return _reranker
\ No newline at end of file
@@ -2,9 +2,16 @@
 retrieval.py — Hybrid retrieval pipeline for the ONE ZERO RAG Chatbot.
 
 Three-stage retrieval:
+    0. ROUTING (optional): a QueryRouter picks the source document(s), and
+       the resulting `where` filter restricts stages 1 and 2 to that slice
+       (see routing.py)
     1. VECTOR SEARCH: Embed query → cosine similarity in ChromaDB → top-N candidates
-    2. BM25 SEARCH: Keyword match on chunk texts → top-N candidates
+    2. BM25 SEARCH: Keyword match on chunk texts → top-N candidates (see bm25.py)
+       — or, with sparse_index=, BGE-M3 learned-sparse matching, where the
+       query's dense vector and lexical weights come from one forward pass
+       (see sparse_index.py)
     3. FUSION: Reciprocal Rank Fusion merges both result lists
+       (stages 1 and 2 run concurrently; retrieve(timings=...) reports both)
     4. RERANKING: Cross-encoder re-scores top candidates for final top-k
 
 This hybrid approach fixes pure vector search weaknesses:
@@ -13,16 +20,29 @@ This hybrid approach fixes pure vector search weaknesses:
 
 Usage:
     results, context = retrieve(query, embedding_model, collection, chunks)
+    results, context = retrieve(query, bge_m3, collection, sparse_index=sparse_index)
+    results, context = retrieve(query, embedding_model, collection, chunks, router=router)
+    batched = retrieve_many(queries, embedding_model, collection, chunks)
+    results, context = await aretrieve(query, embedding_model, collection, chunks)
 """
 
 from __future__ import annotations
 
-import numpy as np
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, TypeVar
+
 import chromadb
-from rank_bm25 import BM25Okapi
+import numpy as np
 
+from src.bm25 import BM25Index, PartitionedBM25Index, get_bm25_index, get_partitioned_bm25_index
 from src.embeddings import EmbeddingModel
-from src.vectorstore import query_vectorstore
+from src.routing import QueryRouter
+from src.sparse_index import LearnedSparseIndex
+from src.vectorstore import aquery_vectorstore, query_vectorstore, query_vectorstore_many
 from src.reranker import get_reranker
 from config import (
     TOP_K,
@@ -30,67 +50,12 @@ from config import (
     RETRIEVAL_CANDIDATES,
     BM25_WEIGHT,
     VECTOR_WEIGHT,
+    PARALLEL_CANDIDATE_SEARCH,
+    RETRIEVAL_WORKERS,
+    ROUTING_FIELD,
 )
 
-
-# ── BM25 Index ───────────────────────────────────────────────────────────────
-
-class BM25Index:
-    """BM25 keyword search index over chunk texts.
-
-    Built once from all chunks, then queried per user question.
-    Tokenization is simple whitespace + lowercasing — sufficient
-    for English bank policy documents.
-    """
-
-    def __init__(self, chunks: list) -> None:
-        """Build BM25 index from chunks.
-
-        Parameters
-        ----------
-        chunks : list[Chunk]
-            All chunks (same set used for vector store).
-        """
-        self.chunks = chunks
-        self.texts = [c.text for c in chunks]
-        # Tokenize: lowercase, split on whitespace
-        tokenized = [text.lower().split() for text in self.texts]
-        self.bm25 = BM25Okapi(tokenized)
-        print(f"  ✅ BM25 index built: {len(chunks)} documents")
-
-    def search(self, query: str, top_k: int = 20) -> list[dict]:
-        """Search for relevant chunks using BM25 keyword matching.
-
-        Parameters
-        ----------
-        query : str
-            User question.
-        top_k : int
-            Number of results to return.
-
-        Returns
-        -------
-        list[dict]
-            Results with text, metadata, bm25_score. Sorted by score descending.
-        """
-        tokenized_query = query.lower().split()
-        scores = self.bm25.get_scores(tokenized_query)
-
-        # Get top-k indices by score
-        top_indices = np.argsort(scores)[::-1][:top_k]
-
-        results = []
-        for idx in top_indices:
-            if scores[idx] > 0:  # only include non-zero matches
-                chunk = self.chunks[idx]
-                results.append({
-                    "text": chunk.text,
-                    "metadata": chunk.metadata,
-                    "bm25_score": float(scores[idx]),
-                    "id": f"chunk_{idx:04d}",
-                })
-
-        return results
+T = TypeVar("T")
 
 
 # ── Reciprocal Rank Fusion ───────────────────────────────────────────────────
@@ -186,6 +151,90 @@ def format_context_for_llm(results: list[dict]) -> str:
     return "\n\n---\n\n".join(parts)
 
 
+# ── Stage execution ──────────────────────────────────────────────────────────
+
+_stage_executor: ThreadPoolExecutor | None = None
+_stage_executor_lock = threading.Lock()
+
+
+def _get_stage_executor() -> ThreadPoolExecutor:
+    """Lazy-initialize the shared thread pool for concurrent retrieval stages."""
+    global _stage_executor
+    with _stage_executor_lock:
+        if _stage_executor is None:
+            _stage_executor = ThreadPoolExecutor(
+                max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval"
+            )
+    return _stage_executor
+
+
+def _timed(fn: Callable[..., T], *args, **kwargs) -> tuple[T, float]:
+    """Call fn and return (result, elapsed seconds)."""
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def _finalize_results(
+    results: list[dict],
+    relevance_threshold: float | None,
+    use_reranker: bool,
+) -> tuple[list[dict], str]:
+    """Apply the relevance threshold and format the LLM context."""
+    # Apply relevance threshold ONLY when reranker is not used
+    # (reranker already filters by quality — double-filtering causes false drops)
+    if relevance_threshold is not None and not use_reranker:
+        results = [
+            r for r in results
+            if r.get("distance", 0.0) <= relevance_threshold
+        ]
+
+    return results, format_context_for_llm(results)
+
+
+def _resolve_bm25_index(
+    chunks: list,
+    where: dict | list[dict | None] | None,
+    router: QueryRouter | None,
+) -> BM25Index | PartitionedBM25Index:
+    """Shared BM25 index for the chunks; per-source sub-indexes when filtering."""
+    if where is None or (isinstance(where, list) and not any(where)):
+        return get_bm25_index(chunks)
+    return get_partitioned_bm25_index(chunks, router.field if router else ROUTING_FIELD)
+
+
+def _dense_sparse_search(
+    query: str,
+    embedding_model: EmbeddingModel,
+    collection: chromadb.Collection,
+    sparse_index: LearnedSparseIndex,
+    top_k: int,
+    stage_times: dict[str, float],
+    where: dict | None = None,
+) -> tuple[list[dict], list[dict]]:
+    """Stages 1+2 from a single forward pass: dense search + learned-sparse search.
+
+    Fills stage_times with encode_s, vector_search_s and sparse_search_s.
+    """
+    (dense, weights), stage_times["encode_s"] = _timed(
+        embedding_model.embed_queries_with_sparse, [query]
+    )
+    vector_results, stage_times["vector_search_s"] = _timed(
+        query_vectorstore,
+        query=query,
+        embedding_model=embedding_model,
+        collection=collection,
+        top_k=top_k,
+        relevance_threshold=None,  # no filtering before reranking
+        query_embedding=dense[0],
+        where=where,
+    )
+    sparse_results, stage_times["sparse_search_s"] = _timed(
+        sparse_index.search_weights, weights[0], top_k=top_k, where=where
+    )
+    return vector_results, sparse_results
+
+
 # ── Main retrieval function ──────────────────────────────────────────────────
 
 def retrieve(
@@ -199,9 +248,19 @@ def retrieve(
     relevance_threshold: float | None = RELEVANCE_THRESHOLD,
     use_hybrid: bool = True,
     use_reranker: bool = True,
+    parallel: bool = PARALLEL_CANDIDATE_SEARCH,
+    sparse_index: LearnedSparseIndex | None = None,
+    timings: dict[str, float] | None = None,
+    where: dict | None = None,
+    router: QueryRouter | None = None,
 ) -> tuple[list[dict], str]:
     """Full hybrid retrieval pipeline: vector + BM25 → fusion → rerank → format.
 
+    Vector search (network-bound for OpenAI models) and BM25 search (CPU) are
+    independent; with parallel=True, BM25 runs on a worker thread while the
+    vector search runs on the calling thread, so stages 1+2 cost
+    max(vector, bm25) instead of their sum.
+
     Parameters
     ----------
     query : str
@@ -214,8 +273,10 @@ def retrieve(
         All chunks (needed for BM25). If None and use_hybrid=True,
         falls back to vector-only search.
     bm25_index : BM25Index | None
-        Pre-built BM25 index. If None and chunks provided, builds one.
-        Pass a pre-built index to avoid rebuilding per query.
+        Pre-built BM25 index (or PartitionedBM25Index). If None and chunks
+        provided, the shared index for these chunks is fetched via
+        get_bm25_index() — or get_partitioned_bm25_index() when a `where`
+        filter applies (built only once).
     top_k : int
         Number of final results to return.
     n_candidates : int
@@ -226,6 +287,27 @@ def retrieve(
         If True, combine vector + BM25 search. If False, vector only.
     use_reranker : bool
         If True, apply cross-encoder reranking to candidates.
+    parallel : bool
+        If True, run vector and BM25 search concurrently.
+    sparse_index : LearnedSparseIndex | None
+        If given (and use_hybrid=True), replaces BM25: one BGE-M3 forward
+        pass (embedding_model.embed_queries_with_sparse) yields the query's
+        dense vector and lexical weights, searched in the vector store and
+        this index respectively. embedding_model must be the BGE-M3 model
+        the index was built with.
+    timings : dict[str, float] | None
+        If given, filled with per-stage wall-clock seconds:
+        route_s, vector_search_s, bm25_search_s, candidate_search_s
+        (stages 1+2 together, excluding routing and BM25 index loading),
+        fusion_s, rerank_s, total_s. With
+        sparse_index, also encode_s and sparse_search_s (vector_search_s
+        then excludes encoding).
+    where : dict | None
+        ChromaDB metadata filter (e.g. {"source": "cards.md"}) applied to
+        the vector, BM25 and learned-sparse searches.
+    router : QueryRouter | None
+        If given and `where` is None, routes the query first and uses the
+        routed `where` filter (None when the router is not confident).
 
     Returns
     -------
@@ -233,46 +315,288 @@ def retrieve(
         - results: list of dicts (text, metadata, distance, id) for evaluation
         - context: formatted string ready for LLM prompt
     """
-    # Stage 1: Vector search (retrieve more candidates for reranking)
-    candidate_count = n_candidates if use_reranker else top_k
-    vector_results = query_vectorstore(
-        query=query,
-        embedding_model=embedding_model,
-        collection=collection,
-        top_k=candidate_count,
-        relevance_threshold=None,  # no filtering before reranking
-    )
+    t_start = time.perf_counter()
+    stage_times = {"route_s": 0.0, "bm25_search_s": 0.0, "fusion_s": 0.0, "rerank_s": 0.0}
 
-    # Stage 2: BM25 search (if hybrid enabled and chunks available)
-    if use_hybrid and (bm25_index is not None or chunks is not None):
-        if bm25_index is None and chunks is not None:
-            bm25_index = BM25Index(chunks)
-        bm25_results = bm25_index.search(query, top_k=candidate_count)
+    # Stage 0: Routing — restrict the search to the routed source(s)
+    if router is not None and where is None:
+        where, stage_times["route_s"] = _timed(router.where, query, embedding_model)
 
-        # Stage 3: Reciprocal Rank Fusion
-        candidates = _reciprocal_rank_fusion(vector_results, bm25_results)
+    # Stage 1 + 2: Vector search and BM25 search (concurrently if enabled)
+    candidate_count = n_candidates if use_reranker else top_k
+    run_sparse = use_hybrid and sparse_index is not None
+    run_bm25 = use_hybrid and not run_sparse and (bm25_index is not None or chunks is not None)
+    if run_bm25 and bm25_index is None:
+        bm25_index = _resolve_bm25_index(chunks, where, router)
+
+    def vector_search() -> list[dict]:
+        return query_vectorstore(
+            query=query,
+            embedding_model=embedding_model,
+            collection=collection,
+            top_k=candidate_count,
+            relevance_threshold=None,  # no filtering before reranking
+            where=where,
+        )
+
+    t_candidates = time.perf_counter()   # after routing / index resolution
+    if run_sparse:
+        vector_results, lexical_results = _dense_sparse_search(
+            query, embedding_model, collection, sparse_index, candidate_count, stage_times,
+            where,
+        )
+    elif run_bm25 and parallel:
+        bm25_future = _get_stage_executor().submit(
+            _timed, bm25_index.search, query, top_k=candidate_count, where=where
+        )
+        vector_results, stage_times["vector_search_s"] = _timed(vector_search)
+        bm25_results, stage_times["bm25_search_s"] = bm25_future.result()
+    else:
+        vector_results, stage_times["vector_search_s"] = _timed(vector_search)
+        if run_bm25:
+            bm25_results, stage_times["bm25_search_s"] = _timed(
+                bm25_index.search, query, top_k=candidate_count, where=where
+            )
+    stage_times["candidate_search_s"] = time.perf_counter() - t_candidates
+
+    # Stage 3: Reciprocal Rank Fusion
+    if run_sparse or run_bm25:
+        candidates, stage_times["fusion_s"] = _timed(
+            _reciprocal_rank_fusion,
+            vector_results,
+            lexical_results if run_sparse else bm25_results,
+        )
     else:
         candidates = vector_results
 
     # Stage 4: Cross-encoder reranking
     if use_reranker:
         reranker = get_reranker()
-        results = reranker.rerank(query, candidates, top_k=top_k)
+        results, stage_times["rerank_s"] = _timed(
+            reranker.rerank, query, candidates, top_k=top_k
+        )
     else:
         results = candidates[:top_k]
 
-    # Apply relevance threshold ONLY when reranker is not used
-    # (reranker already filters by quality — double-filtering causes false drops)
-    if relevance_threshold is not None and not use_reranker:
-        results = [
-            r for r in results
-            if r.get("distance", 0.0) <= relevance_threshold
-        ]
+    results, context = _finalize_results(results, relevance_threshold, use_reranker)
 
-    context = format_context_for_llm(results)
+    if timings is not None:
+        stage_times["total_s"] = time.perf_counter() - t_start
+        timings.update(stage_times)
     return results, context
 
 
+async def aretrieve(
+    query: str,
+    embedding_model: EmbeddingModel,
+    collection: chromadb.Collection,
+    chunks: list | None = None,
+    bm25_index: BM25Index | None = None,
+    top_k: int = TOP_K,
+    n_candidates: int = RETRIEVAL_CANDIDATES,
+    relevance_threshold: float | None = RELEVANCE_THRESHOLD,
+    use_hybrid: bool = True,
+    use_reranker: bool = True,
+    timings: dict[str, float] | None = None,
+    sparse_index: LearnedSparseIndex | None = None,
+    where: dict | None = None,
+    router: QueryRouter | None = None,
+) -> tuple[list[dict], str]:
+    """Async retrieve(): same pipeline and output, without blocking the event loop.
+
+    The query embedding is awaited (native async for OpenAI models) while
+    BM25 runs concurrently on the retrieval thread pool; the cross-encoder
+    also runs on that pool. Parameters and return value match retrieve()
+    (stages 1 and 2 always run concurrently). With sparse_index, the single
+    dense + sparse forward pass and both searches run on the thread pool,
+    as does routing.
+    """
+    loop = asyncio.get_running_loop()
+    executor = _get_stage_executor()
+    t_start = time.perf_counter()
+    stage_times = {"route_s": 0.0, "bm25_search_s": 0.0, "fusion_s": 0.0, "rerank_s": 0.0}
+
+    # Stage 0: Routing — restrict the search to the routed source(s)
+    if router is not None and where is None:
+        where, stage_times["route_s"] = await loop.run_in_executor(
+            executor, partial(_timed, router.where, query, embedding_model)
+        )
+
+    # Stage 1 + 2: Vector search and BM25 search, concurrently
+    candidate_count = n_candidates if use_reranker else top_k
+    run_sparse = use_hybrid and sparse_index is not None
+    run_bm25 = use_hybrid and not run_sparse and (bm25_index is not None or chunks is not None)
+    if run_bm25 and bm25_index is None:
+        bm25_index = await loop.run_in_executor(
+            executor, _resolve_bm25_index, chunks, where, router
+        )
+
+    async def vector_search() -> tuple[list[dict], float]:
+        t0 = time.perf_counter()
+        results = await aquery_vectorstore(
+            query=query,
+            embedding_model=embedding_model,
+            collection=collection,
+            top_k=candidate_count,
+            relevance_threshold=None,  # no filtering before reranking
+            where=where,
+        )
+        return results, time.perf_counter() - t0
+
+    t_candidates = time.perf_counter()   # after routing / index resolution
+    if run_sparse:
+        vector_results, lexical_results = await loop.run_in_executor(
+            executor,
+            partial(
+                _dense_sparse_search, query, embedding_model, collection,
+                sparse_index, candidate_count, stage_times, where,
+            ),
+        )
+    elif run_bm25:
+        bm25_future = loop.run_in_executor(
+            executor,
+            partial(_timed, bm25_index.search, query, top_k=candidate_count, where=where),
+        )
+        (vector_results, vector_s), (bm25_results, bm25_s) = await asyncio.gather(
+            vector_search(), bm25_future
+        )
+        stage_times["vector_search_s"] = vector_s
+        stage_times["bm25_search_s"] = bm25_s
+    else:
+        vector_results, stage_times["vector_search_s"] = await vector_search()
+    stage_times["candidate_search_s"] = time.perf_counter() - t_candidates
+
+    # Stage 3: Reciprocal Rank Fusion
+    if run_sparse or run_bm25:
+        candidates, stage_times["fusion_s"] = _timed(
+            _reciprocal_rank_fusion,
+            vector_results,
+            lexical_results if run_sparse else bm25_results,
+        )
+    else:
+        candidates = vector_results
+
+    # Stage 4: Cross-encoder reranking (CPU-bound → thread pool)
+    if use_reranker:
+        reranker = await loop.run_in_executor(executor, get_reranker)
+        results, stage_times["rerank_s"] = await loop.run_in_executor(
+            executor, partial(_timed, reranker.rerank, query, candidates, top_k=top_k)
+        )
+    else:
+        results = candidates[:top_k]
+
+    results, context = _finalize_results(results, relevance_threshold, use_reranker)
+
+    if timings is not None:
+        stage_times["total_s"] = time.perf_counter() - t_start
+        timings.update(stage_times)
+    return results, context
+
+
+def retrieve_many(
+    queries: list[str],
+    embedding_model: EmbeddingModel,
+    collection: chromadb.Collection,
+    chunks: list | None = None,
+    bm25_index: BM25Index | None = None,
+    top_k: int = TOP_K,
+    n_candidates: int = RETRIEVAL_CANDIDATES,
+    relevance_threshold: float | None = RELEVANCE_THRESHOLD,
+    use_hybrid: bool = True,
+    use_reranker: bool = True,
+    rerank_batch_size: int | None = None,
+    sparse_index: LearnedSparseIndex | None = None,
+    where: dict | list[dict | None] | None = None,
+    router: QueryRouter | None = None,
+) -> list[tuple[list[dict], str]]:
+    """Batched retrieve(): same pipeline, each stage run once for all queries.
+
+    - one embed_queries_array() call for all query vectors
+    - one multi-query collection.query() (query_vectorstore_many)
+    - one BM25Index.search_many() pass (or, with sparse_index, one BGE-M3
+      forward pass for dense vectors + lexical weights of all queries)
+    - one cross-encoder pass over all (query, candidate) pairs
+    - with router, one routing pass reusing the batch's query vectors;
+      queries sharing a `where` filter are searched together
+
+    Output is the same as calling retrieve() for each query in a loop
+    (with the NumPy backend, distances may differ in the last float32 bit
+    because a batched matmul sums in a different order).
+
+    Parameters
+    ----------
+    queries : list[str]
+        User questions.
+    embedding_model, collection, chunks, bm25_index, top_k, n_candidates,
+    relevance_threshold, use_hybrid, use_reranker, sparse_index, router
+        As in retrieve().
+    rerank_batch_size : int | None
+        (query, candidate) pairs per cross-encoder forward pass.
+        None = the reranker's configured batch size.
+    where : dict | list[dict | None] | None
+        Metadata filter for all queries, or one per query.
+
+    Returns
+    -------
+    list[tuple[list[dict], str]]
+        One (results, context) tuple per query, in input order.
+    """
+    if not queries:
+        return []
+
+    # Stage 1: Vector search for all queries
+    candidate_count = n_candidates if use_reranker else top_k
+    run_sparse = use_hybrid and sparse_index is not None
+    if run_sparse:
+        query_embeddings, query_weights = embedding_model.embed_queries_with_sparse(queries)
+    else:
+        query_embeddings = embedding_model.embed_queries_array(queries)
+    if router is not None and where is None:
+        where = router.where_many(queries, embedding_model, query_embeddings)
+    wheres = list(where) if isinstance(where, (list, tuple)) else [where] * len(queries)
+    vector_results = query_vectorstore_many(
+        queries,
+        embedding_model,
+        collection,
+        top_k=candidate_count,
+        relevance_threshold=None,  # no filtering before reranking
+        query_embeddings=query_embeddings,
+        where=wheres,
+    )
+
+    # Stage 2 + 3: Lexical search for all queries, then per-query fusion
+    if run_sparse:
+        candidate_lists = [
+            _reciprocal_rank_fusion(
+                v, sparse_index.search_weights(w, top_k=candidate_count, where=wh)
+            )
+            for v, w, wh in zip(vector_results, query_weights, wheres)
+        ]
+    elif use_hybrid and (bm25_index is not None or chunks is not None):
+        if bm25_index is None and chunks is not None:
+            bm25_index = _resolve_bm25_index(chunks, wheres, router)
+        bm25_results = bm25_index.search_many(queries, top_k=candidate_count, where=wheres)
+        candidate_lists = [
+            _reciprocal_rank_fusion(v, b) for v, b in zip(vector_results, bm25_results)
+        ]
+    else:
+        candidate_lists = vector_results
+
+    # Stage 4: Cross-encoder reranking over all pairs at once
+    if use_reranker:
+        reranker = get_reranker()
+        result_lists = reranker.rerank_many(
+            queries, candidate_lists, top_k=top_k, batch_size=rerank_batch_size
+        )
+    else:
+        result_lists = [candidates[:top_k] for candidates in candidate_lists]
+
+    return [
+        _finalize_results(results, relevance_threshold, use_reranker)
+        for results in result_lists
+    ]
+
+
 # ── Display helper ───────────────────────────────────────────────────────────
 
 def print_retrieval_results(query: str, results: list[dict]) -> None:
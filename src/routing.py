@@ -0,0 +1,212 @@
+"""
+routing.py — Lightweight query router: pick the source document before search.
+
+Every chunk carries a `source` metadata field (cards.md / securities.md). A
+question about ATM limits never needs securities chunks, yet an unfiltered
+search scans — and may return — both. QueryRouter predicts the relevant
+source(s) and emits a ChromaDB `where` filter, which retrieve(router=...)
+pushes into the vector query and into BM25 (per-source sub-indexes, see
+bm25.PartitionedBM25Index).
+
+Two classifiers, cheapest first:
+1. KEYWORDS: whole-word matches of per-source keyword lists
+   (config.ROUTING_KEYWORDS). Routes to the matched sources when they are a
+   strict subset of all sources.
+2. EMBEDDING CENTROIDS: cosine similarity of the query vector to the mean
+   chunk vector of each source (from_collection() reads them from the built
+   store). Routes to the best source if it leads the runner-up by at least
+   ROUTING_MIN_MARGIN. The query vector is the one retrieval uses anyway
+   (the query LRU makes the second lookup free).
+
+No confident decision → None → the whole corpus is searched, so a router
+can only narrow the search when it has evidence to.
+
+Usage:
+    router = QueryRouter.from_collection(collection)
+    router.route("What is the daily ATM limit?")          # ["cards.md"]
+    results, context = retrieve(query, model, collection, chunks, router=router)
+"""
+
+from __future__ import annotations
+
+import re
+
+import numpy as np
+
+from src.embeddings import EmbeddingModel
+from src.numpy_store import normalize_rows
+from config import ROUTING_FIELD, ROUTING_KEYWORDS, ROUTING_MIN_MARGIN
+
+
+class QueryRouter:
+    """Keyword + embedding-centroid classifier over one metadata field."""
+
+    def __init__(
+        self,
+        keywords: dict[str, list[str]] | None = None,
+        centroids: dict[str, np.ndarray] | None = None,
+        field: str = ROUTING_FIELD,
+        min_margin: float = ROUTING_MIN_MARGIN,
+    ) -> None:
+        """Create a router.
+
+        Parameters
+        ----------
+        keywords : dict[str, list[str]] | None
+            {field value: keywords}. None = config.ROUTING_KEYWORDS.
+        centroids : dict[str, np.ndarray] | None
+            {field value: centroid vector} for embedding routing. None =
+            keyword routing only (see from_collection()).
+        field : str
+            Chunk metadata field the routed values belong to.
+        min_margin : float
+            Min cosine-similarity lead of the best centroid over the second.
+        """
+        self.keywords = keywords if keywords is not None else ROUTING_KEYWORDS
+        self.field = field
+        self.min_margin = min_margin
+        self._patterns = {
+            value: re.compile(
+                r"\b(?:" + "|".join(re.escape(k.lower()) for k in words) + r")s?\b"
+            )
+            for value, words in self.keywords.items() if words
+        }
+        self.values: list[str] = sorted(set(self.keywords) | set(centroids or {}))
+        if centroids:
+            self._centroid_values = sorted(centroids)
+            self._centroids = normalize_rows(
+                np.stack([centroids[v] for v in self._centroid_values])
+            )
+        else:
+            self._centroid_values = []
+            self._centroids = None
+
+    @classmethod
+    def from_collection(
+        cls,
+        collection,
+        keywords: dict[str, list[str]] | None = None,
+        field: str = ROUTING_FIELD,
+        min_margin: float = ROUTING_MIN_MARGIN,
+    ) -> "QueryRouter":
+        """Build a router whose centroids are the mean stored vector per `field` value.
+
+        Works with any store built by build_vectorstore() (Chroma, NumPy,
+        quantized); the stored vectors are read once.
+        """
+        data = collection.get(include=["embeddings", "metadatas"])
+        vectors = normalize_rows(np.asarray(data["embeddings"], dtype=np.float32))
+        values = np.array([str((m or {}).get(field, "")) for m in data["metadatas"]])
+        centroids = {
+            value: vectors[values == value].mean(axis=0) for value in np.unique(values).tolist()
+        }
+        return cls(keywords, centroids, field, min_margin)
+
+    # ── Classification ──
+
+    def route_by_keywords(self, query: str) -> list[str] | None:
+        """Sources whose keywords occur in the query, if a strict subset of all sources."""
+        text = query.lower()
+        hits = [value for value, pattern in self._patterns.items() if pattern.search(text)]
+        if not hits or len(hits) == len(self.values):
+            return None
+        return sorted(hits)
+
+    def route_by_embeddings(self, query_embeddings: np.ndarray) -> list[list[str] | None]:
+        """Best centroid per query vector, or None when the lead is below min_margin."""
+        if self._centroids is None:
+            return [None] * len(query_embeddings)
+        sims = normalize_rows(query_embeddings) @ self._centroids.T
+        if sims.shape[1] == 1:
+            return [[self._centroid_values[0]] for _ in sims]
+        order = np.argsort(-sims, axis=1)
+        routes: list[list[str] | None] = []
+        for row_sims, row_order in zip(sims, order):
+            lead = row_sims[row_order[0]] - row_sims[row_order[1]]
+            routes.append(
+                [self._centroid_values[row_order[0]]] if lead >= self.min_margin else None
+            )
+        return routes
+
+    def route(
+        self,
+        query: str,
+        embedding_model: EmbeddingModel | None = None,
+        query_embedding: np.ndarray | None = None,
+    ) -> list[str] | None:
+        """Routed source values for one query (None = search everything).
+
+        Parameters
+        ----------
+        query : str
+            User question.
+        embedding_model : EmbeddingModel | None
+            Model of the routed collection, used to embed the query when
+            keywords are inconclusive. None (and no query_embedding) =
+            keyword routing only.
+        query_embedding : np.ndarray | None
+            Precomputed query vector.
+
+        Returns
+        -------
+        list[str] | None
+            Field values to restrict the search to.
+        """
+        return self.route_many([query], embedding_model, query_embedding)[0]
+
+    def route_many(
+        self,
+        queries: list[str],
+        embedding_model: EmbeddingModel | None = None,
+        query_embeddings: np.ndarray | None = None,
+    ) -> list[list[str] | None]:
+        """Batched route(): keywords first, one embedding call for the rest."""
+        routes = [self.route_by_keywords(q) for q in queries]
+        pending = [i for i, r in enumerate(routes) if r is None]
+        if not pending or self._centroids is None:
+            return routes
+        if query_embeddings is not None:
+            vectors = np.asarray(query_embeddings, dtype=np.float32).reshape(len(queries), -1)
+            vectors = vectors[pending]
+        elif embedding_model is not None:
+            vectors = embedding_model.embed_queries_array([queries[i] for i in pending])
+        else:
+            return routes
+        for i, route in zip(pending, self.route_by_embeddings(vectors)):
+            routes[i] = route
+        return routes
+
+    # ── Filters ──
+
+    def to_where(self, values: list[str] | None) -> dict | None:
+        """ChromaDB `where` filter for routed values (None = no filter)."""
+        if not values:
+            return None
+        if len(values) == 1:
+            return {self.field: values[0]}
+        return {self.field: {"$in": list(values)}}
+
+    def where(
+        self,
+        query: str,
+        embedding_model: EmbeddingModel | None = None,
+        query_embedding: np.ndarray | None = None,
+    ) -> dict | None:
+        """route() as a `where` filter for query_vectorstore() / BM25 search."""
+        return self.to_where(self.route(query, embedding_model, query_embedding))
+
+    def where_many(
+        self,
+        queries: list[str],
+        embedding_model: EmbeddingModel | None = None,
+        query_embeddings: np.ndarray | None = None,
+    ) -> list[dict | None]:
+        """route_many() as per-query `where` filters."""
+        return [
+            self.to_where(r)
+            for r in self.route_many(queries, embedding_model, query_embeddings)
+        ]
+
+    def __repr__(self) -> str:
+        return (f"QueryRouter(field={self.field!r}, values={self.values}, "
+                f"centroids={self._centroids is not None}, min_margin={self.min_margin})")
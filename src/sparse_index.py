@@ -0,0 +1,325 @@
+"""
+sparse_index.py — Learned-sparse (BGE-M3 lexical weights) inverted index.
+
+BGE-M3 produces, in the same forward pass as its dense vector, a sparse
+"lexical weight" per input token. Scoring a query against a document is the
+sum over shared tokens of query_weight * doc_weight. This replaces BM25's
+whitespace tokenization and hand-tuned term weights with learned ones, and
+needs no second indexing pipeline: one model pass yields both signals.
+
+Layout mirrors BM25Index (bm25.py): token rows in CSR form
+
+    row t = documents containing token t, with their lexical weight
+
+so a query score is a sparse row-slice sum and top-k uses np.argpartition.
+Results carry "sparse_score" and the chunk ID, so they fuse with vector
+results through retrieval._reciprocal_rank_fusion unchanged.
+
+Building the index (get_sparse_index) also stores the dense vectors of the
+same pass in the embedding cache, so a following build_vectorstore() for the
+same model is all cache hits.
+
+Usage:
+    model = get_embedding_model("BAAI/bge-m3")
+    sparse_index = get_sparse_index(chunks, model)      # registry → disk → build
+    collection, _ = build_vectorstore(chunks, model)    # dense: cache hits
+    results, context = retrieve(query, model, collection, sparse_index=sparse_index)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from src.bm25 import LexicalIndexMixin
+from src.chunking import corpus_fingerprint, corpus_key, get_chunk_ids
+from src.numpy_store import top_k_indices
+from config import INDEX_BATCH_SIZE, SPARSE_INDEX_DIR
+
+
+_FORMAT_VERSION: int = 1
+_MANIFEST_FILE = "manifest.json"
+_ARRAY_NAMES: tuple[str, ...] = ("token_ids", "indptr", "indices", "data")
+
+
+# ── Index ────────────────────────────────────────────────────────────────────
+
+class LearnedSparseIndex(LexicalIndexMixin):
+    """Inverted index over BGE-M3 lexical weights of all chunks.
+
+    Holds a reference to the embedding model that produced the weights, so
+    search(query) can encode queries itself; search_weights() takes weights
+    from an existing forward pass (retrieve(sparse_index=...) does this).
+    """
+
+    SCORE_KEY = "sparse_score"
+
+    def __init__(
+        self,
+        chunks: list,
+        lexical_weights: list[dict[int, float]],
+        model=None,
+    ) -> None:
+        """Build the index from precomputed per-chunk lexical weights.
+
+        Parameters
+        ----------
+        chunks : list[Chunk]
+            All chunks (same set used for the vector store).
+        lexical_weights : list[dict[int, float]]
+            One {token_id: weight} dict per chunk, in chunk order.
+        model : BGEM3EmbeddingModel | None
+            Model used to encode queries in search() / search_many().
+        """
+        self._init_corpus(chunks, model)
+        self._build(lexical_weights)
+
+    def _init_corpus(self, chunks: list, model) -> None:
+        """Set the corpus-level attributes shared by building and loading."""
+        self.chunks = chunks
+        self.ids = get_chunk_ids(chunks)  # same IDs as the vector store
+        self.model = model
+        self.model_name = model.model_name if model is not None else None
+        self._init_filters()
+
+    def _build(self, lexical_weights: list[dict[int, float]]) -> None:
+        """Compute the token vocabulary and the CSR weight matrix."""
+        postings: dict[int, list[tuple[int, float]]] = {}
+        for doc_idx, weights in enumerate(lexical_weights):
+            for token_id, weight in weights.items():
+                if weight > 0:
+                    postings.setdefault(int(token_id), []).append((doc_idx, float(weight)))
+
+        token_ids = np.array(sorted(postings), dtype=np.int64)
+        counts = np.array([len(postings[t]) for t in token_ids.tolist()], dtype=np.int64)
+        indptr = np.zeros(len(token_ids) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum(counts)
+        self.token_ids = token_ids
+        self.indptr = indptr
+        self.indices = np.fromiter(
+            (doc for t in token_ids.tolist() for doc, _ in postings[t]),
+            dtype=np.int32, count=int(indptr[-1]),
+        )
+        self.data = np.fromiter(
+            (w for t in token_ids.tolist() for _, w in postings[t]),
+            dtype=np.float32, count=int(indptr[-1]),
+        )
+        self._rows = {t: row for row, t in enumerate(token_ids.tolist())}
+
+    @classmethod
+    def build(
+        cls,
+        chunks: list,
+        model,
+        batch_size: int = INDEX_BATCH_SIZE,
+    ) -> "LearnedSparseIndex":
+        """Encode all chunks once (dense + sparse) and build the index.
+
+        Dense vectors from the same pass go to the model's embedding cache.
+
+        Parameters
+        ----------
+        chunks : list[Chunk]
+            All chunks.
+        model : BGEM3EmbeddingModel
+            Model with embed_texts_with_sparse().
+        batch_size : int
+            Chunks per forward-pass batch.
+
+        Returns
+        -------
+        LearnedSparseIndex
+            Ready-to-search index.
+        """
+        texts = [c.text for c in chunks]
+        weights: list[dict[int, float]] = []
+        for start in range(0, len(texts), batch_size):
+            _, batch_weights = model.embed_texts_with_sparse(texts[start : start + batch_size])
+            weights.extend(batch_weights)
+        index = cls(chunks, weights, model)
+        print(f"  ✅ Learned-sparse index built: {len(chunks)} documents, "
+              f"{len(index.token_ids)} tokens, {len(index.data)} postings")
+        return index
+
+    # ── Persistence ──
+
+    def save(self, path: str | Path) -> Path:
+        """Write the postings to disk (manifest last, as in BM25Index.save)."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        (path / _MANIFEST_FILE).unlink(missing_ok=True)
+        for name in _ARRAY_NAMES:
+            np.save(path / f"{name}.npy", np.asarray(getattr(self, name)))
+
+        manifest = {
+            "format_version": _FORMAT_VERSION,
+            "fingerprint": corpus_fingerprint(self.chunks),
+            "model_name": self.model_name,
+            "n_docs": len(self.chunks),
+        }
+        tmp_manifest = path / f".{_MANIFEST_FILE}.tmp"
+        tmp_manifest.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        os.replace(tmp_manifest, path / _MANIFEST_FILE)
+        print(f"  ✅ Learned-sparse index saved to {path}")
+        return path
+
+    @classmethod
+    def load(cls, chunks: list, path: str | Path, model=None) -> "LearnedSparseIndex":
+        """Load a persisted index for the given chunks and model.
+
+        Raises
+        ------
+        ValueError
+            If no artifact exists, or it was built from a different corpus,
+            model, or format version.
+        """
+        path = Path(path)
+        manifest_path = path / _MANIFEST_FILE
+        if not manifest_path.exists():
+            raise ValueError(f"No learned-sparse index found at {path}")
+
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if manifest.get("format_version") != _FORMAT_VERSION:
+            raise ValueError(f"Sparse index at {path} has an incompatible format version")
+        if manifest["fingerprint"] != corpus_fingerprint(chunks):
+            raise ValueError(f"Sparse index at {path} was built from a different corpus")
+        if model is not None and manifest["model_name"] != model.model_name:
+            raise ValueError(f"Sparse index at {path} was built with {manifest['model_name']}")
+
+        index = cls.__new__(cls)
+        index._init_corpus(chunks, model)
+        for name in _ARRAY_NAMES:
+            setattr(index, name, np.load(path / f"{name}.npy", mmap_mode="r"))
+        index._rows = {t: row for row, t in enumerate(index.token_ids.tolist())}
+        print(f"  ✅ Learned-sparse index loaded from {path}: {len(chunks)} documents, "
+              f"{len(index.token_ids)} tokens")
+        return index
+
+    # ── Scoring ──
+
+    def get_scores_from_weights(self, query_weights: dict[int, float]) -> np.ndarray:
+        """Lexical-matching score of every document for one query's weights."""
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for token_id, weight in query_weights.items():
+            row = self._rows.get(int(token_id))
+            if row is None:
+                continue
+            start, end = self.indptr[row], self.indptr[row + 1]
+            scores[self.indices[start:end]] += np.float32(weight) * self.data[start:end]
+        return scores
+
+    def search_weights(
+        self,
+        query_weights: dict[int, float],
+        top_k: int = 20,
+        where: dict | None = None,
+    ) -> list[dict]:
+        """Search with lexical weights from an existing forward pass.
+
+        Parameters
+        ----------
+        query_weights : dict[int, float]
+            {token_id: weight} for the query (BGE-M3 lexical weights).
+        top_k : int
+            Number of results to return.
+        where : dict | None
+            ChromaDB-style metadata filter; non-matching chunks are dropped.
+
+        Returns
+        -------
+        list[dict]
+            Results with text, metadata, sparse_score, id. Sorted by score.
+        """
+        scores = self.get_scores_from_weights(query_weights)
+        mask = self.where_mask(where)
+        if mask is not None:
+            scores[~mask] = 0.0
+        top_indices = top_k_indices(scores[None, :], top_k)[0]
+        return self._format_results(scores, top_indices)
+
+    def search(self, query: str, top_k: int = 20, where: dict | None = None) -> list[dict]:
+        """Encode the query with the index's model, then search_weights()."""
+        return self.search_many([query], top_k, where)[0]
+
+    def search_many(
+        self,
+        queries: list[str],
+        top_k: int = 20,
+        where: dict | list[dict | None] | None = None,
+    ) -> list[list[dict]]:
+        """Batched search(): queries are encoded in one forward pass.
+
+        `where` is one metadata filter for all queries or one per query.
+        """
+        if self.model is None:
+            raise ValueError("No model attached; use search_weights() with query weights.")
+        if not queries:
+            return []
+        wheres = list(where) if isinstance(where, (list, tuple)) else [where] * len(queries)
+        _, weights = self.model.embed_queries_with_sparse(queries)
+        return [self.search_weights(w, top_k, wh) for w, wh in zip(weights, wheres)]
+
+    def __repr__(self) -> str:
+        return (f"LearnedSparseIndex(docs={len(self.chunks)}, "
+                f"tokens={len(self.token_ids)}, model={self.model_name!r})")
+
+
+# ── Registry (process-wide) ──────────────────────────────────────────────────
+
+_registry: dict[tuple[str, str], LearnedSparseIndex] = {}
+_registry_lock = threading.Lock()
+
+
+def get_sparse_index(
+    chunks: list,
+    model,
+    path: str | Path | None = None,
+    persist: bool = True,
+) -> LearnedSparseIndex:
+    """Get the learned-sparse index for a chunk set and model, building it at most once.
+
+    Lookup order: in-process registry → persisted artifact → fresh build
+    (one dense + sparse pass over all chunks; saved if persist=True).
+
+    Parameters
+    ----------
+    chunks : list[Chunk]
+        All chunks (same set used for the vector store).
+    model : BGEM3EmbeddingModel
+        Model that produces lexical weights.
+    path : str | Path | None
+        Artifact directory. None = SPARSE_INDEX_DIR / <model slug>.
+    persist : bool
+        If True, save freshly built indexes to disk.
+
+    Returns
+    -------
+    LearnedSparseIndex
+        Shared index instance for this corpus and model.
+    """
+    from src.vectorstore import get_collection_name
+
+    if path is None:
+        path = SPARSE_INDEX_DIR / get_collection_name(model.model_name)
+    key = (corpus_key(chunks), model.model_name)
+    with _registry_lock:
+        index = _registry.get(key)
+        if index is None:
+            try:
+                index = LearnedSparseIndex.load(chunks, path, model)
+            except ValueError:
+                index = LearnedSparseIndex.build(chunks, model)
+                if persist:
+                    index.save(path)
+            _registry[key] = index
+    return index
+
+
+def clear_sparse_registry() -> None:
+    """Drop all in-process sparse indexes (persisted artifacts are kept)."""
+    with _registry_lock:
+        _registry.clear()
@@ -1,7 +1,10 @@
 """
-vectorstore.py — ChromaDB vector store for the ONE ZERO RAG Chatbot.
+vectorstore.py — Vector store for the ONE ZERO RAG Chatbot.
 
 Handles building, persisting, loading, and querying ChromaDB collections.
+A second backend, NumpyVectorStore (exact search over a memory-mapped
+matrix, see numpy_store.py), can be selected per model via the
+"vector_backend" key in config.EMBEDDING_MODELS or the backend= argument.
 Each embedding model gets its own collection so we can compare retrieval
 quality across models using the same evaluation queries.
 
@@ -11,19 +14,63 @@ Design decisions:
   and reuse vectors for evaluation.
 - Persistent storage: collections are saved to disk (vectorstore_db/) so
   re-indexing is only needed once per model.
+- Incremental sync: chunks have stable IDs plus a content hash, so a rebuild
+  only embeds and writes the chunks that were added or edited.
+- Checkpointed builds: chunks are embedded and committed in batches of
+  INDEX_BATCH_SIZE (OpenAI models: enough to fill every in-flight request),
+  with a progress manifest per collection, so an interrupted build resumes
+  where it stopped instead of starting over.
 - One collection per model: naming convention "{prefix}_{model_slug}".
+- Metadata filters: query_vectorstore(where=...) pushes a ChromaDB `where`
+  filter (e.g. {"source": "cards.md"}, chosen by routing.QueryRouter) into
+  the collection query, on every backend.
+- Quantized stores (optional): build_quantized_store() compresses an existing
+  collection / NumPy store to int8 or PQ codes (quantized_store.py); the
+  result is searched like any other store, with a float32 re-score.
+- Cached handles: one ChromaDB client per persist directory per process, and
+  loaded collections / NumPy stores cached by model name, so repeated
+  load_vectorstore() calls in a serving process are dictionary lookups.
+  build_vectorstore() invalidates the model's handle before rebuilding;
+  call invalidate_vectorstore_cache() after changing a store out of band.
 """
 
 from __future__ import annotations
 
+import asyncio
+import json
+import os
 import re
+import threading
 import time
+from pathlib import Path
 
 import chromadb
+import numpy as np
 
-from src.chunking import Chunk
-from src.embeddings import EmbeddingModel
-from config import CHROMA_PERSIST_DIR, CHROMA_COLLECTION_PREFIX, DISTANCE_METRIC
+from src.chunking import Chunk, corpus_fingerprint, get_chunk_ids, store_metadata
+from src.embeddings import EmbeddingModel, as_float32_matrix
+from src.numpy_store import NumpyVectorStore, where_key
+from src.quantized_store import QUANTIZATION_METHODS, QuantizedVectorStore, source_signature
+from config import (
+    CHROMA_PERSIST_DIR,
+    CHROMA_COLLECTION_PREFIX,
+    DISTANCE_METRIC,
+    DEFAULT_VECTOR_BACKEND,
+    HNSW_PARAMS,
+    EMBEDDING_MODELS,
+    NUMPY_STORE_DIR,
+    QUANTIZED_STORE_DIR,
+    INDEX_BATCH_SIZE,
+    BUILD_PROGRESS_DIR,
+)
+
+VECTOR_BACKENDS: tuple[str, ...] = ("chroma", "numpy")
+
+# get_collection() raises NotFoundError on chromadb >= 0.6, ValueError before
+_COLLECTION_NOT_FOUND: tuple[type[Exception], ...] = (
+    ValueError,
+    getattr(chromadb.errors, "NotFoundError", ValueError),
+)
 
 
 # ── Helpers ──────────────────────────────────────────────────────────────────
@@ -57,10 +104,311 @@ def get_collection_name(model_name: str) -> str:
     return f"{CHROMA_COLLECTION_PREFIX}_{_slugify_model_name(model_name)}"
 
 
+def get_vector_backend(model_name: str, backend: str | None = None) -> str:
+    """Resolve the vector backend for a model.
+
+    Parameters
+    ----------
+    model_name : str
+        Embedding model name.
+    backend : str | None
+        Explicit backend. None = the model's "vector_backend" from
+        config.EMBEDDING_MODELS, else DEFAULT_VECTOR_BACKEND.
+
+    Returns
+    -------
+    str
+        "chroma" or "numpy".
+
+    Raises
+    ------
+    ValueError
+        If the backend is unknown.
+    """
+    if backend is None:
+        spec = EMBEDDING_MODELS.get(model_name, {})
+        backend = spec.get("vector_backend", DEFAULT_VECTOR_BACKEND)
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(f"Unknown vector backend: {backend!r}. Available: {VECTOR_BACKENDS}")
+    return backend
+
+
+def get_hnsw_params(
+    model_name: str,
+    overrides: dict[str, int] | None = None,
+) -> dict[str, int]:
+    """Resolve the Chroma HNSW parameters for a model's collection.
+
+    Parameters
+    ----------
+    model_name : str
+        Embedding model name.
+    overrides : dict[str, int] | None
+        Explicit values, applied on top of config.HNSW_PARAMS and the model's
+        "hnsw" entry in config.EMBEDDING_MODELS.
+
+    Returns
+    -------
+    dict[str, int]
+        {"hnsw:M": ..., "hnsw:construction_ef": ..., "hnsw:search_ef": ...}
+
+    Raises
+    ------
+    ValueError
+        If a parameter name is unknown.
+    """
+    spec = EMBEDDING_MODELS.get(model_name, {})
+    params = {**HNSW_PARAMS, **spec.get("hnsw", {}), **(overrides or {})}
+    unknown = set(params) - set(HNSW_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown HNSW parameters: {sorted(unknown)}. "
+                         f"Available: {list(HNSW_PARAMS)}")
+    return params
+
+
+# chromadb >= 1.0 reports the effective index settings in collection.configuration
+_HNSW_CONFIGURATION_KEYS: dict[str, str] = {
+    "hnsw:M": "max_neighbors",
+    "hnsw:construction_ef": "ef_construction",
+    "hnsw:search_ef": "ef_search",
+}
+_HNSW_BUILD_KEYS: tuple[str, ...] = ("hnsw:M", "hnsw:construction_ef")
+
+
+def _collection_hnsw_params(collection: chromadb.Collection) -> dict[str, int]:
+    """Effective HNSW parameters of an existing collection.
+
+    Collections created before the parameters were configurable carry no
+    hnsw:* metadata; they were built with Chroma's defaults (HNSW_PARAMS).
+    """
+    configuration = getattr(collection, "configuration", None) or {}
+    hnsw = configuration.get("hnsw") or {}
+    metadata = collection.metadata or {}
+    return {
+        key: hnsw.get(_HNSW_CONFIGURATION_KEYS[key], metadata.get(key, default))
+        for key, default in HNSW_PARAMS.items()
+    }
+
+
+def set_search_ef(collection: chromadb.Collection, search_ef: int) -> None:
+    """Persist a new query-time beam width for an existing collection.
+
+    ChromaDB keeps a loaded HNSW index in memory with the search_ef it was
+    opened with, so the new value takes effect when the index is next loaded
+    (e.g. a new process) — not for handles already serving queries.
+    """
+    try:
+        collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+    except TypeError:   # chromadb < 1.0: settings live in the metadata
+        collection.modify(metadata={**(collection.metadata or {}), "hnsw:search_ef": search_ef})
+
+
+def _get_numpy_store_path(model_name: str) -> Path:
+    """Directory of the NumPy store for a model (named like its Chroma collection)."""
+    return NUMPY_STORE_DIR / get_collection_name(model_name)
+
+
+# ── Client / handle registry (process-wide) ──────────────────────────────────
+
+_chroma_clients: dict[str, chromadb.ClientAPI] = {}
+_handle_cache: dict[tuple[str, str, str], chromadb.Collection | NumpyVectorStore] = {}
+_registry_lock = threading.Lock()
+
+
 def _get_chroma_client() -> chromadb.ClientAPI:
-    """Create a persistent ChromaDB client."""
-    CHROMA_PERSIST_DIR.mkdir(parents=True, exist_ok=True)
-    return chromadb.PersistentClient(path=str(CHROMA_PERSIST_DIR))
+    """Get the persistent ChromaDB client for CHROMA_PERSIST_DIR (created once)."""
+    path = str(CHROMA_PERSIST_DIR)
+    with _registry_lock:
+        client = _chroma_clients.get(path)
+        if client is None:
+            CHROMA_PERSIST_DIR.mkdir(parents=True, exist_ok=True)
+            client = chromadb.PersistentClient(path=path)
+            _chroma_clients[path] = client
+    return client
+
+
+def _get_existing_collection(
+    client: chromadb.ClientAPI, name: str
+) -> chromadb.Collection | None:
+    """Open a collection by name, or None if it does not exist (no listing scan)."""
+    try:
+        return client.get_collection(name=name)
+    except _COLLECTION_NOT_FOUND:
+        return None
+
+
+def _handle_key(model_name: str, backend: str) -> tuple[str, str, str]:
+    if backend.startswith("quantized:"):
+        root = QUANTIZED_STORE_DIR
+    else:
+        root = NUMPY_STORE_DIR if backend == "numpy" else CHROMA_PERSIST_DIR
+    return str(root), backend, model_name
+
+
+def _cache_handle(
+    model_name: str,
+    backend: str,
+    handle: chromadb.Collection | NumpyVectorStore,
+) -> None:
+    with _registry_lock:
+        _handle_cache[_handle_key(model_name, backend)] = handle
+
+
+def invalidate_vectorstore_cache(
+    model_name: str | None = None,
+    backend: str | None = None,
+) -> None:
+    """Drop cached collection / NumPy store handles.
+
+    build_vectorstore() calls this for its model before rebuilding. Call it
+    yourself after deleting or rewriting a store outside this module.
+
+    Parameters
+    ----------
+    model_name : str | None
+        Model whose handles to drop. None = all models, and the cached
+        ChromaDB clients as well.
+    backend : str | None
+        Only drop handles of this backend ("chroma", "numpy", or
+        "quantized:<method>"). None = all backends.
+    """
+    with _registry_lock:
+        if model_name is None and backend is None:
+            _handle_cache.clear()
+            _chroma_clients.clear()
+            return
+        for key in list(_handle_cache):
+            _, key_backend, key_model = key
+            if model_name not in (None, key_model) or backend not in (None, key_backend):
+                continue
+            del _handle_cache[key]
+
+
+def _chunk_metadatas(chunks: list[Chunk]) -> list[dict[str, str]]:
+    """Convert chunk metadata to ChromaDB format and attach the content hash."""
+    return [store_metadata(chunk) for chunk in chunks]
+
+
+def diff_chunks(
+    ids: list[str],
+    metadatas: list[dict[str, str]],
+    stored_hashes: dict[str, str | None],
+) -> tuple[list[int], list[int], list[str]]:
+    """Compare the target chunk set against what a collection already holds.
+
+    Parameters
+    ----------
+    ids : list[str]
+        Target chunk IDs (from chunking.get_chunk_ids).
+    metadatas : list[dict[str, str]]
+        Target metadata, each with a "content_hash" key.
+    stored_hashes : dict[str, str | None]
+        Stored ID → content hash (None for legacy entries without a hash).
+
+    Returns
+    -------
+    tuple[list[int], list[int], list[str]]
+        - positions (into ids) of chunks to add
+        - positions (into ids) of chunks whose text changed
+        - stored IDs to delete
+    """
+    target = set(ids)
+    to_add = [i for i, doc_id in enumerate(ids) if doc_id not in stored_hashes]
+    to_update = [
+        i for i, doc_id in enumerate(ids)
+        if doc_id in stored_hashes
+        and stored_hashes[doc_id] != metadatas[i]["content_hash"]
+    ]
+    to_delete = [doc_id for doc_id in stored_hashes if doc_id not in target]
+    return to_add, to_update, to_delete
+
+
+def _embed_with_stats(
+    embedding_model: EmbeddingModel,
+    texts: list[str],
+    timings: dict[str, float],
+) -> np.ndarray:
+    """Embed texts into a float32 matrix, adding embedding time and cache
+    hit/miss counts to timings.
+
+    Counters accumulate, so this can be called once per build batch.
+    """
+    cache = embedding_model.cache
+    if cache is not None:
+        stats_before = cache.stats(embedding_model.cache_namespace)
+
+    t_embed_start = time.time()
+    embeddings = embedding_model.embed_texts_array(texts)
+    timings["embedding_time_s"] = (
+        timings.get("embedding_time_s", 0.0) + time.time() - t_embed_start
+    )
+
+    if cache is not None:
+        stats_after = cache.stats(embedding_model.cache_namespace)
+        timings["cache_hits"] = (
+            timings.get("cache_hits", 0) + stats_after["hits"] - stats_before["hits"]
+        )
+        timings["cache_misses"] = (
+            timings.get("cache_misses", 0) + stats_after["misses"] - stats_before["misses"]
+        )
+
+    return embeddings
+
+
+def _print_embedding_stats(timings: dict[str, float]) -> None:
+    """Print the accumulated embedding time and cache counters of a build."""
+    print(f"  Embedding done in {timings.get('embedding_time_s', 0.0):.2f}s")
+    if "cache_hits" in timings:
+        print(f"  Embedding cache: {timings['cache_hits']} hits, "
+              f"{timings['cache_misses']} misses")
+
+
+# ── Build progress manifests ─────────────────────────────────────────────────
+
+def _get_progress_path(model_name: str, backend: str) -> Path:
+    """Path of the build progress manifest for a model's collection/store."""
+    return BUILD_PROGRESS_DIR / f"{get_collection_name(model_name)}.{backend}.json"
+
+
+def read_build_progress(model_name: str, backend: str | None = None) -> dict | None:
+    """Read the build progress manifest for a model (None if never built).
+
+    Parameters
+    ----------
+    model_name : str
+        Embedding model name.
+    backend : str | None
+        "chroma" or "numpy". None = per-model default (see get_vector_backend).
+
+    Returns
+    -------
+    dict | None
+        Keys include status ("in_progress" / "complete"), fingerprint,
+        n_batches, batches_committed and updated_at.
+    """
+    path = _get_progress_path(model_name, get_vector_backend(model_name, backend))
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _write_build_progress(path: Path, progress: dict) -> None:
+    """Atomically write a progress manifest (temp file + rename)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    progress["updated_at"] = time.time()
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(progress, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _resumable_progress(path: Path, fingerprint: str) -> dict | None:
+    """Return the stored manifest if it is an unfinished build of this corpus."""
+    if not path.exists():
+        return None
+    progress = json.loads(path.read_text(encoding="utf-8"))
+    if progress.get("status") == "in_progress" and progress.get("fingerprint") == fingerprint:
+        return progress
+    return None
 
 
 # ── Build ────────────────────────────────────────────────────────────────────
@@ -69,11 +417,31 @@ def build_vectorstore(
     chunks: list[Chunk],
     embedding_model: EmbeddingModel,
     force_rebuild: bool = False,
-) -> tuple[chromadb.Collection, dict[str, float]]:
-    """Build a ChromaDB collection from chunks using the given embedding model.
+    backend: str | None = None,
+    batch_size: int | None = None,
+    hnsw_params: dict[str, int] | None = None,
+) -> tuple[chromadb.Collection | NumpyVectorStore, dict[str, float]]:
+    """Build or incrementally sync a vector store from chunks.
 
-    If the collection already exists with the same number of documents and
-    force_rebuild is False, returns the existing collection (skips re-indexing).
+    Chunks get stable IDs (chunking.get_chunk_ids) and a content hash in their
+    metadata. If the collection already exists, it is diffed against the target
+    chunk set and only the necessary operations are issued:
+    - new IDs → embed + add
+    - same ID, different content hash → embed + update
+    - stored IDs no longer in the corpus → delete
+    An unchanged corpus costs no embedding calls at all.
+
+    Added/changed chunks are embedded and written in batches of batch_size;
+    each batch is committed before the next is embedded and recorded in a
+    progress manifest (see read_build_progress). If a build is interrupted,
+    calling build_vectorstore again with the same chunks resumes after the
+    last committed batch — an interrupted force_rebuild does not delete the
+    partially rebuilt collection a second time.
+
+    Chroma collections are created with the model's HNSW parameters (see
+    get_hnsw_params). If an existing collection was built with a different
+    M / construction_ef, it is rebuilt (the embedding cache makes this
+    cheap); a different search_ef is persisted in place (see set_search_ef).
 
     Parameters
     ----------
@@ -83,97 +451,345 @@ def build_vectorstore(
         Model to use for embedding chunk texts.
     force_rebuild : bool
         If True, delete and rebuild the collection even if it exists.
+    backend : str | None
+        "chroma" or "numpy". None = per-model default (see get_vector_backend).
+    batch_size : int | None
+        Chunks embedded and committed per batch (bounds peak memory).
+        None = the model's index_batch_size: INDEX_BATCH_SIZE, or enough
+        chunks to fill every in-flight request of the OpenAI scheduler.
+    hnsw_params : dict[str, int] | None
+        HNSW parameter overrides for this build (Chroma only).
 
     Returns
     -------
-    tuple[chromadb.Collection, dict[str, float]]
-        The ChromaDB collection and a timing dict with:
-        - "embedding_time_s": time to embed all chunks
-        - "indexing_time_s": time to insert into ChromaDB
+    tuple[chromadb.Collection | NumpyVectorStore, dict[str, float]]
+        The collection (or NumPy store) and a timing dict with:
+        - "embedding_time_s": time to embed added/changed chunks
+        - "indexing_time_s": time to apply add/update/delete in ChromaDB
         - "total_time_s": total build time
+        - "n_added" / "n_updated" / "n_deleted": number of chunks per operation
+        - "n_batches" / "resumed_batches": batches in this build and batches
+          skipped because an interrupted build had already committed them
+        - "cache_hits" / "cache_misses": embedding cache counters for this
+          build (only when the model has a cache attached)
     """
+    backend = get_vector_backend(embedding_model.model_name, backend)
+    batch_size = batch_size or embedding_model.index_batch_size
+    # A rebuild may delete / rewrite the store: never hand out the old handle
+    invalidate_vectorstore_cache(embedding_model.model_name, backend)
+    if backend == "numpy":
+        store, timings = _build_numpy_store(chunks, embedding_model, force_rebuild, batch_size)
+        _cache_handle(embedding_model.model_name, backend, store)
+        return store, timings
+
     client = _get_chroma_client()
     collection_name = get_collection_name(embedding_model.model_name)
+    hnsw = get_hnsw_params(embedding_model.model_name, hnsw_params)
+    progress_path = _get_progress_path(embedding_model.model_name, "chroma")
     timings: dict[str, float] = {}
 
-    # Check if collection already exists with correct size
-    existing_collections = [c.name for c in client.list_collections()]
-    if collection_name in existing_collections and not force_rebuild:
-        collection = client.get_collection(name=collection_name)
-        if collection.count() == len(chunks):
-            print(f"  ✅ Collection '{collection_name}' already exists "
-                  f"with {collection.count()} docs — skipping rebuild.")
-            timings["embedding_time_s"] = 0.0
-            timings["indexing_time_s"] = 0.0
-            timings["total_time_s"] = 0.0
-            return collection, timings
-
-    # Delete existing collection if rebuilding
-    if collection_name in existing_collections:
-        client.delete_collection(name=collection_name)
-        print(f"  Deleted existing collection '{collection_name}' for rebuild.")
+    t_total_start = time.time()
+
+    ids = get_chunk_ids(chunks)
+    texts = [chunk.text for chunk in chunks]
+    metadatas = _chunk_metadatas(chunks)
+    fingerprint = corpus_fingerprint(chunks)
+    previous = _resumable_progress(progress_path, fingerprint)
+
+    # Delete existing collection if force-rebuilding (unless resuming that rebuild)
+    collection = _get_existing_collection(client, collection_name)
+    if collection is not None and not force_rebuild:
+        current = _collection_hnsw_params(collection)
+        changed = {k: (current[k], hnsw[k]) for k in _HNSW_BUILD_KEYS if current[k] != hnsw[k]}
+        if changed:
+            print(f"  HNSW build parameters changed {changed} — rebuilding '{collection_name}'.")
+            force_rebuild = True
+            previous = None   # an interrupted build used the old parameters
+        elif current["hnsw:search_ef"] != hnsw["hnsw:search_ef"]:
+            set_search_ef(collection, hnsw["hnsw:search_ef"])
+            print(f"  Set hnsw:search_ef={hnsw['hnsw:search_ef']} on '{collection_name}'.")
+    if collection is not None and force_rebuild:
+        if previous is not None and previous["force_rebuild"]:
+            print(f"  Resuming interrupted rebuild of '{collection_name}' "
+                  f"({previous['n_committed']} chunks already committed).")
+        else:
+            client.delete_collection(name=collection_name)
+            collection = None
+            print(f"  Deleted existing collection '{collection_name}' for rebuild.")
+
+    if collection is not None:
+        stored = collection.get(include=["metadatas"])
+        stored_hashes = {
+            doc_id: (meta or {}).get("content_hash")
+            for doc_id, meta in zip(stored["ids"], stored["metadatas"])
+        }
+    else:
+        collection = client.create_collection(
+            name=collection_name,
+            metadata={"hnsw:space": DISTANCE_METRIC, **hnsw},
+        )
+        stored_hashes = {}
+
+    # Committed batches of an interrupted build already match their content
+    # hash, so the diff naturally excludes them.
+    to_add, to_update, to_delete = diff_chunks(ids, metadatas, stored_hashes)
+    timings["n_added"] = len(to_add)
+    timings["n_updated"] = len(to_update)
+    timings["n_deleted"] = len(to_delete)
+    timings["n_batches"] = 0
+    timings["resumed_batches"] = previous["batches_committed"] if previous else 0
+
+    if not (to_add or to_update or to_delete):
+        if previous is not None:
+            _write_build_progress(progress_path, {**previous, "status": "complete"})
+        print(f"  ✅ Collection '{collection_name}' is up to date "
+              f"with {collection.count()} docs — skipping rebuild.")
+        timings["embedding_time_s"] = 0.0
+        timings["indexing_time_s"] = 0.0
+        timings["total_time_s"] = 0.0
+        _cache_handle(embedding_model.model_name, "chroma", collection)
+        return collection, timings
+
+    print(f"  Syncing '{collection_name}': {len(to_add)} added, "
+          f"{len(to_update)} changed, {len(to_delete)} removed")
+
+    work = [("add", i) for i in to_add] + [("update", i) for i in to_update]
+    batches = [work[i : i + batch_size] for i in range(0, len(work), batch_size)]
+    timings["n_batches"] = len(batches)
+
+    progress = {
+        "collection": collection_name,
+        "backend": "chroma",
+        "fingerprint": fingerprint,
+        "force_rebuild": force_rebuild or bool(previous and previous["force_rebuild"]),
+        "status": "in_progress",
+        "n_batches": timings["resumed_batches"] + len(batches),
+        "batches_committed": timings["resumed_batches"],
+        "n_committed": previous["n_committed"] if previous else 0,
+    }
+    _write_build_progress(progress_path, progress)
+
+    t_index = 0.0
+    if to_delete:
+        t0 = time.time()
+        collection.delete(ids=to_delete)
+        t_index += time.time() - t0
+
+    # Embed + write one bounded batch at a time; each batch is committed
+    # before the next one is embedded.
+    print(f"  Embedding + writing {len(work)} chunks with "
+          f"{embedding_model.model_name} in {len(batches)} batch(es)...")
+    for b, batch in enumerate(batches, start=1):
+        embeddings = _embed_with_stats(
+            embedding_model, [texts[i] for _, i in batch], timings
+        )
+
+        t0 = time.time()
+        for op_name in ("add", "update"):
+            rows = [k for k, (op, _) in enumerate(batch) if op == op_name]
+            if not rows:
+                continue
+            selected = [batch[k][1] for k in rows]
+            # float32 rows go to ChromaDB as one array — no per-element floats
+            getattr(collection, op_name)(
+                ids=[ids[i] for i in selected],
+                embeddings=embeddings[rows],
+                documents=[texts[i] for i in selected],
+                metadatas=[metadatas[i] for i in selected],
+            )
+        t_index += time.time() - t0
+
+        progress["batches_committed"] += 1
+        progress["n_committed"] += len(batch)
+        _write_build_progress(progress_path, progress)
+        if len(batches) > 1:
+            print(f"    Committed batch {b}/{len(batches)}")
+
+    progress["status"] = "complete"
+    _write_build_progress(progress_path, progress)
+
+    timings["indexing_time_s"] = t_index
+    timings["total_time_s"] = time.time() - t_total_start
+
+    _print_embedding_stats(timings)
+    print(f"  Indexing done in {timings['indexing_time_s']:.2f}s")
+    print(f"  ✅ Collection '{collection_name}' synced: "
+          f"{collection.count()} docs, total {timings['total_time_s']:.2f}s")
+
+    _cache_handle(embedding_model.model_name, "chroma", collection)
+    return collection, timings
+
+
+def _build_numpy_store(
+    chunks: list[Chunk],
+    embedding_model: EmbeddingModel,
+    force_rebuild: bool = False,
+    batch_size: int = INDEX_BATCH_SIZE,
+) -> tuple[NumpyVectorStore, dict[str, float]]:
+    """NumPy-backend counterpart of build_vectorstore (same diff semantics).
+
+    Vectors of unchanged chunks are copied from the existing matrix; only
+    added/changed chunks are embedded. Batches are written into a
+    memory-mapped scratch matrix (vectors.partial.npy) that is flushed after
+    every batch, so an interrupted build resumes from the last committed
+    batch. The final matrix replaces the store atomically at the end.
+    """
+    path = _get_numpy_store_path(embedding_model.model_name)
+    progress_path = _get_progress_path(embedding_model.model_name, "numpy")
+    partial_path = path / "vectors.partial.npy"
+    timings: dict[str, float] = {}
 
     t_total_start = time.time()
 
-    # Step 1: Embed all chunks
-    print(f"  Embedding {len(chunks)} chunks with {embedding_model.model_name}...")
+    ids = get_chunk_ids(chunks)
     texts = [chunk.text for chunk in chunks]
+    metadatas = _chunk_metadatas(chunks)
+    fingerprint = corpus_fingerprint(chunks)
 
-    t_embed_start = time.time()
-    embeddings = embedding_model.embed_texts(texts)
-    t_embed_end = time.time()
-    timings["embedding_time_s"] = t_embed_end - t_embed_start
-    print(f"  Embedding done in {timings['embedding_time_s']:.2f}s")
-
-    # Step 2: Create collection and insert
-    print(f"  Inserting into ChromaDB collection '{collection_name}'...")
-    collection = client.create_collection(
-        name=collection_name,
-        metadata={"hnsw:space": DISTANCE_METRIC},
-    )
+    store: NumpyVectorStore | None = None
+    stored_hashes: dict[str, str | None] = {}
+    if not force_rebuild:
+        try:
+            store = NumpyVectorStore.load(path)
+            stored_hashes = {
+                doc_id: meta.get("content_hash")
+                for doc_id, meta in zip(store.ids, store.metadatas)
+            }
+        except ValueError:
+            store = None
 
+    to_add, to_update, to_delete = diff_chunks(ids, metadatas, stored_hashes)
+    timings["n_added"] = len(to_add)
+    timings["n_updated"] = len(to_update)
+    timings["n_deleted"] = len(to_delete)
+    timings["n_batches"] = 0
+    timings["resumed_batches"] = 0
+
+    if store is not None and not (to_add or to_update or to_delete):
+        print(f"  ✅ NumPy store '{store.name}' is up to date "
+              f"with {store.count()} docs — skipping rebuild.")
+        timings["embedding_time_s"] = 0.0
+        timings["indexing_time_s"] = 0.0
+        timings["total_time_s"] = 0.0
+        return store, timings
+
+    print(f"  Syncing NumPy store at {path}: {len(to_add)} added, "
+          f"{len(to_update)} changed, {len(to_delete)} removed")
+
+    positions = to_add + to_update
+    batches = [positions[i : i + batch_size] for i in range(0, len(positions), batch_size)]
+    timings["n_batches"] = len(batches)
+    shape = (len(ids), embedding_model.dimensions)
+
+    # The batch plan is deterministic for a given (corpus, stored store,
+    # force_rebuild), so a matching manifest means its committed batches
+    # in the scratch matrix are still valid.
+    previous = _resumable_progress(progress_path, fingerprint)
     t_index_start = time.time()
+    if (
+        previous is not None
+        and previous["force_rebuild"] == force_rebuild
+        and previous["n_batches"] == len(batches)
+        and partial_path.exists()
+    ):
+        vectors = np.load(partial_path, mmap_mode="r+")
+        if vectors.shape != shape:
+            previous = None
+    else:
+        previous = None
+
+    if previous is None:
+        path.mkdir(parents=True, exist_ok=True)
+        vectors = np.lib.format.open_memmap(
+            partial_path, mode="w+", dtype=np.float32, shape=shape
+        )
+        changed = set(positions)
+        for i, doc_id in enumerate(ids):
+            if i not in changed:
+                vectors[i] = store.vectors[store._id_to_row[doc_id]]
+        vectors.flush()
+        progress = {
+            "collection": get_collection_name(embedding_model.model_name),
+            "backend": "numpy",
+            "fingerprint": fingerprint,
+            "force_rebuild": force_rebuild,
+            "status": "in_progress",
+            "n_batches": len(batches),
+            "batches_committed": 0,
+        }
+        _write_build_progress(progress_path, progress)
+    else:
+        progress = previous
+        timings["resumed_batches"] = progress["batches_committed"]
+        print(f"  Resuming interrupted build: {progress['batches_committed']}"
+              f"/{progress['n_batches']} batches already committed.")
+    t_index = time.time() - t_index_start
+
+    remaining = batches[progress["batches_committed"]:]
+    print(f"  Embedding {sum(len(batch) for batch in remaining)} chunks with "
+          f"{embedding_model.model_name} in {len(remaining)} batch(es)...")
+    for b in range(progress["batches_committed"], len(batches)):
+        batch = batches[b]
+        embeddings = _embed_with_stats(embedding_model, [texts[i] for i in batch], timings)
 
-    # ChromaDB requires string IDs and string metadata values
-    ids = [f"chunk_{i:04d}" for i in range(len(chunks))]
-    metadatas = []
-    for chunk in chunks:
-        meta = {}
-        for key, value in chunk.metadata.items():
-            meta[key] = str(value)  # ChromaDB requires string values
-        metadatas.append(meta)
+        t0 = time.time()
+        vectors[batch] = embeddings
+        vectors.flush()
+        progress["batches_committed"] = b + 1
+        _write_build_progress(progress_path, progress)
+        t_index += time.time() - t0
+        if len(batches) > 1:
+            print(f"    Committed batch {b + 1}/{len(batches)}")
 
-    collection.add(
+    t0 = time.time()
+    store = NumpyVectorStore.write(
+        path,
+        name=get_collection_name(embedding_model.model_name),
+        vectors=vectors,
         ids=ids,
-        embeddings=embeddings,
         documents=texts,
         metadatas=metadatas,
     )
-
-    t_index_end = time.time()
-    timings["indexing_time_s"] = t_index_end - t_index_start
+    del vectors
+    partial_path.unlink(missing_ok=True)
+    progress["status"] = "complete"
+    _write_build_progress(progress_path, progress)
+    timings["indexing_time_s"] = t_index + time.time() - t0
     timings["total_time_s"] = time.time() - t_total_start
 
+    _print_embedding_stats(timings)
     print(f"  Indexing done in {timings['indexing_time_s']:.2f}s")
-    print(f"  ✅ Collection '{collection_name}' built: "
-          f"{collection.count()} docs, total {timings['total_time_s']:.2f}s")
+    print(f"  ✅ NumPy store '{store.name}' synced: "
+          f"{store.count()} docs, total {timings['total_time_s']:.2f}s")
 
-    return collection, timings
+    return store, timings
 
 
 # ── Load ─────────────────────────────────────────────────────────────────────
 
-def load_vectorstore(model_name: str) -> chromadb.Collection:
-    """Load an existing ChromaDB collection from disk.
+def load_vectorstore(
+    model_name: str,
+    backend: str | None = None,
+    use_cache: bool = True,
+) -> chromadb.Collection | NumpyVectorStore:
+    """Load an existing collection (or NumPy store) from disk.
+
+    The handle is cached per model (see invalidate_vectorstore_cache), so
+    later loads of the same store skip the client / SQLite round trips.
 
     Parameters
     ----------
     model_name : str
         Embedding model name used when building the collection.
+    backend : str | None
+        "chroma" or "numpy". None = per-model default (see get_vector_backend).
+    use_cache : bool
+        If False, ignore a cached handle and reopen the store (the fresh
+        handle replaces the cached one).
 
     Returns
     -------
-    chromadb.Collection
+    chromadb.Collection | NumpyVectorStore
         The loaded collection.
 
     Raises
@@ -181,29 +797,197 @@ def load_vectorstore(model_name: str) -> chromadb.Collection:
     ValueError
         If the collection does not exist.
     """
+    backend = get_vector_backend(model_name, backend)
+    if use_cache:
+        with _registry_lock:
+            cached = _handle_cache.get(_handle_key(model_name, backend))
+        if cached is not None:
+            return cached
+
+    if backend == "numpy":
+        path = _get_numpy_store_path(model_name)
+        try:
+            store = NumpyVectorStore.load(path)
+        except ValueError:
+            raise ValueError(
+                f"NumPy store not found at {path}. Run build_vectorstore first."
+            ) from None
+        print(f"  ✅ Loaded NumPy store '{store.name}' with {store.count()} docs")
+        _cache_handle(model_name, backend, store)
+        return store
+
     client = _get_chroma_client()
     collection_name = get_collection_name(model_name)
 
-    existing = [c.name for c in client.list_collections()]
-    if collection_name not in existing:
+    collection = _get_existing_collection(client, collection_name)
+    if collection is None:
+        existing = [c.name for c in client.list_collections()]
         raise ValueError(
             f"Collection '{collection_name}' not found. "
             f"Available: {existing}. Run build_vectorstore first."
         )
 
-    collection = client.get_collection(name=collection_name)
     print(f"  ✅ Loaded collection '{collection_name}' with {collection.count()} docs")
+    _cache_handle(model_name, backend, collection)
     return collection
 
 
+# ── Quantized stores ─────────────────────────────────────────────────────────
+
+def _get_quantized_store_path(model_name: str, method: str) -> Path:
+    """Directory of a model's quantized store: QUANTIZED_STORE_DIR/<collection>/<method>."""
+    return QUANTIZED_STORE_DIR / get_collection_name(model_name) / method
+
+
+def build_quantized_store(
+    model_name: str,
+    method: str = "int8",
+    backend: str | None = None,
+    force_rebuild: bool = False,
+) -> QuantizedVectorStore:
+    """Quantize a model's existing vector store (built by build_vectorstore).
+
+    The source collection stays the primary store; the quantized copy is a
+    second, smaller search backend over the same IDs and metadata. It is
+    rebuilt only if the source contents changed (IDs + content hashes).
+
+    Parameters
+    ----------
+    model_name : str
+        Embedding model whose store to quantize.
+    method : str
+        "int8" (scalar, 4x smaller) or "pq" (product quantization, ~32x).
+    backend : str | None
+        Source backend ("chroma" or "numpy"). None = per-model default.
+    force_rebuild : bool
+        If True, retrain the quantizer even if the source is unchanged.
+
+    Returns
+    -------
+    QuantizedVectorStore
+        Store accepted by query_vectorstore() / retrieve().
+
+    Raises
+    ------
+    ValueError
+        If the method is unknown or the source store does not exist.
+    """
+    if method not in QUANTIZATION_METHODS:
+        raise ValueError(f"Unknown quantization: {method!r}. Available: {QUANTIZATION_METHODS}")
+    source = load_vectorstore(model_name, backend)
+    path = _get_quantized_store_path(model_name, method)
+    handle_backend = f"quantized:{method}"
+
+    if not force_rebuild:
+        try:
+            existing = QuantizedVectorStore.load(path)
+        except ValueError:
+            existing = None
+        if existing is not None:
+            current = source.get(include=["metadatas"])
+            if existing.signature == source_signature(current["ids"], current["metadatas"]):
+                print(f"  ✅ Quantized store '{existing.name}' ({method}) is up to date")
+                _cache_handle(model_name, handle_backend, existing)
+                return existing
+
+    invalidate_vectorstore_cache(model_name, handle_backend)
+    t0 = time.perf_counter()
+    store = QuantizedVectorStore.from_store(source, path, method=method)
+    report = store.memory_report()
+    print(f"  ✅ Quantized '{store.name}' ({method}) in {time.perf_counter() - t0:.1f}s: "
+          f"{report['float32_mb']:.1f} MB → {report['resident_mb']:.2f} MB resident "
+          f"({report['compression']:.0f}x)")
+    _cache_handle(model_name, handle_backend, store)
+    return store
+
+
+def load_quantized_store(
+    model_name: str,
+    method: str = "int8",
+    use_cache: bool = True,
+) -> QuantizedVectorStore:
+    """Load a quantized store written by build_quantized_store().
+
+    The store is a snapshot: after build_vectorstore() changes the source,
+    call build_quantized_store() again to refresh it.
+
+    Raises
+    ------
+    ValueError
+        If no quantized store exists for this model and method.
+    """
+    handle_backend = f"quantized:{method}"
+    if use_cache:
+        with _registry_lock:
+            cached = _handle_cache.get(_handle_key(model_name, handle_backend))
+        if cached is not None:
+            return cached
+
+    path = _get_quantized_store_path(model_name, method)
+    try:
+        store = QuantizedVectorStore.load(path)
+    except ValueError:
+        raise ValueError(
+            f"Quantized store not found at {path}. Run build_quantized_store first."
+        ) from None
+    print(f"  ✅ Loaded quantized store '{store.name}' ({method}) with {store.count()} docs")
+    _cache_handle(model_name, handle_backend, store)
+    return store
+
+
 # ── Query ────────────────────────────────────────────────────────────────────
 
+def _search_collection_many(
+    query_embeddings: np.ndarray,
+    collection: chromadb.Collection | NumpyVectorStore,
+    top_k: int,
+    relevance_thresholds: list[float | None],
+    where: dict | None = None,
+) -> list[list[dict]]:
+    """Run one multi-query vector search and unpack it into result dicts (blocking)."""
+    results = collection.query(
+        query_embeddings=query_embeddings,
+        n_results=top_k,
+        include=["documents", "metadatas", "distances"],
+        where=where or None,
+    )
+
+    # Unpack ChromaDB nested list format: one inner list per query
+    output: list[list[dict]] = []
+    for documents, metadatas, distances, ids, threshold in zip(
+        results["documents"], results["metadatas"], results["distances"],
+        results["ids"], relevance_thresholds,
+    ):
+        output.append([
+            {"text": doc, "metadata": meta, "distance": dist, "id": doc_id}
+            for doc, meta, dist, doc_id in zip(documents, metadatas, distances, ids)
+            # Apply relevance threshold if set
+            if threshold is None or dist <= threshold
+        ])
+    return output
+
+
+def _search_collection(
+    query_embedding: np.ndarray | list[float],
+    collection: chromadb.Collection | NumpyVectorStore,
+    top_k: int,
+    relevance_threshold: float | None,
+    where: dict | None = None,
+) -> list[dict]:
+    """Run one vector search and unpack it into result dicts (blocking)."""
+    return _search_collection_many(
+        as_float32_matrix(query_embedding), collection, top_k, [relevance_threshold], where
+    )[0]
+
+
 def query_vectorstore(
     query: str,
     embedding_model: EmbeddingModel,
-    collection: chromadb.Collection,
+    collection: chromadb.Collection | NumpyVectorStore,
     top_k: int = 5,
     relevance_threshold: float | None = None,
+    query_embedding: np.ndarray | None = None,
+    where: dict | None = None,
 ) -> list[dict]:
     """Query the vector store: embed query → cosine search → return results.
 
@@ -213,13 +997,20 @@ def query_vectorstore(
         User question to search for.
     embedding_model : EmbeddingModel
         Must be the same model used to build this collection.
-    collection : chromadb.Collection
-        ChromaDB collection to search.
+    collection : chromadb.Collection | NumpyVectorStore
+        Collection to search (any backend, incl. QuantizedVectorStore).
     top_k : int
         Number of results to return.
     relevance_threshold : float | None
         Max cosine distance to accept. Results above this threshold are
         filtered out. None = no filtering (return all top_k).
+    query_embedding : np.ndarray | None
+        Precomputed query vector (e.g. from a combined dense + sparse
+        forward pass). None = embed `query` with embedding_model.
+    where : dict | None
+        ChromaDB metadata filter, e.g. {"source": "cards.md"} or
+        {"source": {"$in": [...]}}; pushed into the collection query, so
+        only matching chunks are searched. None = whole corpus.
 
     Returns
     -------
@@ -230,30 +1021,104 @@ def query_vectorstore(
         - "distance": cosine distance (lower = more similar)
         - "id": ChromaDB document ID
     """
-    query_embedding = embedding_model.embed_query(query)
+    if query_embedding is None:
+        query_embedding = embedding_model.embed_query_array(query)
+    return _search_collection(query_embedding, collection, top_k, relevance_threshold, where)
 
-    results = collection.query(
-        query_embeddings=[query_embedding],
-        n_results=top_k,
-        include=["documents", "metadatas", "distances"],
-    )
 
-    # Unpack ChromaDB nested list format
-    documents = results["documents"][0]
-    metadatas = results["metadatas"][0]
-    distances = results["distances"][0]
-    ids = results["ids"][0]
-
-    output: list[dict] = []
-    for doc, meta, dist, doc_id in zip(documents, metadatas, distances, ids):
-        # Apply relevance threshold if set
-        if relevance_threshold is not None and dist > relevance_threshold:
-            continue
-        output.append({
-            "text": doc,
-            "metadata": meta,
-            "distance": dist,
-            "id": doc_id,
-        })
-
-    return output
\ No newline at end of file
+def query_vectorstore_many(
+    queries: list[str] | None,
+    embedding_model: EmbeddingModel | None,
+    collection: chromadb.Collection | NumpyVectorStore,
+    top_k: int = 5,
+    relevance_threshold: float | list[float | None] | None = None,
+    query_embeddings: np.ndarray | None = None,
+    where: dict | list[dict | None] | None = None,
+) -> list[list[dict]]:
+    """Batched query_vectorstore(): one embedding call and one collection.query.
+
+    With per-query `where` filters, queries sharing a filter are searched
+    together (one collection.query per distinct filter).
+
+    Parameters
+    ----------
+    queries : list[str] | None
+        Questions to search for. May be None when query_embeddings is given.
+    embedding_model : EmbeddingModel | None
+        Must be the same model used to build this collection (unused when
+        query_embeddings is given).
+    collection : chromadb.Collection | NumpyVectorStore
+        Collection to search (either backend).
+    top_k : int
+        Number of results per query.
+    relevance_threshold : float | list[float | None] | None
+        Max cosine distance to accept: one value for all queries, or one per
+        query (None entries = no filtering for that query).
+    query_embeddings : np.ndarray | None
+        Precomputed (n_queries, dim) query vectors. None = embed `queries`
+        with embedding_model.embed_queries_array().
+    where : dict | list[dict | None] | None
+        Metadata filter for all queries, or one per query (e.g. from
+        QueryRouter.where_many). None = whole corpus.
+
+    Returns
+    -------
+    list[list[dict]]
+        One result list per query, in input order, each in the same format
+        as query_vectorstore().
+    """
+    if query_embeddings is None:
+        if not queries:
+            return []
+        query_embeddings = embedding_model.embed_queries_array(queries)
+    elif len(query_embeddings) == 0:
+        return []
+    query_embeddings = as_float32_matrix(query_embeddings)
+
+    n_queries = len(query_embeddings)
+    if isinstance(relevance_threshold, (list, tuple)):
+        if len(relevance_threshold) != n_queries:
+            raise ValueError(
+                f"Got {len(relevance_threshold)} relevance thresholds for {n_queries} queries"
+            )
+        thresholds = list(relevance_threshold)
+    else:
+        thresholds = [relevance_threshold] * n_queries
+    if not isinstance(where, (list, tuple)):
+        return _search_collection_many(query_embeddings, collection, top_k, thresholds, where)
+
+    if len(where) != n_queries:
+        raise ValueError(f"Got {len(where)} where filters for {n_queries} queries")
+    groups: dict[str, list[int]] = {}
+    for i, query_where in enumerate(where):
+        groups.setdefault(where_key(query_where or None), []).append(i)
+    output: list[list[dict]] = [[] for _ in range(n_queries)]
+    for members in groups.values():
+        group_results = _search_collection_many(
+            query_embeddings[members], collection, top_k,
+            [thresholds[i] for i in members], where[members[0]],
+        )
+        for i, results in zip(members, group_results):
+            output[i] = results
+    return output
+
+
+async def aquery_vectorstore(
+    query: str,
+    embedding_model: EmbeddingModel,
+    collection: chromadb.Collection | NumpyVectorStore,
+    top_k: int = 5,
+    relevance_threshold: float | None = None,
+    where: dict | None = None,
+) -> list[dict]:
+    """Async query_vectorstore().
+
+    The query embedding is awaited (native async for OpenAI models); the
+    blocking collection search runs in the default executor.
+    Parameters and return value are the same as query_vectorstore().
+    """
+    query_embedding = await embedding_model.aembed_query(query)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, _search_collection, query_embedding, collection, top_k, relevance_threshold, where
+    )
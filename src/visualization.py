@@ -9,6 +9,7 @@ Usage in notebook:
         plot_retrieval_comparison,
         plot_generation_comparison,
         plot_build_timings,
+        plot_dimension_tradeoff,
         comparison_to_dataframe,
     )
     df = comparison_to_dataframe(comparison)
@@ -104,9 +105,9 @@ def plot_retrieval_comparison(comparison: dict[str, dict]) -> plt.Figure:
     fig, ax = plt.subplots(figsize=(10, 5))
 
     x = range(len(metrics))
-    width = 0.25
-    offsets = [-width, 0, width]
-    colors = ["#2196F3", "#FF9800", "#4CAF50"]
+    width = 0.75 / max(len(models), 1)
+    offsets = [(i - (len(models) - 1) / 2) * width for i in range(len(models))]
+    colors = ["#2196F3", "#FF9800", "#4CAF50", "#9C27B0", "#F44336", "#00BCD4", "#795548"]
 
     for i, (model, short) in enumerate(zip(models, short_names)):
         values = [comparison[model].get(m, 0) for m in metrics]
@@ -201,6 +202,65 @@ def plot_build_timings(comparison: dict[str, dict]) -> plt.Figure:
     return fig
 
 
+def plot_dimension_tradeoff(comparison: dict[str, dict]) -> plt.Figure:
+    """Scatter of retrieval quality vs index size, and latency vs index size.
+
+    One point per model (e.g. text-embedding-3-large at 256/512/1024/3072
+    dims), so the cheapest dimension that keeps quality is easy to spot.
+
+    Parameters
+    ----------
+    comparison : dict[str, dict]
+        Output from evaluation.compare_embeddings().
+
+    Returns
+    -------
+    plt.Figure
+        The matplotlib figure.
+    """
+    models = sorted(comparison, key=lambda m: comparison[m]["index_size_mb"])
+    short_names = [m.split("/")[-1] for m in models]
+    sizes = [comparison[m]["index_size_mb"] for m in models]
+
+    fig, axes = plt.subplots(1, 2, figsize=(12, 4))
+
+    # Left: quality vs size
+    ax = axes[0]
+    for metric, label, color in (
+        ("hit_rate_at_5", "Hit@5", "#2196F3"),
+        ("mrr", "MRR", "#FF9800"),
+    ):
+        ax.plot(sizes, [comparison[m][metric] for m in models],
+                "o-", label=label, color=color)
+    for name, size, mrr in zip(short_names, sizes, [comparison[m]["mrr"] for m in models]):
+        ax.annotate(name, (size, mrr), textcoords="offset points",
+                    xytext=(0, -12), ha="center", fontsize=7)
+    ax.set_xscale("log")
+    ax.set_xlabel("Index size (MB, float32 vectors)")
+    ax.set_ylabel("Score")
+    ax.set_ylim(0, 1.05)
+    ax.set_title("Retrieval Quality vs Index Size")
+    ax.legend()
+    ax.grid(alpha=0.3)
+
+    # Right: latency vs size
+    ax = axes[1]
+    latencies = [comparison[m].get("avg_latency_ms", 0) for m in models]
+    ax.plot(sizes, latencies, "o-", color="#4CAF50")
+    for name, size, val in zip(short_names, sizes, latencies):
+        ax.annotate(f"{name}\n{val:.0f}ms", (size, val), textcoords="offset points",
+                    xytext=(0, 6), ha="center", fontsize=7)
+    ax.set_xscale("log")
+    ax.set_xlabel("Index size (MB, float32 vectors)")
+    ax.set_ylabel("Latency (ms)")
+    ax.set_title("Average Query Latency vs Index Size")
+    ax.grid(alpha=0.3)
+
+    plt.tight_layout()
+    plt.show()
+    return fig
+
+
 # ── Generation quality charts ────────────────────────────────────────────────
 
 def plot_generation_scores(gen_results: list) -> plt.Figure:
@@ -0,0 +1,57 @@
+"""BM25Index must rank exactly like rank_bm25 + np.argsort(scores)[::-1], ties included."""
+
+import contextlib
+import io
+import random
+
+import numpy as np
+import pytest
+
+from src.bm25 import BM25Index
+from src.chunking import chunk_sections
+from src.document_loader import load_all_documents
+from config import DOCUMENT_PATHS
+
+rank_bm25 = pytest.importorskip("rank_bm25")
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    with contextlib.redirect_stdout(io.StringIO()):
+        chunks = chunk_sections(load_all_documents(DOCUMENT_PATHS))
+        index = BM25Index(chunks)
+    reference = rank_bm25.BM25Okapi([c.text.lower().split() for c in chunks])
+    return chunks, index, reference
+
+
+def _queries(chunks, n=300):
+    words = sorted({w for c in chunks for w in c.text.lower().split()})
+    rng = random.Random(0)
+    return ["fees"] + [" ".join(rng.sample(words, rng.randint(1, 3))) for _ in range(n)]
+
+
+def _baseline(index, reference, query, top_k):
+    scores = reference.get_scores(query.lower().split())
+    top = np.argsort(scores)[::-1][:top_k]
+    return [(index.ids[i], scores[i]) for i in top if scores[i] > 0]
+
+
+def test_queries_include_ties(corpus):
+    chunks, _, reference = corpus
+    tied = 0
+    for query in _queries(chunks):
+        scores = reference.get_scores(query.lower().split())
+        positive = scores[scores > 0]
+        tied += len(positive) != len(np.unique(positive))
+    assert tied > 0
+
+
+@pytest.mark.parametrize("top_k", [1, 5, 20, 300])
+def test_search_matches_rank_bm25(corpus, top_k):
+    chunks, index, reference = corpus
+    queries = _queries(chunks)
+    batched = index.search_many(queries, top_k=top_k)
+    for query, many in zip(queries, batched):
+        expected = _baseline(index, reference, query, top_k)
+        assert [(r["id"], r["bm25_score"]) for r in index.search(query, top_k)] == expected
+        assert [(r["id"], r["bm25_score"]) for r in many] == expected
@@ -0,0 +1,57 @@
+"""MicroBatchingEmbedder: cancelled callers must not stall their batch-mates."""
+
+import asyncio
+
+import numpy as np
+
+from src.embeddings import HashEmbeddingModel
+from src.micro_batching import MicroBatchingEmbedder
+
+
+def _embedder(latency_ms: float = 200.0) -> MicroBatchingEmbedder:
+    model = HashEmbeddingModel("offline-hash-384", 384, latency_ms=latency_ms)
+    return MicroBatchingEmbedder(model, max_wait_ms=50.0, max_in_flight=1)
+
+
+def test_cancel_while_queued_does_not_block_batch():
+    embedder = _embedder()
+
+    async def cancelled_caller():
+        task = asyncio.ensure_future(embedder._aembed_queries_uncached(["first"]))
+        await asyncio.sleep(0)            # submitted, still collecting the batch
+        other = embedder.submit(["other query"])
+        task.cancel()
+        return other
+
+    try:
+        other = asyncio.run(cancelled_caller())
+        vectors = other.result(timeout=3)
+        assert vectors.shape == (1, 384)
+        np.testing.assert_allclose(vectors, embedder.model._hash_embed(["other query"]))
+        assert embedder.batch_stats()["n_queries"] == 1
+    finally:
+        embedder.close()
+
+
+def test_cancel_while_batch_in_flight():
+    embedder = _embedder()
+
+    async def run():
+        task = asyncio.ensure_future(embedder._aembed_queries_uncached(["first"]))
+        await asyncio.sleep(0)            # "first" heads the batch
+        other = embedder.submit(["other query"])
+        await asyncio.sleep(0.1)          # batch dispatched, model call running
+        task.cancel()
+        later = await asyncio.wait_for(
+            embedder._aembed_queries_uncached(["after cancel"]), timeout=3
+        )
+        return task, other, later
+
+    try:
+        task, other, later = asyncio.run(run())
+        assert task.cancelled()
+        assert other.result(timeout=3).shape == (1, 384)
+        assert later.shape == (1, 384)
+        assert embedder.batch_stats()["n_batches"] == 2
+    finally:
+        embedder.close()